@@ -0,0 +1,386 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from fonctions import (
+    CATEGORIES_NON_ESSENTIELLES,
+    calculer_capacite_emprunt,
+    calculer_categories_depenses,
+    calculer_tendances_mensuelles,
+    charger_donnees,
+    montants_centimes,
+    selectionner_periode,
+    vers_euros
+)
+from marchands import normaliser_libelles
+from resultats import ResultatDepensesInhabituelles
+from revenus import calculer_revenus
+
+# Analyses calculables à partir d'agrégats partiels fusionnés
+ANALYSES_REPARTIES = ['categories_depenses', 'depenses_inhabituelles', 'capacite_emprunt', 'tendances_mensuelles']
+
+# Colonnes des crédits conservés dans l'agrégat (revenu stable de la capacité d'emprunt)
+COLONNES_CREDITS = ['date', 'description_fake', 'net_amount', 'category_name', 'parent_name']
+
+def _date_texte(date):
+    return None if date is None or pd.isna(date) else pd.Timestamp(date).isoformat()
+
+def _date(texte):
+    return None if texte is None else pd.Timestamp(texte)
+
+def _borne(a, b, fonction):
+    # Borne de deux dates ISO dont l'une peut être absente
+    valeurs = [valeur for valeur in (a, b) if valeur is not None]
+    return fonction(valeurs) if valeurs else None
+
+class AgregatPartiel:
+    """
+    État d'agrégation d'une partition de transactions : totaux de revenus et de dépenses,
+    sommes et nombres par catégorie, moments (Welford) des montants par sous-catégorie,
+    totaux mensuels et crédits du revenu stable.
+
+    Les totaux sont tenus en centimes entiers et convertis en euros à la finalisation.
+    Deux agrégats calculés sur des partitions disjointes se fusionnent dans n'importe quel
+    ordre ; les totaux ne dépendent pas du découpage (seuls les moments sont sujets aux
+    arrondis de sommation). L'état est sérialisable en JSON pour être échangé entre
+    processus ou machines.
+    """
+
+    def __init__(self):
+        self.nb_transactions = 0
+        self.date_min = None
+        self.date_max = None
+        self.date_max_depenses = None
+        self.revenu_total_centimes = 0
+        self.depenses_totales_centimes = 0
+        self.total_compressible_centimes = 0
+        self.centimes_par_categorie = {}
+        self.nb_par_categorie = {}
+        self.moments = {}
+        self.depenses_mensuelles_centimes = {}
+        self.credits = []
+
+    @classmethod
+    def depuis_transactions(cls, df):
+        """
+        Calcule l'agrégat d'une partition.
+
+        Args:
+            df (DataFrame): Transactions de la partition (dates au format datetime)
+
+        Returns:
+            AgregatPartiel: Agrégat de la partition
+        """
+        agregat = cls()
+        agregat.nb_transactions = len(df)
+
+        dates = df['date'].dropna()
+        if len(dates):
+            agregat.date_min = _date_texte(dates.min())
+            agregat.date_max = _date_texte(dates.max())
+
+        revenus = df[df['net_amount'] > 0]
+        depenses = df[df['net_amount'] < 0]
+        montants = depenses['net_amount'].abs()
+        centimes = montants_centimes(depenses).abs()
+
+        agregat.revenu_total_centimes = int(montants_centimes(revenus).sum())
+        agregat.depenses_totales_centimes = int(centimes.sum())
+        agregat.total_compressible_centimes = int(centimes[depenses['parent_name'].isin(CATEGORIES_NON_ESSENTIELLES)].sum())
+        agregat.date_max_depenses = _date_texte(depenses['date'].max())
+
+        par_categorie = centimes.groupby(depenses['parent_name']).agg(['sum', 'count'])
+        agregat.centimes_par_categorie = {categorie: int(somme) for categorie, somme in par_categorie['sum'].items()}
+        agregat.nb_par_categorie = par_categorie['count'].astype(int).to_dict()
+
+        # Moments d'ordre 1 et 2 par sous-catégorie : [n, moyenne, somme des carrés des écarts]
+        moments = montants.groupby(depenses['category_name']).agg(['count', 'mean', 'var'])
+        moments['m2'] = (moments['var'] * (moments['count'] - 1)).fillna(0.0)
+        agregat.moments = {categorie: [int(n), float(moyenne), float(m2)]
+                           for categorie, n, moyenne, m2 in moments[['count', 'mean', 'm2']].itertuples()}
+
+        mois = depenses['date'].dt.strftime('%Y-%m')
+        for (categorie, mois_depense), somme in centimes.groupby([depenses['parent_name'], mois]).sum().items():
+            agregat.depenses_mensuelles_centimes.setdefault(mois_depense, {})[categorie] = int(somme)
+
+        credits = revenus[revenus['date'].notna()]
+        agregat.credits = [
+            [_date_texte(date), description, float(montant), categorie, parent]
+            for date, description, montant, categorie, parent in credits[COLONNES_CREDITS].itertuples(index=False)
+        ]
+
+        return agregat
+
+    def fusionner(self, autre):
+        """
+        Ajoute à l'agrégat celui d'une autre partition.
+
+        Args:
+            autre (AgregatPartiel): Agrégat d'une partition disjointe
+
+        Returns:
+            AgregatPartiel: L'agrégat courant, fusionné
+        """
+        self.nb_transactions += autre.nb_transactions
+        self.date_min = _borne(self.date_min, autre.date_min, min)
+        self.date_max = _borne(self.date_max, autre.date_max, max)
+        self.date_max_depenses = _borne(self.date_max_depenses, autre.date_max_depenses, max)
+        self.revenu_total_centimes += autre.revenu_total_centimes
+        self.depenses_totales_centimes += autre.depenses_totales_centimes
+        self.total_compressible_centimes += autre.total_compressible_centimes
+
+        for categorie, somme in autre.centimes_par_categorie.items():
+            self.centimes_par_categorie[categorie] = self.centimes_par_categorie.get(categorie, 0) + somme
+        for categorie, nombre in autre.nb_par_categorie.items():
+            self.nb_par_categorie[categorie] = self.nb_par_categorie.get(categorie, 0) + nombre
+
+        # Combinaison des moments de deux échantillons (Chan et al.)
+        for categorie, (n_b, moyenne_b, m2_b) in autre.moments.items():
+            n_a, moyenne_a, m2_a = self.moments.get(categorie, (0, 0.0, 0.0))
+            n = n_a + n_b
+            ecart = moyenne_b - moyenne_a
+            self.moments[categorie] = [n, moyenne_a + ecart * n_b / n, m2_a + m2_b + ecart ** 2 * n_a * n_b / n]
+
+        for mois, sommes in autre.depenses_mensuelles_centimes.items():
+            totaux = self.depenses_mensuelles_centimes.setdefault(mois, {})
+            for categorie, somme in sommes.items():
+                totaux[categorie] = totaux.get(categorie, 0) + somme
+
+        self.credits.extend(autre.credits)
+
+        return self
+
+    def statistiques_categories(self, nb_min=5):
+        """
+        Moyenne et écart-type (non biaisé) des dépenses de chaque sous-catégorie.
+
+        Args:
+            nb_min (int): Nombre minimum de dépenses pour qu'une sous-catégorie soit retenue
+
+        Returns:
+            dict: {catégorie: {'moyenne', 'ecart_type', 'count'}}
+        """
+        return {
+            categorie: {
+                'moyenne': moyenne,
+                'ecart_type': math.sqrt(m2 / (n - 1)) if n > 1 else float('nan'),
+                'count': n
+            }
+            for categorie, (n, moyenne, m2) in self.moments.items() if n >= nb_min
+        }
+
+    def vers_dict(self):
+        """
+        Returns:
+            dict: Représentation sérialisable en JSON
+        """
+        return dict(vars(self))
+
+    @classmethod
+    def depuis_dict(cls, contenu):
+        """
+        Reconstruit un agrégat à partir de vers_dict.
+        """
+        agregat = cls()
+        for attribut, valeur in contenu.items():
+            setattr(agregat, attribut, valeur)
+        return agregat
+
+def decouper_transactions(df, nb_partitions):
+    """
+    Découpe les transactions en partitions contiguës de tailles proches.
+
+    Args:
+        df (DataFrame): Transactions à répartir
+        nb_partitions (int): Nombre de partitions
+
+    Returns:
+        list: DataFrames des partitions
+    """
+    bornes = np.linspace(0, len(df), nb_partitions + 1).astype(int)
+    return [df.iloc[debut:fin] for debut, fin in zip(bornes[:-1], bornes[1:])]
+
+def _lire_partition(partition, date_debut=None, date_fin=None):
+    # Une partition est un DataFrame ou un fichier CSV lu par le processus qui la traite
+    df = charger_donnees(partition) if isinstance(partition, str) else partition
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date'], errors='coerce'))
+    return selectionner_periode(df, date_debut, date_fin)
+
+def agreger_partition(partition, date_debut=None, date_fin=None):
+    """
+    Calcule l'agrégat sérialisé d'une partition (exécuté par les processus de calcul).
+
+    Args:
+        partition (DataFrame ou str): Transactions ou chemin du fichier CSV de la partition
+        date_debut, date_fin (str ou Timestamp): Période analysée (None pour tout l'historique)
+
+    Returns:
+        dict: Agrégat de la partition (AgregatPartiel.vers_dict)
+    """
+    return AgregatPartiel.depuis_transactions(_lire_partition(partition, date_debut, date_fin)).vers_dict()
+
+def signaler_depenses_partition(partition, statistiques, date_limite, seuil_z_score=2.5,
+                                date_debut=None, date_fin=None):
+    """
+    Seconde passe de identifier_depenses_inhabituelles sur une partition : les dépenses
+    récentes sont comparées aux statistiques globales de leur sous-catégorie.
+
+    Args:
+        partition (DataFrame ou str): Transactions ou chemin du fichier CSV de la partition
+        statistiques (dict): Statistiques fusionnées (AgregatPartiel.statistiques_categories)
+        date_limite (Timestamp): Début de la période récente (None pour tout l'historique)
+        seuil_z_score (float): Seuil du Z-score
+        date_debut, date_fin (str ou Timestamp): Période analysée (None pour tout l'historique)
+
+    Returns:
+        list: Dépenses inhabituelles de la partition
+    """
+    df = _lire_partition(partition, date_debut, date_fin)
+    depenses = df[(df['net_amount'] < 0) & df['category_name'].isin(list(statistiques))]
+    if date_limite is not None:
+        depenses = depenses[depenses['date'] >= date_limite]
+
+    moyennes = depenses['category_name'].map({c: s['moyenne'] for c, s in statistiques.items()}).to_numpy(dtype=float)
+    ecarts_types = depenses['category_name'].map({c: s['ecart_type'] for c, s in statistiques.items()}).to_numpy(dtype=float)
+    montants = depenses['net_amount'].abs().to_numpy()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_scores = (montants - moyennes) / ecarts_types
+    inhabituelles = (ecarts_types > 0) & (z_scores > seuil_z_score)
+
+    lignes = depenses[inhabituelles]
+    marchands = normaliser_libelles(lignes['description_fake'])
+
+    return [
+        {
+            'date': date,
+            'description': description,
+            'marchand': marchand,
+            'montant': montant,
+            'categorie': categorie,
+            'parent_categorie': parent,
+            'z_score': z_score,
+            'moyenne_categorie': moyenne
+        }
+        for date, description, marchand, montant, categorie, parent, z_score, moyenne in zip(
+            lignes['date'], lignes['description_fake'], marchands, montants[inhabituelles],
+            lignes['category_name'], lignes['parent_name'], z_scores[inhabituelles], moyennes[inhabituelles]
+        )
+    ]
+
+def finaliser_analyse(agregat, analyse, **parametres):
+    """
+    Construit les résultats d'une analyse à partir de l'agrégat fusionné de toutes les partitions.
+
+    Args:
+        agregat (AgregatPartiel): Agrégat fusionné
+        analyse (str): 'categories_depenses', 'capacite_emprunt' ou 'tendances_mensuelles'
+        **parametres: Paramètres de l'analyse (taux_interet, duree_pret, nb_mois_recents...)
+
+    Returns:
+        ResultatAnalyse: Résultats, au format de la fonction d'analyse correspondante
+    """
+    if analyse == 'categories_depenses':
+        return calculer_categories_depenses(vers_euros(pd.Series(agregat.centimes_par_categorie, dtype='int64')))
+
+    if analyse == 'capacite_emprunt':
+        date_min, date_max = _date(agregat.date_min), _date(agregat.date_max)
+        if date_min is not None:
+            nb_mois = (date_max.year - date_min.year) * 12 + date_max.month - date_min.month + 1
+        else:
+            # Si pas de dates valides, supposer 12 mois
+            nb_mois = 12
+
+        revenus = None
+        if parametres.pop('revenus_stables', True) and date_min is not None:
+            credits = pd.DataFrame(agregat.credits, columns=COLONNES_CREDITS)
+            credits['date'] = pd.to_datetime(credits['date'])
+
+            # Les bornes de la période (dernier mois incomplet) sont celles de toutes les transactions
+            bornes = pd.DataFrame({'date': [date_min, date_max], 'net_amount': [0.0, 0.0]})
+            revenus = calculer_revenus(pd.concat([credits, bornes], ignore_index=True).sort_values('date', kind='stable'))
+
+        return calculer_capacite_emprunt(
+            vers_euros(agregat.revenu_total_centimes), vers_euros(agregat.depenses_totales_centimes),
+            vers_euros(agregat.total_compressible_centimes), nb_mois,
+            date_min, date_max, revenus=revenus, **parametres
+        )
+
+    if analyse == 'tendances_mensuelles':
+        mois_recents = sorted(agregat.depenses_mensuelles_centimes)[-parametres.get('nb_mois_recents', 6):]
+        if not mois_recents:
+            return {
+                'tendances': {},
+                'depenses_totales': {},
+                'mois_analyses': [],
+                'periode_debut': pd.NaT,
+                'periode_fin': pd.NaT
+            }
+
+        depenses_totales = {mois: vers_euros(sum(agregat.depenses_mensuelles_centimes[mois].values()))
+                            for mois in mois_recents}
+        depenses_mois_categorie = vers_euros(pd.Series({
+            (categorie, mois): somme
+            for mois in mois_recents for categorie, somme in agregat.depenses_mensuelles_centimes[mois].items()
+        }, dtype='int64'))
+
+        return calculer_tendances_mensuelles(depenses_mois_categorie, depenses_totales, mois_recents)
+
+    raise ValueError(f"Analyse non répartissable : {analyse}")
+
+def executer_reparti(partitions, analyse, nb_processus=None, date_debut=None, date_fin=None, **parametres):
+    """
+    Exécute une analyse sur des partitions de transactions réparties entre plusieurs processus.
+
+    Chaque processus calcule l'agrégat de sa partition ; les agrégats sérialisés sont fusionnés
+    puis l'analyse est finalisée sur l'agrégat global. Les dépenses inhabituelles demandent
+    une seconde passe : les statistiques fusionnées sont renvoyées aux partitions, qui signalent
+    leurs propres dépenses récentes.
+
+    Args:
+        partitions (list): DataFrames ou chemins de fichiers CSV (une partition par élément)
+        analyse (str): Analyse à effectuer (voir ANALYSES_REPARTIES)
+        nb_processus (int): Nombre de processus (None : un par cœur, 0 : dans le processus courant)
+        date_debut, date_fin (str ou Timestamp): Période analysée (None pour tout l'historique)
+        **parametres: Paramètres de l'analyse (taux_interet, seuil_z_score, nb_mois_recents...)
+
+    Returns:
+        ResultatAnalyse: Résultats, au format de la fonction d'analyse non répartie
+    """
+    if analyse not in ANALYSES_REPARTIES:
+        raise ValueError(f"Analyse non répartissable : {analyse}")
+
+    executeur = ProcessPoolExecutor(max_workers=nb_processus) if nb_processus != 0 else None
+    repartir = executeur.map if executeur is not None else map
+
+    try:
+        partiels = repartir(agreger_partition, partitions, repeat(date_debut), repeat(date_fin))
+        agregat = reduce(AgregatPartiel.fusionner, (AgregatPartiel.depuis_dict(p) for p in partiels), AgregatPartiel())
+
+        if analyse != 'depenses_inhabituelles':
+            return finaliser_analyse(agregat, analyse, **parametres)
+
+        seuil_z_score = parametres.get('seuil_z_score', 2.5)
+        date_max = _date(agregat.date_max_depenses)
+        date_limite = date_max - pd.DateOffset(months=parametres.get('periode_recente_mois', 3)) if date_max is not None else None
+        statistiques = agregat.statistiques_categories()
+
+        signalements = repartir(signaler_depenses_partition, partitions, repeat(statistiques), repeat(date_limite),
+                                repeat(seuil_z_score), repeat(date_debut), repeat(date_fin))
+        depenses_inhabituelles = sorted((depense for liste in signalements for depense in liste),
+                                        key=lambda depense: depense['z_score'], reverse=True)
+    finally:
+        if executeur is not None:
+            executeur.shutdown()
+
+    return ResultatDepensesInhabituelles(
+        depenses_inhabituelles=depenses_inhabituelles,
+        stats_par_categorie=statistiques,
+        periode_recente_debut=date_limite if date_limite is not None else pd.NaT,
+        periode_recente_fin=date_max if date_max is not None else pd.NaT
+    )
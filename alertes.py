@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import inspect
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from fonctions import charger_donnees
+from marchands import TableMarchands
+
+class DetecteurDepensesInhabituelles:
+    """
+    Détection au fil de l'eau des dépenses inhabituelles, transaction par transaction.
+
+    Même critère que identifier_depenses_inhabituelles (Z-score du montant par rapport aux
+    dépenses de la catégorie), mais les statistiques (nombre, moyenne et somme des carrés des
+    écarts, méthode de Welford) sont tenues à jour à chaque dépense en O(1), par catégorie et
+    par marchand. Une dépense est comparée à l'historique qui la précède, puis y est ajoutée.
+    """
+
+    def __init__(self, seuil_z_score=2.5, nb_min=5, table_marchands=None):
+        """
+        Args:
+            seuil_z_score (float): Seuil du Z-score au-delà duquel une dépense est signalée
+            nb_min (int): Nombre minimum de dépenses connues pour juger une catégorie ou un marchand
+            table_marchands (TableMarchands): Table de normalisation des libellés (cache partagé)
+        """
+        self.seuil_z_score = seuil_z_score
+        self.nb_min = nb_min
+        self.table_marchands = table_marchands if table_marchands is not None else TableMarchands()
+        # (utilisateur, catégorie) ou (utilisateur, identifiant de marchand) -> [n, moyenne, m2]
+        self.categories = {}
+        self.marchands = {}
+
+    def initialiser(self, df):
+        """
+        Initialise les statistiques à partir de l'historique des transactions.
+
+        Args:
+            df (DataFrame): Transactions passées (colonne user_id facultative)
+
+        Returns:
+            DetecteurDepensesInhabituelles: Le détecteur initialisé
+        """
+        depenses = df[df['net_amount'] < 0]
+        utilisateurs = depenses['user_id'] if 'user_id' in depenses.columns else pd.Series(None, index=depenses.index)
+        montants = depenses['net_amount'].abs()
+        marchands = pd.Series(self.table_marchands.encoder(depenses['description_fake']), index=depenses.index)
+
+        for statistiques, cles in ((self.categories, depenses['category_name']), (self.marchands, marchands)):
+            moments = montants.groupby([utilisateurs, cles], dropna=False).agg(['count', 'mean', 'var'])
+            moments['m2'] = (moments['var'] * (moments['count'] - 1)).fillna(0.0)
+            for (utilisateur, cle), n, moyenne, m2 in moments[['count', 'mean', 'm2']].itertuples():
+                cle = (None if pd.isna(utilisateur) else utilisateur, None if pd.isna(cle) else cle)
+                statistiques[cle] = [int(n), float(moyenne), float(m2)]
+
+        return self
+
+    def _z_score(self, statistiques, cle, montant):
+        # Z-score du montant par rapport aux dépenses connues, puis mise à jour (Welford)
+        moments = statistiques.get(cle)
+        if moments is None:
+            moments = statistiques[cle] = [0, 0.0, 0.0]
+        n, moyenne, m2 = moments
+        moyenne_connue = moyenne
+
+        z_score = None
+        if n >= self.nb_min:
+            ecart_type = math.sqrt(m2 / (n - 1))
+            if ecart_type > 0:
+                z_score = (montant - moyenne) / ecart_type
+
+        n += 1
+        ecart = montant - moyenne
+        moyenne += ecart / n
+        moments[0], moments[1], moments[2] = n, moyenne, m2 + ecart * (montant - moyenne)
+
+        return z_score, moyenne_connue
+
+    def examiner(self, transaction):
+        """
+        Examine une transaction et met à jour les statistiques.
+
+        Args:
+            transaction (dict): Transaction (date, description_fake, net_amount, category_name,
+                parent_name, user_id facultatif)
+
+        Returns:
+            dict: Alerte si la dépense est inhabituelle pour sa catégorie ou son marchand, sinon None
+        """
+        montant = float(transaction['net_amount'])
+        if not montant < 0:
+            return None
+        montant = -montant
+
+        utilisateur = transaction.get('user_id')
+        categorie = transaction.get('category_name')
+        if pd.isna(categorie):
+            categorie = None
+        marchand = self.table_marchands.encoder_libelle(str(transaction.get('description_fake', '')))
+
+        z_categorie, moyenne_categorie = self._z_score(self.categories, (utilisateur, categorie), montant)
+        z_marchand, moyenne_marchand = self._z_score(self.marchands, (utilisateur, marchand), montant)
+
+        depasse_categorie = z_categorie is not None and z_categorie > self.seuil_z_score
+        depasse_marchand = z_marchand is not None and z_marchand > self.seuil_z_score
+        if not (depasse_categorie or depasse_marchand):
+            return None
+
+        return {
+            'date': pd.Timestamp(transaction['date']) if transaction.get('date') is not None else pd.NaT,
+            'utilisateur': utilisateur,
+            'description': transaction.get('description_fake'),
+            'marchand': self.table_marchands.nom(marchand),
+            'montant': montant,
+            'categorie': categorie,
+            'parent_categorie': transaction.get('parent_name'),
+            'motif': 'categorie' if depasse_categorie else 'marchand',
+            'z_score': z_categorie,
+            'moyenne_categorie': moyenne_categorie,
+            'z_score_marchand': z_marchand,
+            'moyenne_marchand': moyenne_marchand
+        }
+
+def _horodater(transaction):
+    # Heure de réception, sauf si le producteur l'a fixée (time.perf_counter(), même machine)
+    transaction.setdefault('horodatage', time.perf_counter())
+    return transaction
+
+async def flux_file(file):
+    """
+    Lit les transactions déposées dans une file asyncio (None termine le flux).
+
+    Args:
+        file (asyncio.Queue): File des transactions (dictionnaires)
+    """
+    while True:
+        transaction = await file.get()
+        if transaction is None:
+            return
+        yield _horodater(transaction)
+
+async def flux_fichier(chemin_fichier, suivre=False, intervalle=0.1):
+    """
+    Lit les transactions d'un fichier JSON Lines (une transaction par ligne), en suivant
+    éventuellement les lignes ajoutées à la fin du fichier (comme tail -f).
+
+    Args:
+        chemin_fichier (str): Fichier des transactions
+        suivre (bool): Attendre les nouvelles lignes une fois la fin du fichier atteinte
+        intervalle (float): Délai entre deux lectures à la fin du fichier, en secondes
+    """
+    with open(chemin_fichier, encoding='utf-8') as fichier:
+        tampon = ''
+        while True:
+            ligne = fichier.readline()
+            if not ligne:
+                if not suivre:
+                    return
+                await asyncio.sleep(intervalle)
+                continue
+            tampon += ligne
+            # Ligne en cours d'écriture : attendre la fin de ligne
+            if not tampon.endswith('\n') and suivre:
+                continue
+            if tampon.strip():
+                yield _horodater(json.loads(tampon))
+            tampon = ''
+
+async def flux_socket(hote='127.0.0.1', port=8765):
+    """
+    Reçoit les transactions sur une socket TCP locale, en JSON Lines (plusieurs
+    producteurs peuvent être connectés à la fois).
+
+    Args:
+        hote (str): Adresse d'écoute
+        port (int): Port d'écoute
+    """
+    file = asyncio.Queue()
+
+    async def recevoir(lecteur, ecrivain):
+        try:
+            async for ligne in lecteur:
+                if ligne.strip():
+                    await file.put(_horodater(json.loads(ligne)))
+        except (ValueError, ConnectionError):
+            pass
+        finally:
+            ecrivain.close()
+
+    serveur = await asyncio.start_server(recevoir, hote, port)
+    async with serveur:
+        while True:
+            yield await file.get()
+
+async def surveiller_flux(flux, detecteur, emettre=None, nb_max=None):
+    """
+    Consomme un flux de transactions et émet une alerte dès qu'une dépense est inhabituelle.
+
+    Args:
+        flux: Itérateur asynchrone de transactions (flux_file, flux_fichier, flux_socket...)
+        detecteur (DetecteurDepensesInhabituelles): Détecteur (initialisé sur l'historique)
+        emettre (callable): Fonction ou coroutine appelée avec chaque alerte
+        nb_max (int): Nombre de transactions après lequel s'arrêter (None pour tout le flux)
+
+    Returns:
+        dict: Nombre de transactions et d'alertes, et latence de bout en bout des alertes
+              (de l'horodatage de la transaction à l'émission), en millisecondes
+    """
+    nb_transactions = 0
+    latences = []
+
+    async for transaction in flux:
+        alerte = detecteur.examiner(transaction)
+        if alerte is not None:
+            if emettre is not None:
+                resultat = emettre(alerte)
+                if inspect.isawaitable(resultat):
+                    await resultat
+            latence = (time.perf_counter() - transaction['horodatage']) * 1000
+            alerte['latence_ms'] = latence
+            latences.append(latence)
+
+        nb_transactions += 1
+        if nb_max is not None and nb_transactions >= nb_max:
+            break
+
+    return {
+        'nb_transactions': nb_transactions,
+        'nb_alertes': len(latences),
+        'latence_ms': {
+            'mediane': float(np.median(latences)) if latences else None,
+            'p95': float(np.percentile(latences, 95)) if latences else None,
+            'max': max(latences) if latences else None
+        }
+    }
+
+def afficher_alerte(alerte):
+    """
+    Affiche une alerte de dépense inhabituelle.
+
+    Args:
+        alerte (dict): Alerte renvoyée par DetecteurDepensesInhabituelles.examiner
+    """
+    date = alerte['date'].strftime('%d/%m/%Y') if pd.notna(alerte['date']) else '?'
+    if alerte['motif'] == 'categorie':
+        detail = f"{alerte['categorie']}, moyenne {alerte['moyenne_categorie']:.2f}€, Z-score {alerte['z_score']:.2f}"
+    else:
+        detail = f"chez {alerte['marchand']}, moyenne {alerte['moyenne_marchand']:.2f}€, Z-score {alerte['z_score_marchand']:.2f}"
+    print(f"[ALERTE] {date} {alerte['description']}: {alerte['montant']:.2f}€ ({detail})")
+
+async def surveiller(chemin_historique, chemin_flux, suivre, port, seuil_z_score):
+    historique = charger_donnees(chemin_historique) if chemin_historique else None
+    detecteur = DetecteurDepensesInhabituelles(seuil_z_score)
+    if historique is not None:
+        detecteur.initialiser(historique)
+
+    flux = flux_fichier(chemin_flux, suivre) if chemin_flux else flux_socket(port=port)
+    bilan = await surveiller_flux(flux, detecteur, afficher_alerte)
+
+    latence = bilan['latence_ms']
+    print(f"\n{bilan['nb_transactions']} transactions, {bilan['nb_alertes']} alertes")
+    if bilan['nb_alertes']:
+        print(f"Latence des alertes: médiane {latence['mediane']:.3f} ms, p95 {latence['p95']:.3f} ms, "
+              f"max {latence['max']:.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alertes de dépenses inhabituelles en temps réel")
+    parser.add_argument('--historique', default='transactions.csv',
+                        help="Transactions passées servant de référence")
+    parser.add_argument('--flux', help="Fichier JSON Lines des nouvelles transactions (sinon, socket locale)")
+    parser.add_argument('--suivre', action='store_true', help="Suivre les lignes ajoutées au fichier")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seuil', type=float, default=2.5)
+    arguments = parser.parse_args()
+
+    asyncio.run(surveiller(arguments.historique, arguments.flux, arguments.suivre, arguments.port,
+                           arguments.seuil))
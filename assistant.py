@@ -1,9 +1,54 @@
+import os
+import inspect
 import openai
 import json
+from collections.abc import Mapping
 from fonctions import *
+from previsions import analyser_previsions, visualiser_previsions
+from calendrier import analyser_calendrier_depenses, visualiser_calendrier_depenses
+from resultats import valeur_serialisable
 
 # Configuration de l'API OpenAI
-client = openai.OpenAI(api_key="OPENAI_API_KEY")
+# (la variable OPENAI_BASE_URL permet de viser un serveur compatible, par exemple llm_stub.py)
+client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "OPENAI_API_KEY"))
+
+# Catégories d'analyse reconnues par classifier_question
+CATEGORIES_ANALYSE = [
+    "prelevements_automatiques",
+    "categories_depenses",
+    "depenses_inhabituelles",
+    "potentiel_economies",
+    "capacite_emprunt",
+    "previsions_tresorerie",
+    "calendrier_depenses"
+]
+
+# Fonction exécutant chaque analyse (ses paramètres nommés sont ceux acceptés par executer_analyse)
+FONCTIONS_ANALYSE = {
+    "prelevements_automatiques": analyser_part_prelevements,
+    "categories_depenses": analyser_categories_depenses,
+    "depenses_inhabituelles": identifier_depenses_inhabituelles,
+    "potentiel_economies": analyser_potentiel_economies,
+    "capacite_emprunt": analyser_capacite_emprunt,
+    "previsions_tresorerie": analyser_previsions,
+    "calendrier_depenses": analyser_calendrier_depenses
+}
+
+# Paramètres fournis par l'application elle-même, jamais acceptés d'une requête
+PARAMETRES_INTERNES = {"table_marchands"}
+
+# Paramètres des appels au modèle pour les réponses commentées
+PARAMETRES_REPONSE = {"model": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 500}
+
+def configurer_client(nouveau_client):
+    """
+    Remplace le client utilisé pour les appels au modèle de langage.
+    
+    Args:
+        nouveau_client: Client compatible avec l'interface openai.OpenAI
+    """
+    global client
+    client = nouveau_client
 
 def classifier_question(question):
     """
@@ -27,6 +72,8 @@ def classifier_question(question):
     3. depenses_inhabituelles - Analyse des dépenses inhabituelles
     4. potentiel_economies - Analyse du potentiel d'économies mensuelles (objectif 200€)
     5. capacite_emprunt - Analyse de la capacité d'emprunt immobilier
+    6. previsions_tresorerie - Prévision des revenus, dépenses et solde des prochains mois
+    7. calendrier_depenses - Répartition des dépenses selon le jour de la semaine, le jour du mois et la paie
     
     Réponds uniquement avec le nom de la catégorie.
     """
@@ -45,7 +92,9 @@ def classifier_question(question):
     categorie = response.choices[0].message.content.strip().lower()
     
     # Normaliser la réponse
-    if "prelevements" in categorie:
+    if "calendrier" in categorie:
+        return "calendrier_depenses"
+    elif "prelevements" in categorie:
         return "prelevements_automatiques"
     elif "categories" in categorie or "dépenses" in categorie:
         return "categories_depenses"
@@ -55,25 +104,74 @@ def classifier_question(question):
         return "potentiel_economies"
     elif "emprunt" in categorie or "crédit" in categorie:
         return "capacite_emprunt"
+    elif "previsions" in categorie or "prévisions" in categorie or "tresorerie" in categorie:
+        return "previsions_tresorerie"
     else:
         return "inconnu"
 
-def generer_reponse(categorie, resultats):
+def calculer_delta(precedents, resultats):
     """
-    Utilise ChatGPT pour générer une réponse en langage naturel
-    basée sur les résultats de l'analyse.
+    Extrait d'un résultat d'analyse les valeurs qui diffèrent du résultat précédent.
+    
+    Args:
+        precedents (dict): Résultats de l'analyse précédente
+        resultats (dict): Nouveaux résultats
+        
+    Returns:
+        dict: Clés nouvelles ou modifiées (récursivement pour les dictionnaires imbriqués)
+    """
+    delta = {}
+    for cle, valeur in resultats.items():
+        if cle not in precedents:
+            delta[cle] = valeur
+        elif isinstance(valeur, Mapping) and isinstance(precedents[cle], Mapping):
+            sous_delta = calculer_delta(precedents[cle], valeur)
+            if sous_delta:
+                delta[cle] = sous_delta
+        elif valeur_serialisable(valeur) != valeur_serialisable(precedents[cle]):
+            delta[cle] = valeur
+    
+    return delta
+
+def construire_messages(categorie, resultats, historique=None, resultats_precedents=None):
+    """
+    Construit les messages envoyés au modèle pour commenter les résultats d'une analyse.
     
     Args:
         categorie (str): Type d'analyse effectuée
         resultats (dict): Résultats de l'analyse
+        historique (list): Échanges précédents de la conversation, [(question, réponse), ...]
+        resultats_precedents (dict): Résultats de la même analyse déjà présentés ; seules
+            les différences sont alors envoyées au modèle
         
     Returns:
-        str: Réponse en langage naturel
+        list: Messages au format chat.completions
     """
-    # Convertir les résultats en JSON pour les inclure dans le prompt
-    resultats_json = json.dumps(resultats, default=str)
+    messages = [
+        {"role": "system", "content": "Tu es un conseiller financier expert qui explique des analyses financières de façon claire et utile."}
+    ]
     
-    prompt = f"""
+    # Rappeler les échanges précédents pour les questions de suivi
+    for question_precedente, reponse_precedente in historique or []:
+        messages.append({"role": "user", "content": question_precedente})
+        messages.append({"role": "assistant", "content": reponse_precedente})
+    
+    if resultats_precedents is not None:
+        # Question de suivi sur la même analyse : n'envoyer que ce qui a changé
+        delta_json = json.dumps(valeur_serialisable(calculer_delta(resultats_precedents, resultats)))
+        
+        prompt = f"""
+    Suite à la question de suivi, l'analyse "{categorie}" a été recalculée.
+    Voici uniquement les valeurs qui ont changé par rapport aux résultats déjà commentés: {delta_json}
+    
+    Explique brièvement ce que ces changements impliquent pour l'utilisateur,
+    sans répéter ce qui a déjà été dit. Limite ta réponse à 150 mots maximum.
+    """
+    else:
+        # Convertir les résultats en JSON pour les inclure dans le prompt
+        resultats_json = json.dumps(valeur_serialisable(resultats))
+        
+        prompt = f"""
     Tu es un conseiller financier expert. Voici les résultats d'une analyse financière de type "{categorie}".
     Génère une réponse claire, informative et personnalisée qui explique ces résultats à l'utilisateur.
     
@@ -87,72 +185,161 @@ def generer_reponse(categorie, resultats):
     - Limite ta réponse à 250 mots maximum
     """
     
+    messages.append({"role": "user", "content": prompt})
+    
+    return messages
+
+def generer_reponse(categorie, resultats, historique=None, resultats_precedents=None):
+    """
+    Utilise ChatGPT pour générer une réponse en langage naturel
+    basée sur les résultats de l'analyse.
+    
+    Args:
+        categorie (str): Type d'analyse effectuée
+        resultats (dict): Résultats de l'analyse
+        historique (list): Échanges précédents de la conversation, [(question, réponse), ...]
+        resultats_precedents (dict): Résultats de la même analyse déjà présentés ; seules
+            les différences sont alors envoyées au modèle
+        
+    Returns:
+        str: Réponse en langage naturel
+    """
     response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "Tu es un conseiller financier expert qui explique des analyses financières de façon claire et utile."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=500
+        messages=construire_messages(categorie, resultats, historique, resultats_precedents),
+        **PARAMETRES_REPONSE
     )
     
     return response.choices[0].message.content
 
-def assistant_financier(question, transactions):
+def verifier_parametres(categorie, parametres):
+    """
+    Vérifie des paramètres d'analyse reçus de l'extérieur (URL, corps JSON) d'après la
+    signature de la fonction d'analyse : noms acceptés, et valeur numérique lorsque la valeur
+    par défaut est un nombre.
+    
+    Args:
+        categorie (str): Type d'analyse
+        parametres (dict): Paramètres à transmettre à executer_analyse
+        
+    Returns:
+        list: Erreurs trouvées (vide si les paramètres sont valides)
+    """
+    signature = inspect.signature(FONCTIONS_ANALYSE[categorie])
+    acceptes = dict(list(signature.parameters.items())[1:])
+    
+    erreurs = []
+    for nom, valeur in parametres.items():
+        if nom == "referentiel" and categorie == "categories_depenses":
+            continue
+        if nom not in acceptes or nom in PARAMETRES_INTERNES:
+            erreurs.append(f"paramètre inconnu: {nom}")
+            continue
+        defaut = acceptes[nom].default
+        numerique = isinstance(defaut, (int, float)) and not isinstance(defaut, bool)
+        if numerique and (isinstance(valeur, bool) or not isinstance(valeur, (int, float))):
+            erreurs.append(f"{nom} doit être un nombre")
+    
+    return erreurs
+
+def executer_analyse(categorie, transactions, **parametres):
+    """
+    Effectue l'analyse correspondant à une catégorie de question.
+    
+    Args:
+        categorie (str): Type d'analyse à effectuer
+        transactions (DataFrame): Données de transactions
+        **parametres: Paramètres transmis à la fonction d'analyse (ex: montant_cible,
+            ou referentiel pour situer les catégories de dépenses dans la population)
+        
+    Returns:
+        dict: Résultats de l'analyse, ou None si la catégorie est inconnue
+    """
+    if categorie == "prelevements_automatiques":
+        return analyser_part_prelevements(transactions, **parametres)
+        
+    elif categorie == "categories_depenses":
+        referentiel = parametres.pop("referentiel", None)
+        resultats = analyser_categories_depenses(transactions, **parametres)
+        comparaison = comparer_avec_recommandations(resultats, referentiel)
+        # Fusionner les résultats pour la génération de réponse
+        return {
+            "categories": resultats,
+            "comparaison": comparaison
+        }
+        
+    elif categorie == "depenses_inhabituelles":
+        return identifier_depenses_inhabituelles(transactions, **parametres)
+        
+    elif categorie == "potentiel_economies":
+        parametres.setdefault("montant_cible", 200)  # Par défaut 200€
+        return analyser_potentiel_economies(transactions, **parametres)
+        
+    elif categorie == "capacite_emprunt":
+        return analyser_capacite_emprunt(transactions, **parametres)
+        
+    elif categorie == "previsions_tresorerie":
+        return analyser_previsions(transactions, **parametres)
+        
+    elif categorie == "calendrier_depenses":
+        return analyser_calendrier_depenses(transactions, **parametres)
+    
+    return None
+
+def visualiser_analyse(categorie, resultats, **options):
+    """
+    Génère la visualisation associée aux résultats d'une analyse.
+    
+    Args:
+        categorie (str): Type d'analyse effectuée
+        resultats (dict): Résultats renvoyés par executer_analyse
+        **options: Options transmises à la fonction visualiser_* (fichier, afficher)
+    """
+    if categorie == "prelevements_automatiques":
+        visualiser_part_prelevements(resultats, **options)
+    elif categorie == "categories_depenses":
+        visualiser_categories_depenses(resultats["categories"], resultats["comparaison"], **options)
+    elif categorie == "depenses_inhabituelles":
+        visualiser_depenses_inhabituelles(resultats, **options)
+    elif categorie == "potentiel_economies":
+        visualiser_potentiel_economies(resultats, resultats["montant_cible"], **options)
+    elif categorie == "capacite_emprunt":
+        visualiser_capacite_emprunt(resultats, **options)
+    elif categorie == "previsions_tresorerie":
+        visualiser_previsions(resultats, **options)
+    elif categorie == "calendrier_depenses":
+        visualiser_calendrier_depenses(resultats, **options)
+
+def assistant_financier(question, transactions, session=None):
     """
     Fonction principale qui gère l'interaction avec l'utilisateur.
     
     Args:
         question (str): Question posée par l'utilisateur
         transactions (DataFrame): Données de transactions
+        session (SessionConversation): Conversation en cours, pour les questions de suivi
+            (transactions est alors ignoré au profit des données de la session)
         
     Returns:
         str: Réponse à la question
     """
     try:
-        # Classifier la question
-        categorie = classifier_question(question)
-        
-        # Effectuer l'analyse appropriée
-        if categorie == "prelevements_automatiques":
-            resultats = analyser_part_prelevements(transactions)
-            # Générer une visualisation
-            visualiser_part_prelevements(resultats)
-            
-        elif categorie == "categories_depenses":
-            resultats = analyser_categories_depenses(transactions)
-            comparaison = comparer_avec_recommandations(resultats)
-            # Fusionner les résultats pour la génération de réponse
-            resultats_complets = {
-                "categories": resultats,
-                "comparaison": comparaison
-            }
-            # Générer une visualisation
-            visualiser_categories_depenses(resultats, comparaison)
-            return generer_reponse(categorie, resultats_complets)
-            
-        elif categorie == "depenses_inhabituelles":
-            resultats = identifier_depenses_inhabituelles(transactions)
-            # Générer une visualisation
-            visualiser_depenses_inhabituelles(resultats)
-            
-        elif categorie == "potentiel_economies":
-            montant_cible = 200  # Par défaut 200€
-            resultats = analyser_potentiel_economies(transactions, montant_cible)
-            # Générer une visualisation
-            visualiser_potentiel_economies(resultats, montant_cible)
-            
-        elif categorie == "capacite_emprunt":
-            resultats = analyser_capacite_emprunt(transactions)
-            # Générer une visualisation
-            visualiser_capacite_emprunt(resultats)
-            
+        # Classifier la question et effectuer l'analyse appropriée
+        if session is not None:
+            categorie, resultats, precedents = session.traiter_question(question)
         else:
-            return "Je ne comprends pas votre question. Pourriez-vous la reformuler en lien avec l'une de ces analyses : prélèvements automatiques, catégories de dépenses, dépenses inhabituelles, potentiel d'économies ou capacité d'emprunt."
+            categorie = classifier_question(question)
+            resultats = executer_analyse(categorie, transactions)
+        
+        if resultats is None:
+            return "Je ne comprends pas votre question. Pourriez-vous la reformuler en lien avec l'une de ces analyses : prélèvements automatiques, catégories de dépenses, dépenses inhabituelles, potentiel d'économies, capacité d'emprunt, prévisions de trésorerie ou calendrier des dépenses."
+        
+        # Générer une visualisation
+        visualiser_analyse(categorie, resultats)
         
         # Générer une réponse en langage naturel
+        if session is not None:
+            return session.commenter(question, categorie, resultats, precedents)
         return generer_reponse(categorie, resultats)
     
     except Exception as e:
-        return f"Désolé, une erreur s'est produite lors du traitement de votre demande: {str(e)}"
\ No newline at end of file
+        return f"Désolé, une erreur s'est produite lors du traitement de votre demande: {str(e)}"
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+from datetime import date, datetime
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from fonctions import generer_graphique_octets
+from resultats import ResultatAnalyse
+
+# Version du style des graphiques : à incrémenter à chaque modification d'une fonction
+# visualiser_*, pour que les images déjà en cache ne soient plus servies
+VERSION_STYLE = 1
+
+# Taille maximale du cache sur disque par défaut, en octets
+TAILLE_MAX_DEFAUT = 200 * 1024 * 1024
+
+FORMATS_IMAGE = ('png', 'svg')
+
+def _valeur_cle(valeur):
+    # Conversion d'une valeur inconnue de l'encodeur JSON pour le calcul de l'empreinte ;
+    # l'ordre des dictionnaires est conservé (il fixe l'ordre des barres et des parts)
+    if isinstance(valeur, ResultatAnalyse):
+        return {champ: getattr(valeur, champ) for champ in valeur.__dataclass_fields__}
+    if isinstance(valeur, Mapping):
+        return dict(valeur)
+    if isinstance(valeur, (pd.DataFrame, pd.Series)):
+        empreinte = pd.util.hash_pandas_object(valeur, index=True).to_numpy()
+        colonnes = valeur.columns if isinstance(valeur, pd.DataFrame) else [valeur.name]
+        return {'colonnes': [str(colonne) for colonne in colonnes],
+                'empreinte': hashlib.sha256(empreinte.tobytes()).hexdigest()}
+    if isinstance(valeur, (np.bool_, bool)):
+        return bool(valeur)
+    if isinstance(valeur, np.integer):
+        return int(valeur)
+    if isinstance(valeur, np.floating):
+        return float(valeur)
+    if valeur is pd.NaT:
+        return None
+    if isinstance(valeur, (datetime, date, np.datetime64)):
+        return pd.Timestamp(valeur).isoformat()
+    if isinstance(valeur, (np.ndarray, tuple, set)):
+        return list(valeur.tolist() if hasattr(valeur, 'tolist') else valeur)
+    return str(valeur)
+
+class CacheGraphiques:
+    """
+    Cache sur disque des graphiques produits par les fonctions visualiser_*.
+
+    Chaque image est rangée sous l'empreinte SHA-256 de ce qui la détermine : la fonction de
+    visualisation, les données tracées, le format, la version du style et celle de matplotlib.
+    Une question déjà posée (ou une analyse dont les données n'ont pas changé) est servie sans
+    nouveau rendu. Les fichiers sont écrits de façon atomique, ce qui permet de partager le
+    répertoire entre processus ; au-delà de la taille maximale, les images lues le moins
+    récemment sont supprimées.
+    """
+
+    def __init__(self, repertoire, taille_max=TAILLE_MAX_DEFAUT, verrou=None):
+        """
+        Args:
+            repertoire (str): Répertoire des images (créé au besoin)
+            taille_max (int): Taille totale maximale des images, en octets
+            verrou (threading.Lock): Verrou tenu pendant les rendus (pyplot n'est pas thread-safe)
+        """
+        self.repertoire = repertoire
+        self.taille_max = taille_max
+        self.verrou = verrou
+        self.nb_succes = 0
+        self.nb_echecs = 0
+        os.makedirs(repertoire, exist_ok=True)
+
+    def cle(self, fonction_visualisation, args, kwargs, format_image='png'):
+        """
+        Calcule l'empreinte d'un graphique.
+
+        Args:
+            fonction_visualisation (callable): Une des fonctions visualiser_*
+            args (tuple): Arguments positionnels de la fonction
+            kwargs (dict): Arguments nommés de la fonction
+            format_image (str): 'png' ou 'svg'
+
+        Returns:
+            str: Empreinte SHA-256 (hexadécimale)
+        """
+        contenu = json.dumps({
+            'fonction': f"{fonction_visualisation.__module__}.{fonction_visualisation.__qualname__}",
+            'args': list(args),
+            'kwargs': dict(sorted(kwargs.items())),
+            'format': format_image,
+            'version_style': VERSION_STYLE,
+            'matplotlib': matplotlib.__version__
+        }, default=_valeur_cle, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+    def _chemin(self, cle, format_image):
+        return os.path.join(self.repertoire, f"{cle}.{format_image}")
+
+    def lire(self, cle, format_image='png'):
+        """
+        Renvoie une image du cache.
+
+        Args:
+            cle (str): Empreinte du graphique
+            format_image (str): 'png' ou 'svg'
+
+        Returns:
+            bytes: Contenu de l'image, ou None si elle n'est pas en cache
+        """
+        chemin = self._chemin(cle, format_image)
+        try:
+            with open(chemin, 'rb') as fichier:
+                contenu = fichier.read()
+            # Date d'accès, utilisée pour choisir les images à supprimer
+            os.utime(chemin)
+        except FileNotFoundError:
+            return None
+        return contenu
+
+    def ecrire(self, cle, contenu, format_image='png'):
+        """
+        Ajoute une image au cache, puis supprime les plus anciennes si la taille maximale est dépassée.
+
+        Args:
+            cle (str): Empreinte du graphique
+            contenu (bytes): Contenu de l'image
+            format_image (str): 'png' ou 'svg'
+        """
+        descripteur, temporaire = tempfile.mkstemp(dir=self.repertoire, suffix='.tmp')
+        try:
+            with os.fdopen(descripteur, 'wb') as fichier:
+                fichier.write(contenu)
+            os.replace(temporaire, self._chemin(cle, format_image))
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+        self.evincer()
+
+    def generer(self, fonction_visualisation, *args, format_image='png', **kwargs):
+        """
+        Renvoie le graphique demandé, depuis le cache ou en l'y ajoutant après rendu.
+
+        Args:
+            fonction_visualisation (callable): Une des fonctions visualiser_*
+            *args: Arguments positionnels transmis à la fonction de visualisation
+            format_image (str): 'png' ou 'svg'
+            **kwargs: Arguments nommés transmis à la fonction de visualisation
+
+        Returns:
+            bytes: Contenu de l'image, ou None si aucun graphique n'a été produit
+        """
+        if format_image not in FORMATS_IMAGE:
+            raise ValueError(f"Format d'image non pris en charge: {format_image}")
+
+        cle = self.cle(fonction_visualisation, args, kwargs, format_image)
+        contenu = self.lire(cle, format_image)
+        if contenu is not None:
+            self.nb_succes += 1
+            return contenu
+
+        self.nb_echecs += 1
+        if self.verrou is not None:
+            with self.verrou:
+                contenu = generer_graphique_octets(fonction_visualisation, *args, format_image=format_image, **kwargs)
+        else:
+            contenu = generer_graphique_octets(fonction_visualisation, *args, format_image=format_image, **kwargs)
+
+        if contenu is not None:
+            self.ecrire(cle, contenu, format_image)
+        return contenu
+
+    def _fichiers(self):
+        # (date d'accès, taille, chemin) des images du cache
+        fichiers = []
+        for entree in os.scandir(self.repertoire):
+            if entree.is_file() and entree.name.endswith(FORMATS_IMAGE):
+                try:
+                    informations = entree.stat()
+                except FileNotFoundError:
+                    continue
+                fichiers.append((informations.st_mtime, informations.st_size, entree.path))
+        return fichiers
+
+    def taille(self):
+        """
+        Returns:
+            int: Taille totale des images en cache, en octets
+        """
+        return sum(taille for _, taille, _ in self._fichiers())
+
+    def evincer(self):
+        """
+        Supprime les images lues le moins récemment jusqu'à revenir sous la taille maximale.
+
+        Returns:
+            int: Nombre d'images supprimées
+        """
+        fichiers = self._fichiers()
+        taille = sum(taille for _, taille, _ in fichiers)
+        nb_supprimees = 0
+
+        for _, taille_fichier, chemin in sorted(fichiers):
+            if taille <= self.taille_max:
+                break
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                # Déjà supprimée par un autre processus
+                pass
+            taille -= taille_fichier
+            nb_supprimees += 1
+
+        return nb_supprimees
+
+    def vider(self):
+        """
+        Supprime toutes les images du cache.
+        """
+        for _, _, chemin in self._fichiers():
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,338 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from fonctions import selectionner_periode
+from resultats import ResultatCalendrier
+from revenus import classer_revenus
+
+JOURS_SEMAINE = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+
+# Nombre de jours suivis après chaque paie
+HORIZON_PAIE = 31
+
+# Jours suivant la paie (jour de la paie compris) comparés au reste du cycle
+FENETRE_PAIE = 3
+
+# Rapport entre la dépense quotidienne juste après la paie et celle du reste du cycle
+# au-delà duquel un pic de dépenses est signalé
+SEUIL_PIC_PAIE = 1.5
+
+# Catégorie attribuée aux dépenses sans catégorie principale
+CATEGORIE_PAR_DEFAUT = 'Non catégorisé'
+
+def composantes_dates(dates):
+    """
+    Décompose des dates en composantes entières.
+
+    Args:
+        dates (Series): Dates (datetime, sans valeur manquante)
+
+    Returns:
+        tuple: (numéro du jour depuis le 01/01/1970, jour de la semaine 0-6 à partir du lundi,
+                jour du mois 0-30)
+    """
+    jours = dates.to_numpy().astype('datetime64[D]')
+    numeros = jours.astype(np.int64)
+    jours_semaine = (numeros + 3) % 7  # le 01/01/1970 était un jeudi
+    jours_mois = (jours - jours.astype('datetime64[M]')).astype(np.int64)
+    return numeros, jours_semaine, jours_mois
+
+def _nombre_jours_semaine(premiers, derniers):
+    # Nombre d'occurrences de chaque jour de la semaine entre deux dates incluses
+    nb_jours = derniers - premiers + 1
+    decalages = (np.arange(7)[None, :] - (premiers[:, None] + 3)) % 7
+    return nb_jours[:, None] // 7 + (decalages < (nb_jours % 7)[:, None])
+
+def _nombre_jours_mois(premiers, derniers):
+    # Nombre d'occurrences de chaque jour du mois (1 à 31) entre deux dates incluses, à partir
+    # d'une table cumulée des jours existants de chaque mois
+    jours_premiers = premiers.astype('datetime64[D]')
+    jours_derniers = derniers.astype('datetime64[D]')
+    mois_premiers = jours_premiers.astype('datetime64[M]')
+    mois_derniers = jours_derniers.astype('datetime64[M]')
+
+    origine = mois_premiers.min()
+    mois = np.arange(origine, mois_derniers.max() + 1)
+    longueurs = ((mois + 1).astype('datetime64[D]') - mois.astype('datetime64[D]')).astype(np.int64)
+    existants = np.arange(31)[None, :] < longueurs[:, None]
+    cumul = np.vstack([np.zeros((1, 31), dtype=np.int64), np.cumsum(existants, axis=0)])
+
+    debut = (mois_premiers - origine).astype(np.int64)
+    fin = (mois_derniers - origine).astype(np.int64)
+    jour_premier = (jours_premiers - mois_premiers.astype('datetime64[D]')).astype(np.int64)
+    jour_dernier = (jours_derniers - mois_derniers.astype('datetime64[D]')).astype(np.int64)
+
+    colonnes = np.arange(31)[None, :]
+    return (cumul[fin + 1] - cumul[debut]
+            - (colonnes < jour_premier[:, None])
+            - ((colonnes > jour_dernier[:, None]) & existants[fin]))
+
+def analyser_calendrier_utilisateurs(df, fenetre_paie=FENETRE_PAIE, seuil_pic=SEUIL_PIC_PAIE,
+                                     colonne_utilisateur='user_id'):
+    """
+    Analyse la répartition des dépenses dans la semaine, dans le mois et autour de la paie,
+    pour chaque utilisateur, en un seul calcul vectorisé sur l'ensemble des transactions.
+
+    Les matrices jour × catégorie principale sont obtenues par np.bincount sur les
+    composantes entières des dates. Les dates de paie sont celles des salaires détectés par
+    classer_revenus (à défaut, des autres revenus récurrents) ; chaque dépense est rattachée
+    à la dernière paie qui la précède.
+
+    Args:
+        df (DataFrame): Données de transactions
+        fenetre_paie (int): Nombre de jours suivant la paie comparés au reste du cycle
+        seuil_pic (float): Rapport des dépenses quotidiennes au-delà duquel un pic est signalé
+        colonne_utilisateur (str): Colonne identifiant l'utilisateur (None si une seule personne)
+
+    Returns:
+        dict: Résultats de l'analyse calendaire (ResultatCalendrier) par utilisateur
+    """
+    df = df[df['date'].notna()]
+    if df.empty:
+        return {}
+
+    if colonne_utilisateur is not None:
+        codes_lignes, utilisateurs = pd.factorize(df[colonne_utilisateur])
+        utilisateurs = utilisateurs.tolist()
+    else:
+        codes_lignes, utilisateurs = np.zeros(len(df), dtype=np.int64), [None]
+    nb_utilisateurs = len(utilisateurs)
+
+    numeros, jours_semaine, jours_mois = composantes_dates(df['date'])
+    montants = df['net_amount'].to_numpy(dtype=float)
+
+    # Période couverte par chaque utilisateur
+    premiers = np.full(nb_utilisateurs, numeros.max())
+    derniers = np.full(nb_utilisateurs, numeros.min())
+    np.minimum.at(premiers, codes_lignes, numeros)
+    np.maximum.at(derniers, codes_lignes, numeros)
+
+    # Matrices utilisateur × catégorie × jour de la semaine / du mois
+    depenses = montants < 0
+    codes_categories, categories = pd.factorize(df['parent_name'].fillna(CATEGORIE_PAR_DEFAUT).to_numpy()[depenses])
+    categories = categories.tolist()
+    nb_categories = len(categories)
+    u = codes_lignes[depenses]
+    valeurs = -montants[depenses]
+    cellules = u * nb_categories + codes_categories
+
+    par_jour_semaine = np.bincount(cellules * 7 + jours_semaine[depenses], weights=valeurs,
+                                   minlength=nb_utilisateurs * nb_categories * 7).reshape(nb_utilisateurs, nb_categories, 7)
+    par_jour_mois = np.bincount(cellules * 31 + jours_mois[depenses], weights=valeurs,
+                                minlength=nb_utilisateurs * nb_categories * 31).reshape(nb_utilisateurs, nb_categories, 31)
+
+    # Dépense moyenne par jour calendaire : total rapporté au nombre de lundis, de 1ers du mois... observés
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moyennes_semaine = par_jour_semaine.sum(axis=1) / _nombre_jours_semaine(premiers, derniers)
+        moyennes_mois = par_jour_mois.sum(axis=1) / _nombre_jours_mois(premiers, derniers)
+
+    # Dates de paie : salaires, ou autres revenus récurrents pour les utilisateurs sans salaire
+    types = classer_revenus(df, colonne_utilisateur=colonne_utilisateur).to_numpy()
+    salaires = types == 'salaire'
+    avec_salaire = np.bincount(codes_lignes[salaires], minlength=nb_utilisateurs) > 0
+    paies = salaires | ((types == 'recurrent') & ~avec_salaire[codes_lignes])
+
+    # Rattachement de chaque dépense à la dernière paie qui la précède (clés utilisateur × jour)
+    origine = numeros.min()
+    etendue = numeros.max() - origine + 1
+    cles = codes_lignes * etendue + (numeros - origine)
+    cles_paies = np.unique(cles[paies])
+    utilisateurs_paies, jours_paies = np.divmod(cles_paies, etendue)
+
+    depenses_apres_paie = np.zeros((nb_utilisateurs, HORIZON_PAIE))
+    expositions = np.zeros((nb_utilisateurs, HORIZON_PAIE), dtype=np.int64)
+    # Sans paie détectée (aucun salaire ni revenu récurrent), le profil après paie reste vide
+    if cles_paies.size:
+        positions = np.searchsorted(cles_paies, cles[depenses], side='right') - 1
+        rattachees = positions >= 0
+        rattachees[rattachees] = utilisateurs_paies[positions[rattachees]] == u[rattachees]
+        ecarts = (numeros[depenses] - origine) - jours_paies[np.maximum(positions, 0)]
+        rattachees &= ecarts < HORIZON_PAIE
+
+        depenses_apres_paie = np.bincount(u[rattachees] * HORIZON_PAIE + ecarts[rattachees], weights=valeurs[rattachees],
+                                          minlength=nb_utilisateurs * HORIZON_PAIE).reshape(nb_utilisateurs, HORIZON_PAIE)
+
+        # Nombre de cycles observés au moins k jours après la paie (cycle : jusqu'à la paie
+        # suivante ou jusqu'à la fin de l'historique)
+        suivantes = np.append(jours_paies[1:], 0)
+        meme_utilisateur = np.append(utilisateurs_paies[1:] == utilisateurs_paies[:-1], False)
+        longueurs = np.where(meme_utilisateur, suivantes - jours_paies,
+                             (derniers[utilisateurs_paies] - origine) - jours_paies + 1)
+        cycles = np.bincount(utilisateurs_paies * (HORIZON_PAIE + 1) + np.minimum(longueurs, HORIZON_PAIE),
+                             minlength=nb_utilisateurs * (HORIZON_PAIE + 1)).reshape(nb_utilisateurs, HORIZON_PAIE + 1)
+        expositions = cycles[:, ::-1].cumsum(axis=1)[:, ::-1][:, 1:]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profils = depenses_apres_paie / expositions
+        quotidien_fenetre = depenses_apres_paie[:, :fenetre_paie].sum(axis=1) / expositions[:, :fenetre_paie].sum(axis=1)
+        quotidien_hors = depenses_apres_paie[:, fenetre_paie:].sum(axis=1) / expositions[:, fenetre_paie:].sum(axis=1)
+        ratios = quotidien_fenetre / quotidien_hors
+
+    nb_paies = np.bincount(utilisateurs_paies, minlength=nb_utilisateurs)
+    jours_mois_paies = (jours_paies + origine).astype('datetime64[D]')
+    jours_mois_paies = (jours_mois_paies - jours_mois_paies.astype('datetime64[M]')).astype(np.int64) + 1
+
+    def arrondir(valeurs):
+        return [round(float(valeur), 2) if np.isfinite(valeur) else None for valeur in valeurs]
+
+    resultats = {}
+    for i, utilisateur in enumerate(utilisateurs):
+        totaux = par_jour_semaine[i].sum(axis=1)
+        ordre = [c for c in np.argsort(-totaux, kind='stable') if totaux[c] > 0]
+        total = totaux.sum()
+        paies_utilisateur = jours_mois_paies[utilisateurs_paies == i]
+
+        resultats[utilisateur] = ResultatCalendrier(
+            categories=[categories[c] for c in ordre],
+            depenses_jour_semaine={categories[c]: par_jour_semaine[i, c].round(2).tolist() for c in ordre},
+            depenses_jour_mois={categories[c]: par_jour_mois[i, c].round(2).tolist() for c in ordre},
+            moyenne_jour_semaine=arrondir(moyennes_semaine[i]),
+            moyenne_jour_mois=arrondir(moyennes_mois[i]),
+            part_week_end=float(par_jour_semaine[i, :, 5:].sum() / total) if total > 0 else 0.0,
+            nb_paies=int(nb_paies[i]),
+            jour_paie_habituel=int(np.median(paies_utilisateur)) if len(paies_utilisateur) else None,
+            profil_apres_paie=arrondir(profils[i]),
+            fenetre_paie=fenetre_paie,
+            depense_quotidienne_apres_paie=float(quotidien_fenetre[i]) if np.isfinite(quotidien_fenetre[i]) else None,
+            depense_quotidienne_hors_paie=float(quotidien_hors[i]) if np.isfinite(quotidien_hors[i]) else None,
+            ratio_pic_paie=float(ratios[i]) if np.isfinite(ratios[i]) else None,
+            pic_apres_paie=bool(np.isfinite(ratios[i]) and ratios[i] >= seuil_pic),
+            periode_debut=pd.Timestamp((premiers[i]).astype('datetime64[D]')),
+            periode_fin=pd.Timestamp((derniers[i]).astype('datetime64[D]'))
+        )
+
+    return resultats
+
+def analyser_calendrier_depenses(df, fenetre_paie=FENETRE_PAIE, seuil_pic=SEUIL_PIC_PAIE,
+                                 date_debut=None, date_fin=None, fenetre=None):
+    """
+    Analyse à quels moments de la semaine et du mois l'argent est dépensé, et si les
+    dépenses augmentent dans les jours qui suivent la paie.
+
+    Args:
+        df (DataFrame): Données de transactions
+        fenetre_paie (int): Nombre de jours suivant la paie comparés au reste du cycle
+        seuil_pic (float): Rapport des dépenses quotidiennes au-delà duquel un pic est signalé
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+
+    Returns:
+        ResultatCalendrier: Résultats de l'analyse calendaire des dépenses
+    """
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
+
+    resultats = analyser_calendrier_utilisateurs(df, fenetre_paie, seuil_pic, colonne_utilisateur=None)
+
+    if not resultats:
+        return ResultatCalendrier(
+            categories=[],
+            depenses_jour_semaine={},
+            depenses_jour_mois={},
+            moyenne_jour_semaine=[],
+            moyenne_jour_mois=[],
+            part_week_end=0.0,
+            nb_paies=0,
+            jour_paie_habituel=None,
+            profil_apres_paie=[],
+            fenetre_paie=fenetre_paie,
+            depense_quotidienne_apres_paie=None,
+            depense_quotidienne_hors_paie=None,
+            ratio_pic_paie=None,
+            pic_apres_paie=False,
+            periode_debut=pd.NaT,
+            periode_fin=pd.NaT
+        )
+
+    return resultats[None]
+
+def afficher_calendrier_depenses(resultats):
+    """
+    Affiche les résultats de l'analyse calendaire des dépenses.
+
+    Args:
+        resultats (dict): Résultats de l'analyse calendaire des dépenses
+    """
+    print("\n=== CALENDRIER DES DÉPENSES ===\n")
+
+    if not resultats['categories']:
+        print("Aucune dépense à analyser.")
+        return
+
+    print("DÉPENSE MOYENNE PAR JOUR DE LA SEMAINE:")
+    for jour, moyenne in zip(JOURS_SEMAINE, resultats['moyenne_jour_semaine']):
+        print(f"  - {jour}: {moyenne or 0:.2f}€")
+    print(f"  Part des dépenses le week-end: {resultats['part_week_end']*100:.1f}%\n")
+
+    moyennes_mois = [moyenne or 0 for moyenne in resultats['moyenne_jour_mois']]
+    jours_forts = np.argsort(moyennes_mois)[::-1][:3]
+    print("JOURS DU MOIS LES PLUS DÉPENSIERS:")
+    for jour in jours_forts:
+        print(f"  - Le {jour + 1}: {moyennes_mois[jour]:.2f}€ en moyenne")
+
+    print("\nEFFET DE LA PAIE:")
+    if not resultats['nb_paies'] or resultats['ratio_pic_paie'] is None:
+        print("  Aucune date de paie détectée.")
+        return
+    print(f"  - {resultats['nb_paies']} paies détectées, en général le {resultats['jour_paie_habituel']} du mois")
+    print(f"  - Dépense quotidienne dans les {resultats['fenetre_paie']} jours suivant la paie: "
+          f"{resultats['depense_quotidienne_apres_paie']:.2f}€, le reste du mois: "
+          f"{resultats['depense_quotidienne_hors_paie']:.2f}€ (x{resultats['ratio_pic_paie']:.2f})")
+    if resultats['pic_apres_paie']:
+        print("  Attention: vos dépenses augmentent nettement juste après la paie.")
+
+def visualiser_calendrier_depenses(resultats, fichier='calendrier_depenses.png', afficher=True):
+    """
+    Crée une visualisation graphique de l'analyse calendaire des dépenses.
+
+    Args:
+        resultats (dict): Résultats de l'analyse calendaire des dépenses
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
+    """
+    if not resultats['categories']:
+        print("Pas de dépenses à visualiser.")
+        return
+
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(18, 6))
+
+    # Graphique 1: Carte de chaleur catégorie × jour de la semaine
+    matrice = np.array([resultats['depenses_jour_semaine'][categorie] for categorie in resultats['categories']])
+    image = ax1.imshow(matrice, aspect='auto', cmap='Reds')
+    ax1.set_xticks(range(7))
+    ax1.set_xticklabels([jour[:3] for jour in JOURS_SEMAINE])
+    ax1.set_yticks(range(len(resultats['categories'])))
+    ax1.set_yticklabels(resultats['categories'], fontsize='small')
+    ax1.set_title('Dépenses par jour de la semaine')
+    fig.colorbar(image, ax=ax1, label='Montant (€)')
+
+    # Graphique 2: Dépense moyenne par jour du mois
+    moyennes_mois = [moyenne or 0 for moyenne in resultats['moyenne_jour_mois']]
+    ax2.bar(range(1, 32), moyennes_mois, color='#66b3ff')
+    if resultats['jour_paie_habituel']:
+        ax2.axvline(x=resultats['jour_paie_habituel'], color='green', linestyle='--', label='Paie habituelle')
+        ax2.legend()
+    ax2.set_title('Dépense moyenne par jour du mois')
+    ax2.set_xlabel('Jour du mois')
+    ax2.set_ylabel('Montant (€)')
+
+    # Graphique 3: Dépense quotidienne moyenne selon le nombre de jours depuis la paie
+    if resultats['profil_apres_paie']:
+        profil = [valeur if valeur is not None else np.nan for valeur in resultats['profil_apres_paie']]
+        ax3.plot(range(len(profil)), profil, marker='o', color='#ff9999')
+        ax3.axvspan(-0.5, resultats['fenetre_paie'] - 0.5, color='green', alpha=0.15, label='Après la paie')
+        if resultats['depense_quotidienne_hors_paie'] is not None:
+            ax3.axhline(y=resultats['depense_quotidienne_hors_paie'], color='gray', linestyle='--',
+                        label='Moyenne hors fenêtre')
+        ax3.legend()
+    ax3.set_title('Dépenses selon le nombre de jours depuis la paie')
+    ax3.set_xlabel('Jours depuis la paie')
+    ax3.set_ylabel('Dépense quotidienne moyenne (€)')
+
+    plt.tight_layout()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
@@ -0,0 +1,352 @@
+import numpy as np
+import pandas as pd
+
+from marchands import normaliser_libelles_uniques
+
+# Tailles des n-grammes de caractères extraits des libellés
+TAILLES_NGRAMMES = (3, 4, 5)
+
+# Constantes du hachage polynomial des n-grammes (arithmétique modulo 2^64)
+_BASE_HACHAGE = np.uint64(1099511628211)
+_MULTIPLICATEUR_SEAU = np.uint64(11400714819323198485)
+
+# Nombre de libellés distincts évalués à la fois (borne la mémoire des scores)
+TAILLE_BLOC_PREDICTION = 20000
+
+def preparer_libelles(libelles):
+    """
+    Met en forme des libellés pour l'extraction des n-grammes : minuscules, chiffres
+    (dates, références) retirés, espaces simplifiés.
+
+    Args:
+        libelles (array-like): Libellés bruts, sans doublons
+
+    Returns:
+        list: Libellés préparés, dans le même ordre
+    """
+    libelles = pd.Series(libelles, dtype=object).astype(str).str.lower()
+    libelles = libelles.str.replace(r'\d+', ' ', regex=True).str.replace(r'\s+', ' ', regex=True).str.strip()
+    return libelles.tolist()
+
+def hacher_ngrammes(textes, nb_bits, tailles=TAILLES_NGRAMMES):
+    """
+    Extrait les n-grammes de caractères (octets UTF-8) de chaque texte et les répartit dans
+    2^nb_bits seaux, sans boucle Python sur les n-grammes : tous les textes sont concaténés
+    dans un seul tableau d'octets et les hachages sont calculés par fenêtres glissantes.
+
+    Args:
+        textes (list): Textes à découper
+        nb_bits (int): Logarithme en base 2 du nombre de seaux
+        tailles (tuple): Tailles des n-grammes
+
+    Returns:
+        tuple: (numéro de seau de chaque n-gramme, indice du texte auquel il appartient),
+               triés par texte
+    """
+    octets = [(' ' + texte + ' ').encode('utf-8') for texte in textes]
+    longueurs = np.fromiter(map(len, octets), dtype=np.int64, count=len(octets))
+    tampon = np.frombuffer(b''.join(octets), dtype=np.uint8).astype(np.uint64)
+    fins = np.cumsum(longueurs)
+    proprietaires = np.repeat(np.arange(len(octets)), longueurs)
+
+    seaux, lignes = [], []
+    decalage = np.uint64(64 - nb_bits)
+    for taille in tailles:
+        nb_fenetres = len(tampon) - taille + 1
+        if nb_fenetres <= 0:
+            continue
+        empreintes = np.full(nb_fenetres, taille, dtype=np.uint64)
+        for position in range(taille):
+            empreintes = empreintes * _BASE_HACHAGE + tampon[position:position + nb_fenetres]
+
+        # Fenêtres entièrement contenues dans un même texte
+        proprietaire = proprietaires[:nb_fenetres]
+        valides = np.arange(taille, nb_fenetres + taille) <= fins[proprietaire]
+        seaux.append(((empreintes[valides] * _MULTIPLICATEUR_SEAU) >> decalage).astype(np.int64))
+        lignes.append(proprietaire[valides])
+
+    if not seaux:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    seaux, lignes = np.concatenate(seaux), np.concatenate(lignes)
+    ordre = np.argsort(lignes, kind='stable')
+    return seaux[ordre], lignes[ordre]
+
+class CategoriseurTransactions:
+    """
+    Catégoriseur local des transactions, entraîné sur les transactions déjà catégorisées.
+
+    Deux sources sont combinées :
+    - une table des marchands connus (libellé normalisé et sens du montant -> catégorie
+      majoritaire), prioritaire lorsque le marchand a déjà été vu ;
+    - un modèle bayésien naïf multinomial sur les n-grammes de caractères hachés du libellé,
+      pour les marchands inconnus.
+
+    La confiance d'une prédiction du modèle est sa probabilité a posteriori pondérée par la
+    part des n-grammes du libellé déjà rencontrés à l'entraînement.
+
+    Les libellés sont évalués une seule fois par valeur distincte, par blocs vectorisés, ce
+    qui permet de catégoriser des millions de lignes à l'ingestion, sans service externe.
+    """
+
+    def __init__(self, nb_bits=16, lissage=0.1, tailles_ngrammes=TAILLES_NGRAMMES):
+        """
+        Args:
+            nb_bits (int): Logarithme en base 2 du nombre de seaux de n-grammes
+            lissage (float): Lissage additif des fréquences de n-grammes par catégorie
+            tailles_ngrammes (tuple): Tailles des n-grammes de caractères
+        """
+        self.nb_bits = nb_bits
+        self.lissage = lissage
+        self.tailles_ngrammes = tuple(tailles_ngrammes)
+        self.categories = np.array([], dtype=str)
+        self.parents = np.array([], dtype=str)
+        self.log_priors = None
+        self.log_vraisemblances = None
+        self.ngrammes_connus = None
+        self.marchands = pd.DataFrame(columns=['category_name', 'confiance'])
+
+    @property
+    def entraine(self):
+        return self.log_vraisemblances is not None
+
+    def _textes(self, descriptions, montants):
+        # Libellés distincts, combinés au sens du montant (un remboursement ou un salaire
+        # ne se catégorise pas comme un paiement chez le même marchand)
+        codes, uniques = pd.factorize(pd.Series(descriptions).astype(str))
+        if montants is None:
+            signes = np.zeros(len(codes), dtype=np.int64)
+        else:
+            signes = (np.asarray(montants, dtype=float) > 0).astype(np.int64)
+        codes_paires, paires = pd.factorize(codes * 2 + signes)
+        indices_libelles, signes_paires = np.divmod(np.asarray(paires, dtype=np.int64), 2)
+
+        textes = np.array(preparer_libelles(uniques), dtype=object)[indices_libelles]
+        marqueurs = np.where(signes_paires == 1, '+ ', '- ')
+        textes = [marqueur + texte for marqueur, texte in zip(marqueurs, textes)]
+
+        marchands = np.array(normaliser_libelles_uniques(uniques), dtype=object)[indices_libelles]
+        cles_marchands = [marqueur + marchand for marqueur, marchand in zip(marqueurs, marchands)]
+
+        return codes_paires, textes, cles_marchands
+
+    def entrainer(self, df):
+        """
+        Entraîne le catégoriseur sur les transactions dont la catégorie est renseignée.
+
+        Args:
+            df (DataFrame): Transactions (description_fake, net_amount, category_name, parent_name)
+
+        Returns:
+            CategoriseurTransactions: Le catégoriseur entraîné
+        """
+        df = df[df['category_name'].notna()]
+        if df.empty:
+            raise ValueError("Aucune transaction catégorisée pour entraîner le catégoriseur")
+
+        codes_paires, textes, cles_marchands = self._textes(df['description_fake'], df['net_amount'])
+        codes_categories, categories = pd.factorize(df['category_name'], sort=True)
+        nb_categories, nb_seaux = len(categories), 1 << self.nb_bits
+
+        # Catégorie parente la plus fréquente de chaque catégorie
+        if 'parent_name' in df.columns:
+            parents = df.groupby('category_name')['parent_name'].agg(
+                lambda valeurs: valeurs.mode().iloc[0] if valeurs.notna().any() else '')
+            self.parents = parents.reindex(categories).fillna('').to_numpy(dtype=str)
+        else:
+            self.parents = np.full(nb_categories, '', dtype=str)
+        self.categories = np.asarray(categories, dtype=str)
+
+        # Nombre de transactions par (libellé distinct, catégorie)
+        effectifs = pd.Series(1, index=pd.MultiIndex.from_arrays([codes_paires, codes_categories])) \
+            .groupby(level=[0, 1]).sum()
+        paires = effectifs.index.get_level_values(0).to_numpy()
+        classes = effectifs.index.get_level_values(1).to_numpy()
+        poids = effectifs.to_numpy(dtype=float)
+
+        # Modèle bayésien naïf : fréquences des n-grammes par catégorie
+        seaux, lignes = hacher_ngrammes([textes[i] for i in paires], self.nb_bits, self.tailles_ngrammes)
+        comptes = np.bincount(classes[lignes] * nb_seaux + seaux, weights=poids[lignes],
+                              minlength=nb_categories * nb_seaux).reshape(nb_categories, nb_seaux)
+        self.ngrammes_connus = comptes.sum(axis=0) > 0
+        comptes += self.lissage
+        self.log_vraisemblances = np.log(comptes / comptes.sum(axis=1, keepdims=True)).T.astype(np.float32)
+        self.log_priors = np.log(np.bincount(codes_categories, minlength=nb_categories) / len(codes_categories))
+
+        # Table des marchands : catégorie majoritaire et part des transactions concernées
+        # (lissée, de sorte qu'un marchand vu une seule fois ne soit pas certain)
+        table = pd.DataFrame({'marchand': np.asarray(cles_marchands, dtype=object)[paires],
+                              'classe': classes, 'poids': poids})
+        table = table[table['marchand'].str.len() > 2]
+        par_classe = table.groupby(['marchand', 'classe'])['poids'].sum().reset_index()
+        totaux = par_classe.groupby('marchand')['poids'].transform('sum')
+        par_classe['confiance'] = (par_classe['poids'] + 1) / (totaux + 2)
+        majoritaires = par_classe.sort_values('poids', ascending=False, kind='stable') \
+            .drop_duplicates('marchand').set_index('marchand')
+        self.marchands = pd.DataFrame({
+            'category_name': self.categories[majoritaires['classe'].to_numpy()],
+            'confiance': majoritaires['confiance'].to_numpy()
+        }, index=majoritaires.index)
+
+        return self
+
+    def _scores_modele(self, textes):
+        # Probabilité a posteriori de chaque catégorie, par blocs de libellés distincts, et
+        # part des n-grammes de chaque libellé déjà vus à l'entraînement : le modèle bayésien
+        # naïf est très affirmatif, y compris sur un libellé qui ne ressemble à rien de connu
+        probabilites = np.empty((len(textes), len(self.categories)), dtype=np.float64)
+        couvertures = np.zeros(len(textes), dtype=np.float64)
+        for debut in range(0, len(textes), TAILLE_BLOC_PREDICTION):
+            bloc = textes[debut:debut + TAILLE_BLOC_PREDICTION]
+            seaux, lignes = hacher_ngrammes(bloc, self.nb_bits, self.tailles_ngrammes)
+
+            scores = np.tile(self.log_priors, (len(bloc), 1))
+            presents = np.flatnonzero(np.bincount(lignes, minlength=len(bloc)))
+            if len(seaux):
+                debuts = np.searchsorted(lignes, presents)
+                scores[presents] += np.add.reduceat(self.log_vraisemblances[seaux], debuts, axis=0)
+                couvertures[debut + presents] = (np.add.reduceat(self.ngrammes_connus[seaux].astype(np.float64), debuts)
+                                                 / np.diff(np.append(debuts, len(seaux))))
+
+            scores -= scores.max(axis=1, keepdims=True)
+            np.exp(scores, out=scores)
+            probabilites[debut:debut + len(bloc)] = scores / scores.sum(axis=1, keepdims=True)
+
+        return probabilites, couvertures
+
+    def predire(self, descriptions, montants=None):
+        """
+        Prédit la catégorie de chaque transaction.
+
+        Args:
+            descriptions (Series): Libellés des transactions
+            montants (Series): Montants (le sens du montant aide à distinguer les revenus)
+
+        Returns:
+            DataFrame: category_name, parent_name, confiance (entre 0 et 1) et source
+                       ('marchand' ou 'modele'), alignés sur descriptions
+        """
+        if not self.entraine:
+            raise ValueError("Le catégoriseur doit être entraîné (entrainer) ou chargé (charger)")
+
+        index = descriptions.index if isinstance(descriptions, pd.Series) else None
+        codes_paires, textes, cles_marchands = self._textes(descriptions, montants)
+
+        probabilites, couvertures = self._scores_modele(textes)
+        classes = probabilites.argmax(axis=1)
+        categories = self.categories[classes].astype(object)
+        confiances = probabilites[np.arange(len(classes)), classes] * couvertures
+        sources = np.full(len(textes), 'modele', dtype=object)
+
+        # Marchands déjà vus à l'entraînement
+        connus = pd.Series(cles_marchands).map(self.marchands['category_name'])
+        trouves = connus.notna().to_numpy()
+        categories[trouves] = connus.to_numpy()[trouves]
+        confiances[trouves] = pd.Series(cles_marchands).map(self.marchands['confiance']).to_numpy()[trouves]
+        sources[trouves] = 'marchand'
+
+        positions = pd.Index(self.categories).get_indexer(categories)
+        return pd.DataFrame({
+            'category_name': categories[codes_paires],
+            'parent_name': self.parents[positions].astype(object)[codes_paires],
+            'confiance': confiances[codes_paires],
+            'source': sources[codes_paires]
+        }, index=index)
+
+    def categoriser(self, df, seuil_confiance=0.6, seuil_correction=None):
+        """
+        Complète les catégories manquantes d'un lot de transactions et signale les
+        catégories qui semblent erronées.
+
+        Args:
+            df (DataFrame): Transactions
+            seuil_confiance (float): Confiance minimale pour renseigner une catégorie manquante
+            seuil_correction (float): Confiance minimale pour remplacer une catégorie existante
+                qui diffère de la prédiction (None pour ne jamais remplacer)
+
+        Returns:
+            DataFrame: Transactions avec category_name et parent_name complétés, et les
+                       colonnes categorie_predite, confiance_categorie et categorie_suspecte
+        """
+        predictions = self.predire(df['description_fake'], df['net_amount'])
+        confiance = predictions['confiance']
+
+        if 'category_name' in df.columns:
+            categories, parents = df['category_name'], df.get('parent_name', pd.Series(np.nan, index=df.index))
+        else:
+            categories = parents = pd.Series(np.nan, index=df.index, dtype=object)
+
+        manquantes = categories.isna() & (confiance >= seuil_confiance)
+        suspectes = categories.notna() & (categories != predictions['category_name']) & (confiance >= seuil_confiance)
+        remplacees = manquantes.copy()
+        if seuil_correction is not None:
+            remplacees |= suspectes & (confiance >= seuil_correction)
+
+        return df.assign(
+            category_name=categories.where(~remplacees, predictions['category_name']),
+            parent_name=parents.where(~remplacees, predictions['parent_name']),
+            categorie_predite=predictions['category_name'],
+            confiance_categorie=confiance,
+            categorie_suspecte=suspectes & ~remplacees
+        )
+
+    def sauvegarder(self, chemin_fichier):
+        """
+        Enregistre le catégoriseur entraîné (archive numpy, sans pickle).
+
+        Args:
+            chemin_fichier (str): Fichier de destination (.npz)
+        """
+        with open(chemin_fichier, 'wb') as fichier:
+            np.savez_compressed(
+                fichier,
+                parametres=np.array([self.nb_bits, *self.tailles_ngrammes]),
+                lissage=np.array(self.lissage),
+                categories=self.categories,
+                parents=self.parents,
+                log_priors=self.log_priors,
+                log_vraisemblances=self.log_vraisemblances,
+                ngrammes_connus=self.ngrammes_connus,
+                marchands=self.marchands.index.to_numpy(dtype=str),
+                marchands_categories=self.marchands['category_name'].to_numpy(dtype=str),
+                marchands_confiances=self.marchands['confiance'].to_numpy(dtype=float)
+            )
+
+    @classmethod
+    def charger(cls, chemin_fichier):
+        """
+        Recharge un catégoriseur enregistré avec sauvegarder.
+
+        Args:
+            chemin_fichier (str): Fichier du catégoriseur
+
+        Returns:
+            CategoriseurTransactions: Catégoriseur prêt à prédire
+        """
+        with np.load(chemin_fichier, allow_pickle=False) as archive:
+            parametres = archive['parametres'].tolist()
+            categoriseur = cls(parametres[0], float(archive['lissage']), parametres[1:])
+            categoriseur.categories = archive['categories']
+            categoriseur.parents = archive['parents']
+            categoriseur.log_priors = archive['log_priors']
+            categoriseur.log_vraisemblances = archive['log_vraisemblances']
+            categoriseur.ngrammes_connus = archive['ngrammes_connus']
+            categoriseur.marchands = pd.DataFrame({
+                'category_name': archive['marchands_categories'].astype(object),
+                'confiance': archive['marchands_confiances']
+            }, index=pd.Index(archive['marchands'].astype(object), name='marchand'))
+        return categoriseur
+
+def afficher_categorisation(df):
+    """
+    Affiche le bilan d'une catégorisation automatique.
+
+    Args:
+        df (DataFrame): Transactions renvoyées par CategoriseurTransactions.categoriser
+    """
+    print(f"Transactions: {len(df)} | confiance moyenne: {df['confiance_categorie'].mean():.0%} "
+          f"| catégories suspectes: {int(df['categorie_suspecte'].sum())}")
+
+    for _, ligne in df[df['categorie_suspecte']].head(10).iterrows():
+        print(f"  - {ligne['description_fake']}: {ligne['category_name']} -> {ligne['categorie_predite']} "
+              f"({ligne['confiance_categorie']:.0%})")
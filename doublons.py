@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from marchands import normaliser_libelles
+
+# Colonnes d'identification ajoutées à la clé lorsqu'elles sont présentes
+COLONNES_PORTEE = ['user_id', 'account_id']
+
+class IndexDoublons:
+    """
+    Index persistant des transactions déjà reçues, pour écarter celles qu'une synchronisation
+    bancaire livre une seconde fois.
+
+    Chaque transaction est résumée par une empreinte de 64 bits de (utilisateur, compte, date,
+    montant en centimes, libellé normalisé, rang d'occurrence). Le rang distingue les
+    transactions identiques d'un même lot (deux cafés le même jour au même endroit) : un lot
+    qui recouvre un lot précédent redonne les mêmes rangs et ses lignes sont reconnues, alors
+    qu'une occurrence supplémentaire reçoit un nouveau rang et est conservée. Chaque ligne
+    entrante est vérifiée en O(1), sans relire l'historique.
+
+    Limite : le rang est calculé dans le lot reçu. Une seconde transaction réellement
+    identique (même jour, montant et marchand) livrée seule dans une synchronisation
+    ultérieure reçoit le rang 0 et est écartée comme doublon. Sans identifiant de
+    transaction fourni par la banque, elle ne se distingue pas d'une nouvelle livraison de
+    la première ; elle n'est conservée que si le lot qui la contient recouvre aussi la
+    première (cas des synchronisations par fenêtres de jours complets).
+    """
+
+    def __init__(self):
+        self.cles = set()
+
+    def empreintes(self, df):
+        """
+        Calcule l'empreinte de chaque transaction d'un lot.
+
+        Args:
+            df (DataFrame): Transactions (dates au format datetime)
+
+        Returns:
+            ndarray: Empreintes (uint64) alignées sur df
+        """
+        colonnes = {
+            colonne: df[colonne].astype(str).to_numpy()
+            for colonne in COLONNES_PORTEE if colonne in df.columns
+        }
+        colonnes['jour'] = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        colonnes['centimes'] = np.round(df['net_amount'].to_numpy(dtype=float) * 100).astype(np.int64)
+        colonnes['libelle'] = normaliser_libelles(df['description_fake']).to_numpy()
+
+        base = pd.util.hash_pandas_object(pd.DataFrame(colonnes), index=False).to_numpy()
+
+        # Rang de chaque transaction parmi les transactions identiques du lot
+        rangs = pd.Series(base).groupby(base).cumcount().to_numpy()
+
+        return pd.util.hash_pandas_object(pd.DataFrame({'base': base, 'rang': rangs}), index=False).to_numpy()
+
+    def filtrer(self, df, enregistrer=True):
+        """
+        Écarte les transactions déjà présentes dans l'index.
+
+        Args:
+            df (DataFrame): Lot de transactions reçu
+            enregistrer (bool): Ajouter les transactions conservées à l'index
+
+        Returns:
+            tuple: (transactions nouvelles, rapport : nombres de lignes reçues, conservées et
+                    écartées, et transactions écartées)
+        """
+        empreintes = self.empreintes(df)
+        cles = self.cles
+        deja_recues = np.fromiter((empreinte in cles for empreinte in empreintes.tolist()),
+                                  dtype=bool, count=len(empreintes))
+
+        if enregistrer:
+            cles.update(empreintes[~deja_recues].tolist())
+
+        rapport = {
+            'nb_recues': len(df),
+            'nb_conservees': int((~deja_recues).sum()),
+            'nb_doublons': int(deja_recues.sum()),
+            'doublons': df[deja_recues]
+        }
+
+        return df[~deja_recues], rapport
+
+    def sauvegarder(self, chemin_fichier):
+        """
+        Enregistre l'index (tableau numpy d'empreintes).
+
+        Args:
+            chemin_fichier (str): Fichier de destination (.npy)
+        """
+        with open(chemin_fichier, 'wb') as fichier:
+            np.save(fichier, np.fromiter(self.cles, dtype=np.uint64, count=len(self.cles)))
+
+    @classmethod
+    def charger(cls, chemin_fichier):
+        """
+        Recharge un index enregistré avec sauvegarder (index vide si le fichier n'existe pas).
+
+        Args:
+            chemin_fichier (str): Fichier de l'index
+
+        Returns:
+            IndexDoublons: Index chargé
+        """
+        index = cls()
+        if os.path.exists(chemin_fichier):
+            index.cles = set(np.load(chemin_fichier).tolist())
+        return index
+
+    def __len__(self):
+        return len(self.cles)
+
+def afficher_rapport_doublons(rapport):
+    """
+    Affiche le rapport de déduplication d'un lot de transactions.
+
+    Args:
+        rapport (dict): Rapport renvoyé par IndexDoublons.filtrer
+    """
+    print(f"Transactions reçues: {rapport['nb_recues']} | conservées: {rapport['nb_conservees']} "
+          f"| doublons écartés: {rapport['nb_doublons']}")
+
+    for _, ligne in rapport['doublons'].head(10).iterrows():
+        date = ligne['date'].strftime('%d/%m/%Y') if pd.notna(ligne['date']) else '?'
+        print(f"  - {date} {ligne['description_fake']}: {ligne['net_amount']:.2f}€")
+    if rapport['nb_doublons'] > 10:
+        print(f"  ... et {rapport['nb_doublons'] - 10} autres")
@@ -1,33 +1,245 @@
+import io
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 
-def charger_donnees(chemin_fichier):
+from formats_arrow import FORMATS_ARROW, lire_transactions_arrow
+from marchands import normaliser_libelles
+from recurrences import detecter_flux_recurrents
+from resultats import (
+    ResultatCapaciteEmprunt,
+    ResultatCategoriesDepenses,
+    ResultatDepensesInhabituelles,
+    ResultatPotentielEconomies,
+    ResultatPrelevements,
+    ResultatTendancesMensuelles
+)
+from revenus import calculer_revenus
+from validation import sauvegarder_quarantaine, valider_transactions
+
+# Catégories non essentielles où des économies sont possibles (dépenses compressibles)
+CATEGORIES_NON_ESSENTIELLES = [
+    'Loisirs & Sorties', 'Achats & Shopping', 'Voyages / Vacances', 
+    'Esthétique & Soins', 'Divers', 'Restaurants'
+]
+
+# Limites de réduction par catégorie : (part maximale réductible de la dépense mensuelle,
+# pénibilité par euro économisé). Le planificateur réduit d'abord les postes les moins pénibles.
+LIMITES_REDUCTION = {
+    'Divers': (0.3, 1.0),
+    'Loisirs & Sorties': (0.3, 1.0),
+    'Achats & Shopping': (0.3, 1.2),
+    'Restaurants': (0.3, 1.2),
+    'Voyages / Vacances': (0.3, 1.5),
+    'Esthétique & Soins': (0.3, 2.0)
+}
+
+# Objectifs d'économies mensuelles évalués par défaut dans la courbe d'économies
+OBJECTIFS_COURBE = [100, 200, 300, 500]
+
+# Montants en centimes entiers (int64), ajoutés au chargement avec centimes=True
+COLONNE_CENTIMES = 'montant_centimes'
+
+def montants_centimes(df):
+    """
+    Renvoie les montants des transactions en centimes entiers : les sommes sur des entiers
+    sont exactes, quelle que soit la longueur de l'historique.
+    
+    Args:
+        df (DataFrame): Données de transactions
+        
+    Returns:
+        Series: Montants en centimes (int64), alignés sur df
+    """
+    if COLONNE_CENTIMES in df.columns:
+        return df[COLONNE_CENTIMES]
+    return pd.Series(np.rint(df['net_amount'].to_numpy(dtype=float) * 100).astype(np.int64), index=df.index)
+
+def vers_euros(centimes):
+    """
+    Convertit des centimes entiers en euros, pour la présentation des résultats.
+    
+    Args:
+        centimes (int, ndarray ou Series): Montants en centimes
+        
+    Returns:
+        float, ndarray ou Series: Montants en euros
+    """
+    if isinstance(centimes, (pd.Series, np.ndarray)):
+        return centimes / 100
+    return int(centimes) / 100
+
+def charger_donnees(chemin_fichier, colonnes=None, date_debut=None, date_fin=None, table_marchands=None,
+                    index_doublons=None, categoriseur=None, centimes=False, valider=False,
+                    fichier_quarantaine=None):
     """
-    Charge les données de transactions depuis un fichier CSV.
+    Charge les données de transactions depuis un fichier CSV, Parquet ou Arrow IPC/Feather.
     
     Args:
-        chemin_fichier (str): Chemin vers le fichier CSV des transactions
+        chemin_fichier (str): Chemin vers le fichier des transactions (.csv, .parquet, .feather, .arrow)
+        colonnes (list): Colonnes à lire (None pour toutes ; la colonne date est toujours lue)
+        date_debut (str ou Timestamp): Date minimale incluse (None pour ne pas borner)
+        date_fin (str ou Timestamp): Date maximale incluse (None pour ne pas borner)
+        table_marchands (TableMarchands): Table d'internement utilisée pour ajouter la colonne
+            merchant_id (identifiant entier du marchand normalisé)
+        index_doublons (IndexDoublons): Index des transactions déjà reçues ; celles que le
+            fichier livre une seconde fois sont écartées (décompte dans df.attrs['rapport_doublons'])
+        categoriseur (CategoriseurTransactions): Catégoriseur entraîné utilisé pour compléter les
+            catégories manquantes (colonnes categorie_predite et confiance_categorie ajoutées)
+        centimes (bool): Ajouter la colonne montant_centimes (montants en centimes entiers,
+            utilisés par les agrégations) ; net_amount est alors arrondi au centime
+        valider (bool): Valider les lignes (dates, montants, catégories) et écarter les lignes
+            inexploitables (rapport dans df.attrs['rapport_validation'])
+        fichier_quarantaine (str): Fichier où enregistrer les lignes écartées avec leurs motifs
         
     Returns:
         DataFrame: Données de transactions chargées
     """
     try:
-        # Chargement des données avec pandas
-        df = pd.read_csv(chemin_fichier)
+        if colonnes is not None and 'date' not in colonnes:
+            colonnes = ['date'] + list(colonnes)
+        
+        if str(chemin_fichier).lower().endswith(tuple(FORMATS_ARROW)):
+            # Parquet/Arrow : projection des colonnes et filtre sur la période faits à la lecture
+            df = lire_transactions_arrow(chemin_fichier, colonnes, date_debut, date_fin)
+        else:
+            # Chargement des données avec pandas
+            df = pd.read_csv(chemin_fichier, usecols=colonnes)
+        
+        # Validation : les lignes inexploitables sont mises en quarantaine avec leurs motifs
+        rapport_validation = None
+        if valider:
+            df, quarantaine, rapport_validation = valider_transactions(df, categories_requises=categoriseur is None)
+            if rapport_validation['nb_quarantaine']:
+                print(f"{rapport_validation['nb_quarantaine']} transactions mises en quarantaine "
+                      f"sur {rapport_validation['nb_lignes']}")
+                if fichier_quarantaine is not None:
+                    sauvegarder_quarantaine(quarantaine, fichier_quarantaine)
         
         # Conversion de la colonne date en format datetime
-        df['date'] = pd.to_datetime(df['date'], format="%B %d, %Y", errors='coerce')
+        if not pd.api.types.is_datetime64_any_dtype(df['date']):
+            df['date'] = pd.to_datetime(df['date'], format="%B %d, %Y", errors='coerce')
+        
+        # Restriction à la période demandée
+        if date_debut is not None:
+            df = df[df['date'] >= pd.Timestamp(date_debut)]
+        if date_fin is not None:
+            df = df[df['date'] <= pd.Timestamp(date_fin)]
+        
+        # Transactions déjà reçues lors d'un chargement ou d'une synchronisation précédente
+        if index_doublons is not None:
+            df, rapport = index_doublons.filtrer(df)
+            if rapport['nb_doublons']:
+                print(f"{rapport['nb_doublons']} transactions déjà reçues écartées sur {rapport['nb_recues']}")
+            df.attrs['rapport_doublons'] = {cle: valeur for cle, valeur in rapport.items() if cle != 'doublons'}
         
-        # Tri des données par date
-        df = df.sort_values('date')
+        # Catégories manquantes complétées par le catégoriseur local
+        if categoriseur is not None:
+            nb_manquantes = int(df['category_name'].isna().sum()) if 'category_name' in df.columns else len(df)
+            df = categoriseur.categoriser(df)
+            if nb_manquantes:
+                print(f"{nb_manquantes - int(df['category_name'].isna().sum())} catégories complétées "
+                      f"automatiquement sur {nb_manquantes} manquantes")
+        
+        # Montants en centimes entiers : les totaux des analyses sont exacts
+        if centimes:
+            df[COLONNE_CENTIMES] = montants_centimes(df)
+            df['net_amount'] = vers_euros(df[COLONNE_CENTIMES])
+        
+        # Identifiant entier du marchand, à la place du libellé brut pour les regroupements
+        if table_marchands is not None:
+            df['merchant_id'] = table_marchands.encoder(df['description_fake'])
+        
+        # Tri des données par date (les dates invalides sont placées à la fin)
+        df = df.sort_values('date', kind='stable')
+        if rapport_validation is not None:
+            df.attrs['rapport_validation'] = rapport_validation
         
         return df
     except Exception as e:
         print(f"Erreur lors du chargement des données: {e}")
         return None
 
+def bornes_fenetre(fenetre, date_reference):
+    """
+    Calcule les bornes d'une fenêtre glissante se terminant à la date de référence.
+    
+    Args:
+        fenetre: 'mois_en_cours' (depuis le début du mois), '12_derniers_mois' (les 12 mois
+            calendaires se terminant par le mois de référence), ou un nombre de jours
+            (entier ou chaîne 'N_jours')
+        date_reference (Timestamp): Dernier jour inclus dans la fenêtre
+        
+    Returns:
+        tuple: (date de début incluse, date de fin incluse)
+    """
+    fin = pd.Timestamp(date_reference).normalize()
+    
+    if fenetre == 'mois_en_cours':
+        debut = fin.replace(day=1)
+    elif fenetre == '12_derniers_mois':
+        debut = (fin.to_period('M') - 11).start_time
+    else:
+        nb_jours = int(str(fenetre).replace('_jours', ''))
+        debut = fin - pd.Timedelta(days=nb_jours - 1)
+    
+    return debut, fin
+
+def selectionner_periode(df, date_debut=None, date_fin=None, fenetre=None, date_reference=None):
+    """
+    Restreint les transactions à une période par recherche dichotomique sur les dates triées.
+    
+    La sélection est une tranche contiguë du DataFrame (searchsorted), sans masque booléen
+    sur l'historique complet.
+    
+    Args:
+        df (DataFrame): Données de transactions triées par date (comme renvoyées par charger_donnees)
+        date_debut (str ou Timestamp): Date minimale incluse
+        date_fin (str ou Timestamp): Date maximale incluse
+        fenetre: Fenêtre glissante (voir bornes_fenetre), prioritaire sur date_debut/date_fin
+        date_reference (str ou Timestamp): Fin de la fenêtre glissante (par défaut la dernière transaction)
+        
+    Returns:
+        DataFrame: Transactions de la période
+    """
+    if date_debut is None and date_fin is None and fenetre is None:
+        return df
+    
+    # Vérification systématique (O(n)) : un drapeau dans df.attrs serait recopié par pandas
+    # sur les DataFrame retriés ou concaténés et ne garantirait plus l'ordre. Les dates
+    # invalides (NaT) doivent aussi former la fin du tableau (cas d'une concaténation)
+    manquantes = df['date'].isna().to_numpy()
+    if not (np.all(manquantes[:-1] <= manquantes[1:]) and df['date'].dropna().is_monotonic_increasing):
+        df = df.sort_values('date', kind='stable', na_position='last')
+    
+    dates = df['date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    dates = dates.to_numpy()
+    
+    # Les dates invalides (NaT) sont en fin de tableau : ne chercher que dans les dates valides
+    nb_valides = np.searchsorted(dates, np.datetime64('NaT'), side='left')
+    dates = dates[:nb_valides]
+    
+    if fenetre is not None:
+        if date_reference is None:
+            if nb_valides == 0:
+                return df.iloc[0:0]
+            date_reference = dates[-1]
+        date_debut, date_fin = bornes_fenetre(fenetre, date_reference)
+    
+    debut = 0
+    fin = nb_valides
+    if date_debut is not None:
+        debut = np.searchsorted(dates, np.datetime64(pd.Timestamp(date_debut).normalize()), side='left')
+    if date_fin is not None:
+        lendemain = pd.Timestamp(date_fin).normalize() + pd.Timedelta(days=1)
+        fin = np.searchsorted(dates, np.datetime64(lendemain), side='left')
+    
+    return df.iloc[debut:max(debut, fin)]
+
 def identifier_type_transaction(description):
     """
     Identifie le type de transaction (prélèvement automatique ou achat ponctuel)
@@ -51,42 +263,79 @@ def identifier_type_transaction(description):
     else:
         return 'autre'
 
-def analyser_part_prelevements(df):
+def identifier_types_transactions(descriptions):
+    """
+    Version vectorisée de identifier_type_transaction pour une série de descriptions.
+    
+    Args:
+        descriptions (Series): Descriptions des transactions
+        
+    Returns:
+        Series: Type de chaque transaction ('prelevement_auto', 'achat_ponctuel', ou 'autre')
+    """
+    descriptions = descriptions.astype(str).str.lower()
+    
+    est_prelevement = descriptions.str.contains('prlv', regex=False) | descriptions.str.contains('prelevement', regex=False)
+    est_carte = descriptions.str.contains('cb', regex=False) | descriptions.str.contains('carte', regex=False)
+    
+    types = np.select([est_prelevement, est_carte], ['prelevement_auto', 'achat_ponctuel'], default='autre')
+    
+    return pd.Series(types, index=descriptions.index)
+
+def analyser_part_prelevements(df, date_debut=None, date_fin=None, fenetre=None, detecter_recurrences=True):
     """
     Analyse la part des prélèvements automatiques par rapport aux achats ponctuels.
     
+    Les paiements récurrents détectés par leur périodicité (abonnements payés par carte,
+    virements réguliers...) sont comptés comme prélèvements automatiques.
+    
     Args:
         df (DataFrame): Données de transactions
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+        detecter_recurrences (bool): Reclasser les paiements récurrents en prélèvements automatiques
         
     Returns:
-        dict: Résultats de l'analyse
+        ResultatPrelevements: Résultats de l'analyse
     """
-    # Copie du DataFrame pour éviter de modifier l'original
-    df_analyse = df.copy()
+    # Restreindre l'analyse à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
+    
+    # Ajout d'une colonne pour le type de transaction (sur un nouveau DataFrame : les
+    # transactions reçues sont partagées et ne sont jamais modifiées)
+    df_analyse = df.assign(type_transaction=identifier_types_transactions(df['description_fake']))
     
-    # Ajout d'une colonne pour le type de transaction
-    df_analyse['type_transaction'] = df_analyse['description_fake'].apply(identifier_type_transaction)
+    # Reclasser les paiements récurrents détectés par leur périodicité
+    abonnements = []
+    if detecter_recurrences:
+        flux, est_recurrente = detecter_flux_recurrents(df_analyse)
+        df_analyse.loc[est_recurrente, 'type_transaction'] = 'prelevement_auto'
+        flux_actifs = flux[flux['actif']]
+        abonnements = flux_actifs[['marchand', 'periodicite', 'montant', 'prochaine_date', 'parent_name']].to_dict('records')
     
     # Filtrer les dépenses (montants négatifs)
-    df_depenses = df_analyse[df_analyse['net_amount'] < 0].copy()
+    df_depenses = df_analyse[df_analyse['net_amount'] < 0]
     
-    # Calculer le montant total des dépenses par type de transaction
-    montants_par_type = df_depenses.groupby('type_transaction')['net_amount'].sum().abs()
+    # Calculer le montant total des dépenses par type de transaction (en centimes entiers)
+    centimes_par_type = montants_centimes(df_depenses).groupby(df_depenses['type_transaction']).sum().abs()
+    montants_par_type = vers_euros(centimes_par_type)
     
     # Calculer les pourcentages
-    total_depenses = montants_par_type.sum()
-    pourcentages = (montants_par_type / total_depenses * 100).round(2)
+    total_depenses = vers_euros(centimes_par_type.sum())
+    pourcentages = (centimes_par_type / centimes_par_type.sum() * 100).round(2)
     
     # Compter le nombre de transactions par type
     nombre_transactions = df_depenses['type_transaction'].value_counts()
     
     # Préparer les résultats
-    resultats = {
-        'montants': montants_par_type.to_dict(),
-        'pourcentages': pourcentages.to_dict(),
-        'nombre_transactions': nombre_transactions.to_dict(),
-        'total_depenses': total_depenses
-    }
+    resultats = ResultatPrelevements(
+        montants=montants_par_type.to_dict(),
+        pourcentages=pourcentages.to_dict(),
+        nombre_transactions=nombre_transactions.to_dict(),
+        total_depenses=total_depenses,
+        abonnements=abonnements
+    )
     
     return resultats
 
@@ -114,13 +363,24 @@ def afficher_part_prelevements(resultats):
             print(f"  - Pourcentage du budget: {pourcentage}%")
             print(f"  - Nombre de transactions: {nb_transactions}")
             print()
+    
+    # Afficher les paiements récurrents détectés
+    abonnements = resultats.get('abonnements', [])
+    if abonnements:
+        print("Paiements récurrents détectés:")
+        for abonnement in abonnements:
+            prochaine_date = abonnement['prochaine_date'].strftime('%d/%m/%Y')
+            print(f"  - {abonnement['marchand']} ({abonnement['periodicite']}): "
+                  f"{abonnement['montant']:.2f} €, prochaine échéance le {prochaine_date}")
 
-def visualiser_part_prelevements(resultats):
+def visualiser_part_prelevements(resultats, fichier='repartition_depenses.png', afficher=True):
     """
     Crée une visualisation graphique de la répartition des dépenses.
     
     Args:
         resultats (dict): Résultats de l'analyse
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
     """
     # Préparer les données pour le graphique
     labels = [k.replace('_', ' ').capitalize() for k in resultats['pourcentages'].keys()]
@@ -137,30 +397,48 @@ def visualiser_part_prelevements(resultats):
     plt.legend(montants, loc="best")
     
     plt.tight_layout()
-    plt.savefig('repartition_depenses.png')
-    plt.show()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
 
-def analyser_categories_depenses(df):
+def analyser_categories_depenses(df, date_debut=None, date_fin=None, fenetre=None):
     """
     Analyse les principales catégories de dépenses.
     
     Args:
         df (DataFrame): Données de transactions
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
         
     Returns:
-        dict: Résultats de l'analyse des catégories
+        ResultatCategoriesDepenses: Résultats de l'analyse des catégories
     """
-    # Copie du DataFrame pour éviter de modifier l'original
-    df_analyse = df.copy()
+    # Restreindre l'analyse à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
     
     # Filtrer les dépenses (montants négatifs)
-    df_depenses = df_analyse[df_analyse['net_amount'] < 0].copy()
+    df_depenses = df[df['net_amount'] < 0]
     
-    # Calculer le montant total des dépenses par catégorie principale
-    montants_par_categorie = df_depenses.groupby('parent_name')['net_amount'].sum().abs()
+    # Calculer le montant total des dépenses par catégorie principale (en centimes entiers)
+    montants_par_categorie = vers_euros(montants_centimes(df_depenses).groupby(df_depenses['parent_name']).sum().abs())
     
-    # Calculer les pourcentages
-    total_depenses = montants_par_categorie.sum()
+    return calculer_categories_depenses(montants_par_categorie)
+
+def calculer_categories_depenses(montants_par_categorie):
+    """
+    Construit les résultats de l'analyse des catégories à partir des montants agrégés.
+    
+    Args:
+        montants_par_categorie (Series): Montant total des dépenses par catégorie principale
+        
+    Returns:
+        ResultatCategoriesDepenses: Résultats de l'analyse des catégories
+    """
+    # Calculer les pourcentages (total calculé en centimes entiers)
+    total_depenses = vers_euros(np.rint(montants_par_categorie.to_numpy(dtype=float) * 100).astype(np.int64).sum())
     pourcentages = (montants_par_categorie / total_depenses * 100).round(2)
     
     # Trier par montant décroissant
@@ -168,11 +446,11 @@ def analyser_categories_depenses(df):
     pourcentages = pourcentages.reindex(montants_par_categorie.index)
     
     # Préparer les résultats
-    resultats = {
-        'montants': montants_par_categorie.to_dict(),
-        'pourcentages': pourcentages.to_dict(),
-        'total_depenses': total_depenses
-    }
+    resultats = ResultatCategoriesDepenses(
+        montants=montants_par_categorie.to_dict(),
+        pourcentages=pourcentages.to_dict(),
+        total_depenses=total_depenses
+    )
     
     return resultats
 
@@ -201,12 +479,14 @@ def obtenir_recommandations_budget():
     
     return recommandations
 
-def comparer_avec_recommandations(resultats_analyse):
+def comparer_avec_recommandations(resultats_analyse, referentiel=None):
     """
     Compare les dépenses réelles avec les recommandations budgétaires.
     
     Args:
         resultats_analyse (dict): Résultats de l'analyse des catégories
+        referentiel (ReferentielDepenses): Référentiel de population pour situer chaque
+            catégorie parmi les autres utilisateurs (optionnel)
         
     Returns:
         dict: Comparaison entre dépenses réelles et recommandations
@@ -227,6 +507,11 @@ def comparer_avec_recommandations(resultats_analyse):
             'difference': difference,
             'statut': 'conforme' if abs(difference) <= 3 else ('supérieur' if difference > 0 else 'inférieur')
         }
+        
+        # Position parmi les autres utilisateurs (part d'utilisateurs dépensant autant ou moins)
+        if referentiel is not None:
+            comparaison[categorie]['percentile_population'] = referentiel.percentile(categorie, pourcentage_reel)
+            comparaison[categorie]['pourcentage_median_population'] = referentiel.mediane(categorie)
     
     return comparaison
 
@@ -265,8 +550,13 @@ def afficher_categories_depenses(resultats, comparaison):
             print(f"  - Statut: ⚠️ Supérieur aux recommandations (différence: +{difference:.2f}%)")
         elif statut == 'inférieur':
             print(f"  - Statut: ℹ️ Inférieur aux recommandations (différence: {difference:.2f}%)")
+        
+        # Afficher la position parmi les autres utilisateurs
+        if comp.get('percentile_population') is not None:
+            print(f"  - Vous y consacrez une part plus élevée que {comp['percentile_population']:.0f}% des utilisateurs "
+                  f"(médiane: {comp['pourcentage_median_population']:.2f}%)")
 
-def visualiser_categories_depenses(resultats, comparaison):
+def visualiser_categories_depenses(resultats, comparaison, fichier='comparaison_categories.png', afficher=True):
     """
     Crée une visualisation graphique des catégories de dépenses et leur comparaison
     avec les recommandations budgétaires.
@@ -274,6 +564,8 @@ def visualiser_categories_depenses(resultats, comparaison):
     Args:
         resultats (dict): Résultats de l'analyse des catégories
         comparaison (dict): Comparaison avec les recommandations
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
     """
     # Préparer les données pour le graphique
     categories = list(resultats['pourcentages'].keys())
@@ -313,10 +605,14 @@ def visualiser_categories_depenses(resultats, comparaison):
     autolabel(rects2)
     
     plt.tight_layout()
-    plt.savefig('comparaison_categories.png')
-    plt.show()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
 
-def identifier_depenses_inhabituelles(df, seuil_z_score=2.5, periode_recente_mois=3):
+def identifier_depenses_inhabituelles(df, seuil_z_score=2.5, periode_recente_mois=3,
+                                      date_debut=None, date_fin=None, fenetre=None, table_marchands=None):
     """
     Identifie les dépenses inhabituelles dans les transactions récentes.
     
@@ -324,19 +620,25 @@ def identifier_depenses_inhabituelles(df, seuil_z_score=2.5, periode_recente_moi
         df (DataFrame): Données de transactions
         seuil_z_score (float): Seuil du Z-score pour considérer une dépense comme inhabituelle
         periode_recente_mois (int): Nombre de mois considérés comme "récents"
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+        table_marchands (TableMarchands): Table ayant produit la colonne merchant_id, utilisée
+            pour retrouver le nom des marchands sans renormaliser les libellés
         
     Returns:
-        dict: Résultats de l'analyse des dépenses inhabituelles
+        ResultatDepensesInhabituelles: Résultats de l'analyse des dépenses inhabituelles
     """
-    # Copie du DataFrame pour éviter de modifier l'original
-    df_analyse = df.copy()
+    # Restreindre l'analyse à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
     
-    # S'assurer que la colonne date est au format datetime
-    if not pd.api.types.is_datetime64_any_dtype(df_analyse['date']):
-        df_analyse['date'] = pd.to_datetime(df_analyse['date'], errors='coerce')
+    # S'assurer que la colonne date est au format datetime (nouveau DataFrame, l'original
+    # est partagé entre les analyses et n'est jamais modifié)
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date'], errors='coerce'))
     
     # Filtrer les dépenses (montants négatifs)
-    df_depenses = df_analyse[df_analyse['net_amount'] < 0].copy()
+    df_depenses = df[df['net_amount'] < 0]
     
     # Calculer la date limite pour les transactions récentes
     date_max = df_depenses['date'].max()
@@ -347,60 +649,62 @@ def identifier_depenses_inhabituelles(df, seuil_z_score=2.5, periode_recente_moi
         date_limite = pd.NaT
     
     # Filtrer les transactions récentes
-    df_recentes = df_depenses[df_depenses['date'] >= date_limite].copy() if pd.notna(date_limite) else df_depenses.copy()
+    df_recentes = df_depenses[df_depenses['date'] >= date_limite] if pd.notna(date_limite) else df_depenses
+    
+    # Statistiques des catégories ayant suffisamment de données historiques (au moins 5 dépenses)
+    stats = df_depenses['net_amount'].abs().groupby(df_depenses['category_name'], sort=False).agg(
+        ['mean', 'std', 'size'])
+    stats = stats[stats['size'] >= 5]
+    stats_par_categorie = {
+        categorie: {'moyenne': moyenne, 'ecart_type': ecart_type, 'count': int(nombre)}
+        for categorie, moyenne, ecart_type, nombre in zip(stats.index, stats['mean'], stats['std'], stats['size'])
+    }
     
-    # Calculer les statistiques par catégorie
-    stats_par_categorie = {}
-    depenses_inhabituelles = []
+    # Z-score de chaque transaction récente par rapport à sa catégorie (catégories sans
+    # statistiques ou d'écart-type nul exclues)
+    moyennes = df_recentes['category_name'].map(stats['mean']).to_numpy(dtype=float)
+    ecarts_types = df_recentes['category_name'].map(stats['std']).to_numpy(dtype=float)
+    montants = df_recentes['net_amount'].abs().to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_scores = (montants - moyennes) / ecarts_types
+    inhabituelles = (ecarts_types > 0) & (z_scores > seuil_z_score)
+    
+    # Nom de marchand des seules dépenses retenues : décodé depuis merchant_id s'il a été
+    # calculé au chargement, sinon obtenu en normalisant leur libellé
+    lignes = df_recentes[inhabituelles]
+    if table_marchands is not None and 'merchant_id' in lignes.columns:
+        marchands = table_marchands.decoder(lignes['merchant_id'].to_numpy())
+    else:
+        marchands = normaliser_libelles(lignes['description_fake']).to_numpy()
+    
+    depenses_inhabituelles = [
+        {
+            'date': date,
+            'description': description,
+            'marchand': marchand,
+            'montant': montant,
+            'categorie': categorie,
+            'parent_categorie': parent,
+            'z_score': z_score,
+            'moyenne_categorie': moyenne
+        }
+        for date, description, marchand, montant, categorie, parent, z_score, moyenne in zip(
+            lignes['date'], lignes['description_fake'], marchands, montants[inhabituelles],
+            lignes['category_name'], lignes['parent_name'], z_scores[inhabituelles], moyennes[inhabituelles]
+        )
+    ]
     
-    for categorie in df_depenses['category_name'].unique():
-        # Transactions historiques pour cette catégorie
-        df_cat_hist = df_depenses[df_depenses['category_name'] == categorie]
-        
-        # S'il y a suffisamment de données historiques
-        if len(df_cat_hist) >= 5:
-            montants = df_cat_hist['net_amount'].abs()
-            moyenne = montants.mean()
-            ecart_type = montants.std()
-            
-            # Stocker les statistiques
-            stats_par_categorie[categorie] = {
-                'moyenne': moyenne,
-                'ecart_type': ecart_type,
-                'count': len(montants)
-            }
-            
-            # Vérifier les transactions récentes pour cette catégorie
-            df_cat_recentes = df_recentes[df_recentes['category_name'] == categorie]
-            
-            for _, transaction in df_cat_recentes.iterrows():
-                montant = abs(transaction['net_amount'])
-                
-                # Calculer le Z-score
-                if ecart_type > 0:  # Éviter division par zéro
-                    z_score = (montant - moyenne) / ecart_type
-                    
-                    # Si le Z-score dépasse le seuil, c'est une dépense inhabituelle
-                    if z_score > seuil_z_score:
-                        depenses_inhabituelles.append({
-                            'date': transaction['date'],
-                            'description': transaction['description_fake'],
-                            'montant': montant,
-                            'categorie': transaction['category_name'],
-                            'parent_categorie': transaction['parent_name'],
-                            'z_score': z_score,
-                            'moyenne_categorie': moyenne
-                        })
-    
-    # Trier les dépenses inhabituelles par Z-score décroissant
-    depenses_inhabituelles = sorted(depenses_inhabituelles, key=lambda x: x['z_score'], reverse=True)
-    
-    return {
-        'depenses_inhabituelles': depenses_inhabituelles,
-        'stats_par_categorie': stats_par_categorie,
-        'periode_recente_debut': date_limite,
-        'periode_recente_fin': date_max
-    }
+    # Trier les dépenses inhabituelles par Z-score décroissant (à Z-score égal, dans l'ordre
+    # d'apparition des catégories puis des transactions)
+    rangs = {categorie: rang for rang, categorie in enumerate(stats_par_categorie)}
+    depenses_inhabituelles = sorted(depenses_inhabituelles, key=lambda x: (-x['z_score'], rangs[x['categorie']]))
+    
+    return ResultatDepensesInhabituelles(
+        depenses_inhabituelles=depenses_inhabituelles,
+        stats_par_categorie=stats_par_categorie,
+        periode_recente_debut=date_limite,
+        periode_recente_fin=date_max
+    )
 
 def afficher_depenses_inhabituelles(resultats):
     """
@@ -454,12 +758,14 @@ def afficher_depenses_inhabituelles(resultats):
     else:
         print("Aucune dépense inhabituelle détectée dans la période récente.")
 
-def visualiser_depenses_inhabituelles(resultats):
+def visualiser_depenses_inhabituelles(resultats, fichier='depenses_inhabituelles.png', afficher=True):
     """
     Crée une visualisation graphique des dépenses inhabituelles.
     
     Args:
         resultats (dict): Résultats de l'analyse des dépenses inhabituelles
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
     """
     depenses = resultats['depenses_inhabituelles']
     
@@ -509,55 +815,62 @@ def visualiser_depenses_inhabituelles(resultats):
     autolabel(rects2)
     
     plt.tight_layout()
-    plt.savefig('depenses_inhabituelles.png')
-    plt.show()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
 
-def analyser_tendances_mensuelles(df, nb_mois_recents=6):
+def analyser_tendances_mensuelles(df, nb_mois_recents=6, date_debut=None, date_fin=None, fenetre=None):
     """
     Analyse les tendances mensuelles des dépenses.
     
     Args:
         df (DataFrame): Données de transactions
         nb_mois_recents (int): Nombre de mois à analyser
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
         
     Returns:
-        dict: Résultats de l'analyse des tendances mensuelles
+        ResultatTendancesMensuelles: Résultats de l'analyse des tendances mensuelles
     """
-    # Copie du DataFrame pour éviter de modifier l'original
-    df_analyse = df.copy()
+    # Restreindre l'analyse à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
     
-    # S'assurer que la colonne date est au format datetime
-    if not pd.api.types.is_datetime64_any_dtype(df_analyse['date']):
-        df_analyse['date'] = pd.to_datetime(df_analyse['date'], errors='coerce')
+    # S'assurer que la colonne date est au format datetime (nouveau DataFrame, l'original
+    # est partagé entre les analyses et n'est jamais modifié)
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date'], errors='coerce'))
     
     # Filtrer les dépenses (montants négatifs)
-    df_depenses = df_analyse[df_analyse['net_amount'] < 0].copy()
+    df_depenses = df[df['net_amount'] < 0]
     
     # Vérifier s'il y a des dates valides
     if df_depenses['date'].isna().all():
-        return {
-            'tendances': {},
-            'depenses_totales': {},
-            'mois_analyses': [],
-            'periode_debut': pd.NaT,
-            'periode_fin': pd.NaT
-        }
+        return ResultatTendancesMensuelles(
+            tendances={},
+            depenses_totales={},
+            mois_analyses=[],
+            periode_debut=pd.NaT,
+            periode_fin=pd.NaT
+        )
     
     # Ajouter des colonnes pour le mois et l'année
-    df_depenses['mois'] = df_depenses['date'].dt.strftime('%Y-%m')
+    df_depenses = df_depenses.assign(mois=df_depenses['date'].dt.strftime('%Y-%m'))
     
     # Obtenir les mois uniques, triés chronologiquement
     mois_uniques = sorted(df_depenses['mois'].dropna().unique())
     
     # Si aucun mois valide n'est trouvé, retourner un dictionnaire vide
     if not mois_uniques:
-        return {
-            'tendances': {},
-            'depenses_totales': {},
-            'mois_analyses': [],
-            'periode_debut': pd.NaT,
-            'periode_fin': pd.NaT
-        }
+        return ResultatTendancesMensuelles(
+            tendances={},
+            depenses_totales={},
+            mois_analyses=[],
+            periode_debut=pd.NaT,
+            periode_fin=pd.NaT
+        )
     
     # Limiter aux n derniers mois
     if len(mois_uniques) > nb_mois_recents:
@@ -566,17 +879,34 @@ def analyser_tendances_mensuelles(df, nb_mois_recents=6):
         mois_recents = mois_uniques
     
     # Filtrer pour ne garder que les mois récents
-    df_recents = df_depenses[df_depenses['mois'].isin(mois_recents)].copy()
+    df_recents = df_depenses[df_depenses['mois'].isin(mois_recents)]
     
-    # Calculer les dépenses totales par mois
-    depenses_totales = df_recents.groupby('mois')['net_amount'].sum().abs().to_dict()
+    # Calculer les dépenses totales par mois (en centimes entiers)
+    centimes_recents = montants_centimes(df_recents)
+    depenses_totales = vers_euros(centimes_recents.groupby(df_recents['mois']).sum().abs()).to_dict()
     
     # Calculer les dépenses par catégorie et par mois
+    depenses_mois_categorie = vers_euros(
+        centimes_recents.groupby([df_recents['parent_name'], df_recents['mois']]).sum().abs())
+    
+    return calculer_tendances_mensuelles(depenses_mois_categorie, depenses_totales, mois_recents)
+
+def calculer_tendances_mensuelles(depenses_mois_categorie, depenses_totales, mois_recents):
+    """
+    Construit les résultats de l'analyse des tendances à partir des montants agrégés.
+    
+    Args:
+        depenses_mois_categorie (Series): Dépenses indexées par (catégorie principale, mois 'AAAA-MM')
+        depenses_totales (dict): Dépenses totales par mois
+        mois_recents (list): Mois analysés, triés chronologiquement
+        
+    Returns:
+        ResultatTendancesMensuelles: Résultats de l'analyse des tendances mensuelles
+    """
     depenses_par_categorie = {}
     
-    for categorie in df_recents['parent_name'].unique():
-        df_cat = df_recents[df_recents['parent_name'] == categorie]
-        depenses_mensuelles = df_cat.groupby('mois')['net_amount'].sum().abs()
+    for categorie, depenses_mensuelles in depenses_mois_categorie.groupby(level=0):
+        depenses_mensuelles = depenses_mensuelles.droplevel(0).sort_index()
         
         # Calculer la variation en pourcentage entre le premier et le dernier mois
         if len(depenses_mensuelles) >= 2:
@@ -622,78 +952,172 @@ def analyser_tendances_mensuelles(df, nb_mois_recents=6):
         debut = pd.NaT
         fin = pd.NaT
     
-    return {
-        'tendances': depenses_par_categorie,
-        'depenses_totales': depenses_totales,
-        'mois_analyses': mois_recents,
-        'periode_debut': debut,
-        'periode_fin': fin
-    }
+    return ResultatTendancesMensuelles(
+        tendances=depenses_par_categorie,
+        depenses_totales=depenses_totales,
+        mois_analyses=mois_recents,
+        periode_debut=debut,
+        periode_fin=fin
+    )
 
-def analyser_potentiel_economies(df, montant_cible=200):
+def analyser_potentiel_economies(df, montant_cible=200, date_debut=None, date_fin=None, fenetre=None,
+                                 limites=None, objectifs=None):
     """
     Analyse les dépenses pour identifier des opportunités d'économies.
     
     Args:
         df (DataFrame): Données de transactions
         montant_cible (float): Montant d'économies visé par mois
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+        limites (dict): Par catégorie, (part maximale réductible, pénibilité) (LIMITES_REDUCTION par défaut)
+        objectifs (list): Objectifs mensuels évalués dans la courbe d'économies (OBJECTIFS_COURBE par défaut)
         
     Returns:
-        dict: Résultats de l'analyse des économies potentielles
+        ResultatPotentielEconomies: Résultats de l'analyse des économies potentielles
     """
-    # Copie du DataFrame pour éviter de modifier l'original
-    df_analyse = df.copy()
+    # Restreindre l'analyse à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
     
     # Filtrer les dépenses (montants négatifs)
-    df_depenses = df_analyse[df_analyse['net_amount'] < 0].copy()
+    df_depenses = df[df['net_amount'] < 0]
     
     # Calculer les dépenses moyennes mensuelles par catégorie
     # Ajouter une colonne pour le mois
     if not pd.api.types.is_datetime64_any_dtype(df_depenses['date']):
-        df_depenses['date'] = pd.to_datetime(df_depenses['date'], errors='coerce')
+        df_depenses = df_depenses.assign(date=pd.to_datetime(df_depenses['date'], errors='coerce'))
     
     # Compter le nombre de mois uniques dans les données
     if df_depenses['date'].isna().all():
         nb_mois = 1  # Si pas de dates valides, supposer 1 mois
     else:
-        df_depenses['mois'] = df_depenses['date'].dt.strftime('%Y-%m')
-        mois_uniques = df_depenses['mois'].dropna().unique()
+        mois_uniques = df_depenses['date'].dt.strftime('%Y-%m').dropna().unique()
         nb_mois = max(len(mois_uniques), 1)  # Au moins 1 mois
     
-    # Calculer les dépenses totales par catégorie
-    depenses_par_categorie = df_depenses.groupby('parent_name')['net_amount'].sum().abs()
+    # Calculer les dépenses totales par catégorie (en centimes entiers)
+    depenses_par_categorie = vers_euros(montants_centimes(df_depenses).groupby(df_depenses['parent_name']).sum().abs())
     
-    # Calculer les dépenses moyennes mensuelles par catégorie
-    depenses_mensuelles = (depenses_par_categorie / nb_mois).round(2)
+    return calculer_potentiel_economies(depenses_par_categorie, nb_mois, montant_cible, limites, objectifs)
+
+def preparer_plan_economies(depenses_mensuelles, limites=None):
+    """
+    Calcule la réduction maximale de chaque catégorie et les classe par pénibilité croissante.
     
-    # Identifier les catégories non essentielles où des économies sont possibles
-    categories_non_essentielles = [
-        'Loisirs & Sorties', 'Achats & Shopping', 'Voyages / Vacances', 
-        'Esthétique & Soins', 'Divers', 'Restaurants'
-    ]
+    Args:
+        depenses_mensuelles (Series): Dépenses mensuelles moyennes par catégorie principale
+        limites (dict): Par catégorie, (part maximale réductible, pénibilité par euro économisé)
+        
+    Returns:
+        DataFrame: Une ligne par catégorie réductible, dans l'ordre où le plan les réduit
+    """
+    if limites is None:
+        limites = LIMITES_REDUCTION
+    
+    reductibles = depenses_mensuelles[depenses_mensuelles.index.isin(list(limites))]
+    plan = pd.DataFrame({
+        'depense_mensuelle': reductibles,
+        'part_reductible': [limites[categorie][0] for categorie in reductibles.index],
+        'penibilite': [limites[categorie][1] for categorie in reductibles.index]
+    })
+    # Réduction arrondie au centime, calculée en centimes entiers
+    plan['reduction_possible'] = vers_euros(
+        np.rint(np.rint(plan['depense_mensuelle'] * 100) * plan['part_reductible']).astype(np.int64))
+    
+    # À pénibilité égale, réduire d'abord les postes offrant le plus d'économies
+    return plan.sort_values(['penibilite', 'reduction_possible'], ascending=[True, False], kind='stable')
+
+def balayer_objectifs_economies(plan, objectifs):
+    """
+    Répartit chaque objectif d'économies sur les catégories, de la moins pénible à la plus pénible
+    (sac à dos fractionnaire : solution de pénibilité totale minimale).
     
-    # Filtrer les catégories non essentielles
-    depenses_non_essentielles = depenses_mensuelles[depenses_mensuelles.index.isin(categories_non_essentielles)]
+    Tous les objectifs sont évalués en une seule opération : chaque catégorie prend ce qui reste
+    de l'objectif après les catégories moins pénibles, dans la limite de sa réduction possible.
     
-    # Trier par montant décroissant
-    depenses_non_essentielles = depenses_non_essentielles.sort_values(ascending=False)
+    Args:
+        plan (DataFrame): Catégories renvoyées par preparer_plan_economies
+        objectifs (array-like): Objectifs mensuels d'économies
+        
+    Returns:
+        DataFrame: Une ligne par objectif, une colonne de réduction par catégorie,
+                   plus 'economies', 'penibilite' et 'objectif_atteint'
+    """
+    objectifs = np.atleast_1d(np.asarray(objectifs, dtype=float))
+    
+    # Calcul en centimes entiers : sommes exactes et comparaison à l'objectif sans tolérance
+    objectifs_centimes = np.rint(objectifs * 100).astype(np.int64)
+    capacites = np.rint(plan['reduction_possible'].to_numpy(dtype=float) * 100).astype(np.int64)
+    deja_couvert = np.cumsum(capacites) - capacites
+    
+    reductions_centimes = np.clip(objectifs_centimes[:, None] - deja_couvert[None, :], 0, capacites[None, :])
+    economies_centimes = reductions_centimes.sum(axis=1)
+    reductions = vers_euros(reductions_centimes)
+    
+    balayage = pd.DataFrame(reductions, index=pd.Index(objectifs, name='objectif'), columns=plan.index.tolist())
+    balayage['economies'] = vers_euros(economies_centimes)
+    balayage['penibilite'] = (reductions @ plan['penibilite'].to_numpy()).round(2)
+    balayage['objectif_atteint'] = economies_centimes >= objectifs_centimes
+    
+    return balayage
+
+def calculer_potentiel_economies(depenses_par_categorie, nb_mois, montant_cible=200, limites=None, objectifs=None):
+    """
+    Construit les résultats de l'analyse des économies à partir des dépenses agrégées.
+    
+    Args:
+        depenses_par_categorie (Series): Dépenses totales par catégorie principale
+        nb_mois (int): Nombre de mois couverts par les dépenses
+        montant_cible (float): Montant d'économies visé par mois
+        limites (dict): Par catégorie, (part maximale réductible, pénibilité) (LIMITES_REDUCTION par défaut)
+        objectifs (list): Objectifs mensuels évalués dans la courbe d'économies (OBJECTIFS_COURBE par défaut)
+        
+    Returns:
+        ResultatPotentielEconomies: Résultats de l'analyse des économies potentielles
+    """
+    # Calculer les dépenses moyennes mensuelles par catégorie, arrondies au centime
+    depenses_mensuelles = vers_euros(np.rint(np.rint(depenses_par_categorie * 100) / nb_mois).astype(np.int64))
+    
+    # Réductions possibles dans les catégories où des économies sont envisageables
+    plan = preparer_plan_economies(depenses_mensuelles, limites)
+    
+    # Plan de pénibilité minimale pour l'objectif, et courbe d'économies pour les autres objectifs
+    if objectifs is None:
+        objectifs = OBJECTIFS_COURBE
+    objectifs = sorted(set(objectifs) | {montant_cible})
+    balayage = balayer_objectifs_economies(plan, objectifs)
+    reductions_cible = balayage.loc[float(montant_cible)]
     
-    # Calculer le potentiel d'économies (supposons qu'on peut réduire de 30% les dépenses non essentielles)
     potentiel_reduction = {}
-    total_economies = 0
+    total_centimes = 0
     
-    for categorie, montant in depenses_non_essentielles.items():
-        # Calculer une réduction réaliste (30% des dépenses non essentielles)
-        reduction = round(montant * 0.3, 2)
+    for categorie, ligne in plan.sort_values('depense_mensuelle', ascending=False, kind='stable').iterrows():
+        depense_centimes = round(ligne['depense_mensuelle'] * 100)
+        reduction_centimes = round(ligne['reduction_possible'] * 100)
         potentiel_reduction[categorie] = {
-            'depense_mensuelle': montant,
-            'reduction_possible': reduction,
-            'nouvelle_depense': montant - reduction
+            'depense_mensuelle': ligne['depense_mensuelle'],
+            'part_reductible': ligne['part_reductible'],
+            'reduction_possible': ligne['reduction_possible'],
+            'nouvelle_depense': vers_euros(depense_centimes - reduction_centimes),
+            'reduction_planifiee': reductions_cible[categorie],
+            'penibilite': ligne['penibilite']
         }
-        total_economies += reduction
+        total_centimes += reduction_centimes
+    total_economies = vers_euros(total_centimes)
     
     # Calculer si l'objectif est atteint
-    objectif_atteint = total_economies >= montant_cible
+    objectif_atteint = total_centimes >= round(montant_cible * 100)
+    
+    courbe_economies = [
+        {
+            'objectif': objectif,
+            'economies': ligne['economies'],
+            'objectif_atteint': bool(ligne['objectif_atteint']),
+            'penibilite': ligne['penibilite'],
+            'reductions': {categorie: ligne[categorie] for categorie in plan.index if ligne[categorie] > 0}
+        }
+        for objectif, (_, ligne) in zip(objectifs, balayage.iterrows())
+    ]
     
     # Préparer les suggestions spécifiques par catégorie
     suggestions = {
@@ -733,14 +1157,17 @@ def analyser_potentiel_economies(df, montant_cible=200):
         "Revoir vos contrats d'assurance pour éviter les doublons ou sur-assurances"
     ]
     
-    return {
-        'economies_totales': total_economies,
-        'objectif_atteint': objectif_atteint,
-        'montant_manquant': max(0, montant_cible - total_economies),
-        'potentiel_reduction': potentiel_reduction,
-        'suggestions': suggestions,
-        'suggestions_essentielles': suggestions_essentielles
-    }
+    return ResultatPotentielEconomies(
+        montant_cible=montant_cible,
+        economies_totales=total_economies,
+        objectif_atteint=objectif_atteint,
+        montant_manquant=vers_euros(max(0, round(montant_cible * 100) - total_centimes)),
+        potentiel_reduction=potentiel_reduction,
+        plan_economies=courbe_economies[objectifs.index(montant_cible)]['reductions'],
+        courbe_economies=courbe_economies,
+        suggestions=suggestions,
+        suggestions_essentielles=suggestions_essentielles
+    )
 
 def afficher_potentiel_economies(resultats, montant_cible=200):
     """
@@ -760,7 +1187,7 @@ def afficher_potentiel_economies(resultats, montant_cible=200):
     for categorie, details in resultats['potentiel_reduction'].items():
         print(f"\n{categorie}:")
         print(f"  - Dépense mensuelle moyenne: {details['depense_mensuelle']:.2f} €")
-        print(f"  - Réduction possible (30%): {details['reduction_possible']:.2f} €")
+        print(f"  - Réduction possible ({details['part_reductible']*100:.0f}%): {details['reduction_possible']:.2f} €")
         print(f"  - Nouvelle dépense estimée: {details['nouvelle_depense']:.2f} €")
         
         # Afficher des suggestions spécifiques pour cette catégorie
@@ -769,6 +1196,12 @@ def afficher_potentiel_economies(resultats, montant_cible=200):
             for suggestion in resultats['suggestions'][categorie]:
                 print(f"    • {suggestion}")
     
+    # Afficher le plan de réduction le moins contraignant pour atteindre l'objectif
+    if resultats['plan_economies']:
+        print("\nPlan de réduction proposé (postes les moins contraignants d'abord):")
+        for categorie, reduction in resultats['plan_economies'].items():
+            print(f"  - {categorie}: -{reduction:.2f} €")
+    
     # Afficher le résumé
     print("\nRésumé des économies:")
     print(f"  - Total des économies potentielles: {resultats['economies_totales']:.2f} € par mois")
@@ -783,14 +1216,22 @@ def afficher_potentiel_economies(resultats, montant_cible=200):
         print("  - Suggestions supplémentaires pour les catégories essentielles:")
         for suggestion in resultats['suggestions_essentielles']:
             print(f"    • {suggestion}")
+    
+    # Afficher les économies atteignables pour d'autres objectifs
+    print("\nÉconomies atteignables selon l'objectif:")
+    for point in resultats['courbe_economies']:
+        statut = "✅" if point['objectif_atteint'] else "⚠️"
+        print(f"  - {statut} {point['objectif']:.0f} € visés: {point['economies']:.2f} € d'économies")
 
-def visualiser_potentiel_economies(resultats, montant_cible=200):
+def visualiser_potentiel_economies(resultats, montant_cible=200, fichier='potentiel_economies.png', afficher=True):
     """
     Crée une visualisation graphique des économies potentielles.
     
     Args:
         resultats (dict): Résultats de l'analyse des économies
         montant_cible (float): Montant d'économies visé par mois
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
     """
     # Extraire les données pour le graphique
     categories = list(resultats['potentiel_reduction'].keys())
@@ -837,37 +1278,49 @@ def visualiser_potentiel_economies(resultats, montant_cible=200):
         ax1.set_ylim(top=montant_cible * 1.2)
     
     plt.tight_layout()
-    plt.savefig('potentiel_economies.png')
-    plt.show()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
 
-def analyser_capacite_emprunt(df, taux_interet=0.03, duree_pret=25, taux_endettement_max=0.33):
+def analyser_capacite_emprunt(df, taux_interet=0.03, duree_pret=25, taux_endettement_max=0.33,
+                              date_debut=None, date_fin=None, fenetre=None, revenus_stables=True):
     """
     Analyse la capacité d'emprunt immobilier en fonction des revenus et dépenses.
     
+    Par défaut, seul le revenu stable (salaires et autres revenus récurrents, en moyenne sur
+    les 12 derniers mois) est retenu : remboursements, virements internes et revenus ponctuels
+    n'augmentent pas la capacité d'emprunt.
+    
     Args:
         df (DataFrame): Données de transactions
         taux_interet (float): Taux d'intérêt annuel du prêt (par défaut: 3%)
         duree_pret (int): Durée du prêt en années (par défaut: 25 ans)
         taux_endettement_max (float): Taux d'endettement maximum (par défaut: 33%)
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+        revenus_stables (bool): Retenir le revenu stable plutôt que la moyenne de tous les crédits
         
     Returns:
-        dict: Résultats de l'analyse de capacité d'emprunt
+        ResultatCapaciteEmprunt: Résultats de l'analyse de capacité d'emprunt
     """
-    # Copie du DataFrame pour éviter de modifier l'original
-    df_analyse = df.copy()
+    # Restreindre l'analyse à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
     
     # Identifier les revenus (montants positifs)
-    df_revenus = df_analyse[df_analyse['net_amount'] > 0].copy()
+    df_revenus = df[df['net_amount'] > 0]
     
     # Identifier les dépenses (montants négatifs)
-    df_depenses = df_analyse[df_analyse['net_amount'] < 0].copy()
+    df_depenses = df[df['net_amount'] < 0]
     
     # Calculer le nombre de mois dans les données
-    if not pd.api.types.is_datetime64_any_dtype(df_analyse['date']):
-        df_analyse['date'] = pd.to_datetime(df_analyse['date'], errors='coerce')
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date'], errors='coerce'))
     
     # Déterminer la période couverte par les données
-    dates_valides = df_analyse['date'].dropna()
+    dates_valides = df['date'].dropna()
     if len(dates_valides) > 0:
         date_min = dates_valides.min()
         date_max = dates_valides.max()
@@ -881,12 +1334,48 @@ def analyser_capacite_emprunt(df, taux_interet=0.03, duree_pret=25, taux_endette
         date_min = None
         date_max = None
     
+    # Calculer les revenus, dépenses et dépenses compressibles totaux (en centimes entiers)
+    revenu_total = vers_euros(montants_centimes(df_revenus).sum())
+    centimes_depenses = montants_centimes(df_depenses).abs()
+    depenses_totales = vers_euros(centimes_depenses.sum())
+    total_compressible = vers_euros(centimes_depenses[df_depenses['parent_name'].isin(CATEGORIES_NON_ESSENTIELLES)].sum())
+    
+    # Revenu stable : salaires et revenus récurrents, hors transferts, remboursements et primes
+    revenus = calculer_revenus(df) if revenus_stables else None
+    
+    return calculer_capacite_emprunt(
+        revenu_total, depenses_totales, total_compressible, nb_mois, date_min, date_max,
+        taux_interet, duree_pret, taux_endettement_max, revenus
+    )
+
+def calculer_capacite_emprunt(revenu_total, depenses_totales, total_compressible, nb_mois,
+                              date_min=None, date_max=None, taux_interet=0.03, duree_pret=25,
+                              taux_endettement_max=0.33, revenus=None):
+    """
+    Construit les résultats de l'analyse de capacité d'emprunt à partir des totaux agrégés.
+    
+    Args:
+        revenu_total (float): Somme des revenus sur la période
+        depenses_totales (float): Somme des dépenses (en valeur absolue) sur la période
+        total_compressible (float): Somme des dépenses non essentielles sur la période
+        nb_mois (int): Nombre de mois couverts par la période
+        date_min, date_max (Timestamp): Bornes de la période analysée
+        taux_interet (float): Taux d'intérêt annuel du prêt
+        duree_pret (int): Durée du prêt en années
+        taux_endettement_max (float): Taux d'endettement maximum
+        revenus (dict): Indicateurs de calculer_revenus ; le revenu stable remplace alors la
+            moyenne de tous les crédits (sauf si aucun revenu stable n'a été détecté)
+        
+    Returns:
+        ResultatCapaciteEmprunt: Résultats de l'analyse de capacité d'emprunt
+    """
     # Calculer le revenu mensuel moyen
-    revenu_total = df_revenus['net_amount'].sum()
-    revenu_mensuel_moyen = revenu_total / nb_mois
+    if revenus is not None and revenus['revenu_mensuel_stable'] > 0:
+        revenu_mensuel_moyen = revenus['revenu_mensuel_stable']
+    else:
+        revenu_mensuel_moyen = revenu_total / nb_mois
     
     # Calculer les dépenses mensuelles moyennes
-    depenses_totales = df_depenses['net_amount'].abs().sum()
     depenses_mensuelles_moyennes = depenses_totales / nb_mois
     
     # Calculer le reste à vivre mensuel
@@ -916,15 +1405,8 @@ def analyser_capacite_emprunt(df, taux_interet=0.03, duree_pret=25, taux_endette
     # Calculer le taux d'endettement actuel
     taux_endettement_actuel = depenses_mensuelles_moyennes / revenu_mensuel_moyen
     
-    # Identifier les catégories de dépenses compressibles
-    categories_compressibles = [
-        'Loisirs & Sorties', 'Achats & Shopping', 'Voyages / Vacances', 
-        'Esthétique & Soins', 'Divers', 'Restaurants'
-    ]
-    
-    # Calculer les dépenses compressibles
-    depenses_compressibles = df_depenses[df_depenses['parent_name'].isin(categories_compressibles)]
-    montant_compressible = depenses_compressibles['net_amount'].abs().sum() / nb_mois
+    # Calculer les dépenses compressibles mensuelles
+    montant_compressible = total_compressible / nb_mois
     
     # Calculer la capacité d'emprunt améliorée si on réduit les dépenses compressibles de 30%
     economie_potentielle = montant_compressible * 0.3
@@ -943,23 +1425,24 @@ def analyser_capacite_emprunt(df, taux_interet=0.03, duree_pret=25, taux_endette
         "Épargner pour augmenter votre apport personnel"
     ]
     
-    return {
-        'revenu_mensuel': revenu_mensuel_moyen,
-        'depenses_mensuelles': depenses_mensuelles_moyennes,
-        'reste_a_vivre': reste_a_vivre,
-        'taux_endettement_actuel': taux_endettement_actuel,
-        'capacite_remboursement': capacite_remboursement,
-        'capacite_emprunt': capacite_emprunt,
-        'capacite_emprunt_amelioree': capacite_emprunt_amelioree,
-        'apport_recommande': apport_recommande,
-        'cout_total': cout_total,
-        'taux_interet': taux_interet,
-        'duree_pret': duree_pret,
-        'nb_mois_analyse': nb_mois,
-        'date_debut_analyse': date_min,
-        'date_fin_analyse': date_max,
-        'recommandations': recommandations
-    }
+    return ResultatCapaciteEmprunt(
+        revenu_mensuel=revenu_mensuel_moyen,
+        depenses_mensuelles=depenses_mensuelles_moyennes,
+        reste_a_vivre=reste_a_vivre,
+        taux_endettement_actuel=taux_endettement_actuel,
+        capacite_remboursement=capacite_remboursement,
+        capacite_emprunt=capacite_emprunt,
+        capacite_emprunt_amelioree=capacite_emprunt_amelioree,
+        apport_recommande=apport_recommande,
+        cout_total=cout_total,
+        taux_interet=taux_interet,
+        duree_pret=duree_pret,
+        nb_mois_analyse=nb_mois,
+        date_debut_analyse=date_min,
+        date_fin_analyse=date_max,
+        revenus=revenus,
+        recommandations=recommandations
+    )
 
 def afficher_capacite_emprunt(resultats):
     """
@@ -978,7 +1461,16 @@ def afficher_capacite_emprunt(resultats):
     
     # Afficher le résumé financier
     print("RÉSUMÉ FINANCIER MENSUEL:")
-    print(f"  - Revenu moyen: {resultats['revenu_mensuel']:.2f}€")
+    revenus = resultats.get('revenus')
+    if revenus and revenus['revenu_mensuel_stable'] > 0:
+        print(f"  - Revenu stable (moyenne des 12 derniers mois): {resultats['revenu_mensuel']:.2f}€")
+        print(f"    (médiane: {revenus['revenu_median']:.2f}€, volatilité: {revenus['volatilite']*100:.1f}%)")
+        revenus_exclus = (revenus['revenus_ponctuels_mensuels'] + revenus['transferts_mensuels']
+                          + revenus['remboursements_mensuels'])
+        if revenus_exclus > 0:
+            print(f"  - Crédits non retenus (ponctuels, virements internes, remboursements): {revenus_exclus:.2f}€")
+    else:
+        print(f"  - Revenu moyen: {resultats['revenu_mensuel']:.2f}€")
     print(f"  - Dépenses moyennes: {resultats['depenses_mensuelles']:.2f}€")
     print(f"  - Reste à vivre: {resultats['reste_a_vivre']:.2f}€")
     print(f"  - Taux d'endettement actuel: {resultats['taux_endettement_actuel']*100:.1f}%\n")
@@ -1008,12 +1500,14 @@ def afficher_capacite_emprunt(resultats):
     for i, recommandation in enumerate(resultats['recommandations'], 1):
         print(f"  {i}. {recommandation}")
 
-def visualiser_capacite_emprunt(resultats):
+def visualiser_capacite_emprunt(resultats, fichier='capacite_emprunt.png', afficher=True):
     """
     Crée une visualisation graphique de la capacité d'emprunt.
     
     Args:
         resultats (dict): Résultats de l'analyse de capacité d'emprunt
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
     """
     # Créer la figure avec 2 sous-graphiques
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
@@ -1068,5 +1562,28 @@ def visualiser_capacite_emprunt(resultats):
     # ax2.legend()
     
     plt.tight_layout()
-    plt.savefig('capacite_emprunt.png')
-    plt.show()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
+
+def generer_graphique_octets(fonction_visualisation, *args, format_image='png', **kwargs):
+    """
+    Exécute une fonction visualiser_* sans affichage et renvoie l'image produite.
+    
+    Args:
+        fonction_visualisation (callable): Une des fonctions visualiser_*
+        *args: Arguments positionnels transmis à la fonction de visualisation
+        format_image (str): Format de l'image ('png' ou 'svg')
+        **kwargs: Arguments nommés transmis à la fonction de visualisation
+        
+    Returns:
+        bytes: Contenu du graphique, ou None si aucun graphique n'a été produit
+    """
+    tampon = io.BytesIO()
+    with matplotlib.rc_context({'savefig.format': format_image}):
+        fonction_visualisation(*args, fichier=tampon, afficher=False, **kwargs)
+    contenu = tampon.getvalue()
+    
+    return contenu if contenu else None
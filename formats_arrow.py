@@ -0,0 +1,153 @@
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+# Extensions reconnues et format pyarrow.dataset correspondant
+FORMATS_ARROW = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'ipc',
+    '.arrow': 'ipc',
+    '.ipc': 'ipc'
+}
+
+def verifier_pyarrow():
+    """
+    Lève une ImportError explicite si pyarrow n'est pas installé.
+    """
+    if pa is None:
+        raise ImportError("La lecture et l'écriture Parquet/Arrow nécessitent le paquet pyarrow (pip install pyarrow)")
+
+def construire_filtre_dates(schema, date_debut=None, date_fin=None):
+    """
+    Construit le prédicat sur la colonne date transmis au lecteur Parquet/Arrow.
+
+    Le filtre n'est poussé que si la colonne est stockée en date ou horodatage :
+    des dates au format texte ne peuvent pas être comparées avant conversion.
+
+    Args:
+        schema (pyarrow.Schema): Schéma du fichier
+        date_debut, date_fin (str ou Timestamp): Bornes incluses de la période
+
+    Returns:
+        pyarrow.dataset.Expression: Prédicat, ou None s'il ne peut pas être poussé
+    """
+    if 'date' not in schema.names or (date_debut is None and date_fin is None):
+        return None
+
+    type_date = schema.field('date').type
+    if not (pa.types.is_timestamp(type_date) or pa.types.is_date(type_date)):
+        return None
+
+    def valeur_arrow(borne):
+        valeur = pd.Timestamp(borne)
+        valeur = valeur.date() if pa.types.is_date(type_date) else valeur.to_pydatetime()
+        return pa.scalar(valeur, type=type_date)
+
+    champ = ds.field('date')
+    conditions = []
+    if date_debut is not None:
+        conditions.append(champ >= valeur_arrow(date_debut))
+    if date_fin is not None:
+        conditions.append(champ <= valeur_arrow(date_fin))
+
+    filtre = conditions[0]
+    for condition in conditions[1:]:
+        filtre = filtre & condition
+
+    return filtre
+
+def lire_transactions_arrow(chemin_fichier, colonnes=None, date_debut=None, date_fin=None):
+    """
+    Lit des transactions stockées en Parquet ou Arrow IPC/Feather.
+
+    Seules les colonnes demandées sont lues, et le filtre sur la période est appliqué
+    par le lecteur (élimination des groupes de lignes hors période en Parquet).
+
+    Args:
+        chemin_fichier (str): Fichier ou répertoire de fichiers Parquet/Arrow
+        colonnes (list): Colonnes à lire (None pour toutes)
+        date_debut, date_fin (str ou Timestamp): Bornes incluses de la période
+
+    Returns:
+        DataFrame: Transactions lues
+    """
+    verifier_pyarrow()
+
+    extension = next((ext for ext in FORMATS_ARROW if str(chemin_fichier).lower().endswith(ext)), '.parquet')
+    jeu = ds.dataset(chemin_fichier, format=FORMATS_ARROW[extension])
+    filtre = construire_filtre_dates(jeu.schema, date_debut, date_fin)
+
+    table = jeu.to_table(columns=colonnes, filter=filtre)
+
+    return table.to_pandas(date_as_object=False)
+
+def table_depenses_inhabituelles(resultats):
+    """
+    Met en table les dépenses inhabituelles renvoyées par identifier_depenses_inhabituelles.
+
+    Returns:
+        DataFrame: Une ligne par dépense inhabituelle
+    """
+    colonnes = ['date', 'description', 'montant', 'categorie', 'parent_categorie', 'z_score', 'moyenne_categorie']
+    return pd.DataFrame(resultats['depenses_inhabituelles'], columns=colonnes)
+
+def table_categories_depenses(resultats):
+    """
+    Met en table les totaux par catégorie renvoyés par analyser_categories_depenses.
+
+    Returns:
+        DataFrame: Une ligne par catégorie principale (montant et pourcentage)
+    """
+    return pd.DataFrame({
+        'parent_name': list(resultats['montants'].keys()),
+        'montant': list(resultats['montants'].values()),
+        'pourcentage': [resultats['pourcentages'][categorie] for categorie in resultats['montants']]
+    })
+
+def table_tendances_mensuelles(resultats):
+    """
+    Met en table la matrice mois × catégorie renvoyée par analyser_tendances_mensuelles.
+
+    Returns:
+        DataFrame: Une ligne par mois analysé, une colonne par catégorie principale
+    """
+    matrice = pd.DataFrame(
+        {categorie: tendance['valeurs'] for categorie, tendance in resultats['tendances'].items()},
+        index=pd.Index(resultats['mois_analyses'], name='mois')
+    )
+    return matrice.fillna(0.0).reset_index()
+
+# Conversion en table de chaque type de résultat exportable
+TABLES_RESULTATS = {
+    'depenses_inhabituelles': table_depenses_inhabituelles,
+    'categories_depenses': table_categories_depenses,
+    'tendances_mensuelles': table_tendances_mensuelles
+}
+
+def exporter_resultats_parquet(resultats, chemin_fichier, type_resultats):
+    """
+    Écrit les résultats d'une analyse au format Parquet.
+
+    Args:
+        resultats (dict): Résultats de l'analyse
+        chemin_fichier (str): Fichier Parquet à écrire
+        type_resultats (str): 'depenses_inhabituelles', 'categories_depenses' ou 'tendances_mensuelles'
+
+    Returns:
+        DataFrame: Table écrite
+    """
+    verifier_pyarrow()
+
+    if type_resultats not in TABLES_RESULTATS:
+        raise ValueError(f"Type de résultats non exportable: {type_resultats}")
+
+    table = TABLES_RESULTATS[type_resultats](resultats)
+    table.to_parquet(chemin_fichier, index=False)
+
+    return table
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import openai
+
+from assistant import PARAMETRES_REPONSE, construire_messages
+
+# Erreurs pour lesquelles l'appel est retenté (limite de débit, réseau, erreur du serveur)
+ERREURS_TEMPORAIRES = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                       openai.InternalServerError)
+
+class SeauJetons:
+    """
+    Limiteur de débit à seau de jetons : chaque appel consomme un jeton, le seau se remplit
+    au débit demandé et sa capacité autorise de courtes rafales.
+    """
+
+    def __init__(self, debit, capacite=None):
+        """
+        Args:
+            debit (float): Nombre de jetons ajoutés par seconde
+            capacite (float): Nombre maximum de jetons accumulés (par défaut, une seconde de débit)
+        """
+        self.debit = debit
+        self.capacite = capacite if capacite is not None else max(1.0, debit)
+        self.jetons = self.capacite
+        self.dernier_remplissage = time.monotonic()
+        self._verrou = asyncio.Lock()
+
+    async def prendre(self):
+        """
+        Attend qu'un jeton soit disponible et le consomme.
+        """
+        async with self._verrou:
+            while True:
+                maintenant = time.monotonic()
+                self.jetons = min(self.capacite, self.jetons + (maintenant - self.dernier_remplissage) * self.debit)
+                self.dernier_remplissage = maintenant
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return
+                await asyncio.sleep((1 - self.jetons) / self.debit)
+
+def cle_requete(messages, parametres):
+    """
+    Empreinte d'une requête au modèle : deux éléments dont les messages et les paramètres
+    sont identiques ne donnent lieu qu'à un seul appel.
+
+    Returns:
+        str: Empreinte SHA-256 (hexadécimale)
+    """
+    contenu = json.dumps({'messages': messages, 'parametres': parametres}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+def charger_reprise(chemin_fichier):
+    """
+    Relit les réponses déjà obtenues lors d'une exécution précédente.
+
+    Args:
+        chemin_fichier (str): Fichier de reprise (JSON Lines : une réponse par ligne)
+
+    Returns:
+        dict: Réponses par empreinte de requête (vide si le fichier n'existe pas)
+    """
+    reponses = {}
+    if os.path.exists(chemin_fichier):
+        with open(chemin_fichier, encoding='utf-8') as fichier:
+            for ligne in fichier:
+                try:
+                    enregistrement = json.loads(ligne)
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    continue
+                reponses[enregistrement['cle']] = enregistrement['reponse']
+    return reponses
+
+def _delai_nouvel_essai(erreur, essai, delai_initial, delai_max):
+    # Délai indiqué par le serveur (en-tête Retry-After), sinon attente exponentielle
+    # avec une part aléatoire pour ne pas relancer tous les appels au même instant
+    reponse = getattr(erreur, 'response', None)
+    if reponse is not None:
+        try:
+            return min(delai_max, float(reponse.headers.get('retry-after')))
+        except (TypeError, ValueError):
+            pass
+    delai = min(delai_max, delai_initial * 2 ** essai)
+    return delai / 2 + random.uniform(0, delai / 2)
+
+async def generer_en_lot(elements, client=None, concurrence=16, requetes_par_seconde=20.0, nb_essais=5,
+                         delai_initial=0.5, delai_max=30.0, fichier_reprise=None, parametres=None):
+    """
+    Génère les réponses commentées d'un grand nombre de résultats d'analyse.
+
+    Les éléments sont lus au fur et à mesure (le flux peut être un générateur) ; au plus
+    `concurrence` appels sont en cours, leur débit est limité par un seau de jetons et les
+    erreurs temporaires sont retentées avec une attente exponentielle. Les requêtes
+    identiques ne sont envoyées qu'une fois, et chaque réponse obtenue est ajoutée au
+    fichier de reprise : une exécution interrompue reprend là où elle s'était arrêtée.
+
+    Args:
+        elements (iterable): Éléments (identifiant, catégorie, résultats) ou (catégorie,
+            résultats), l'identifiant étant alors le rang de l'élément
+        client (openai.AsyncOpenAI): Client asynchrone (par défaut, créé à partir des variables
+            d'environnement OPENAI_API_KEY et OPENAI_BASE_URL)
+        concurrence (int): Nombre maximum d'appels simultanés
+        requetes_par_seconde (float): Débit maximum d'appels (nouvelles tentatives comprises)
+        nb_essais (int): Nombre maximum d'essais par requête
+        delai_initial (float): Attente avant le premier nouvel essai, en secondes
+        delai_max (float): Attente maximale entre deux essais, en secondes
+        fichier_reprise (str): Fichier JSON Lines des réponses obtenues (None pour ne pas reprendre)
+        parametres (dict): Paramètres d'appel remplaçant ceux de PARAMETRES_REPONSE
+
+    Returns:
+        dict: Réponses et erreurs par identifiant, et statistiques de l'exécution
+    """
+    client_cree = client is None
+    if client_cree:
+        client = openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY", "OPENAI_API_KEY"), max_retries=0)
+    parametres = dict(PARAMETRES_REPONSE, **(parametres or {}))
+
+    terminees = charger_reprise(fichier_reprise) if fichier_reprise else {}
+    deja_obtenues = set(terminees)
+    en_cours = {}
+    reponses, erreurs = {}, {}
+    statistiques = {'nb_elements': 0, 'nb_appels': 0, 'nb_doublons': 0, 'nb_repris': 0,
+                    'nb_nouveaux_essais': 0, 'nb_erreurs': 0}
+
+    seau = SeauJetons(requetes_par_seconde)
+    places = asyncio.Semaphore(concurrence)
+    fichier = open(fichier_reprise, 'a', encoding='utf-8') if fichier_reprise else None
+    debut = time.perf_counter()
+
+    async def appeler(cle, messages):
+        try:
+            for essai in range(nb_essais):
+                await seau.prendre()
+                statistiques['nb_appels'] += 1
+                try:
+                    reponse = await client.chat.completions.create(messages=messages, **parametres)
+                    break
+                except ERREURS_TEMPORAIRES as e:
+                    if essai == nb_essais - 1:
+                        raise
+                    statistiques['nb_nouveaux_essais'] += 1
+                    await asyncio.sleep(_delai_nouvel_essai(e, essai, delai_initial, delai_max))
+
+            contenu = reponse.choices[0].message.content
+            terminees[cle] = contenu
+            if fichier is not None:
+                fichier.write(json.dumps({'cle': cle, 'reponse': contenu}, ensure_ascii=False) + '\n')
+                fichier.flush()
+            return contenu
+        finally:
+            places.release()
+
+    def recuperer(identifiant):
+        def rappel(tache):
+            if tache.exception() is None:
+                reponses[identifiant] = tache.result()
+            else:
+                erreurs[identifiant] = str(tache.exception())
+                statistiques['nb_erreurs'] += 1
+        return rappel
+
+    try:
+        for numero, element in enumerate(elements):
+            identifiant, categorie, resultats = element if len(element) == 3 else (numero, *element)
+            statistiques['nb_elements'] += 1
+
+            messages = construire_messages(categorie, resultats)
+            cle = cle_requete(messages, parametres)
+
+            if cle in terminees:
+                reponses[identifiant] = terminees[cle]
+                statistiques['nb_repris' if cle in deja_obtenues else 'nb_doublons'] += 1
+            elif cle in en_cours:
+                en_cours[cle].add_done_callback(recuperer(identifiant))
+                statistiques['nb_doublons'] += 1
+            else:
+                await places.acquire()
+                tache = asyncio.create_task(appeler(cle, messages))
+                en_cours[cle] = tache
+                tache.add_done_callback(lambda _, cle=cle: en_cours.pop(cle, None))
+                tache.add_done_callback(recuperer(identifiant))
+
+        if en_cours:
+            await asyncio.wait(list(en_cours.values()))
+    finally:
+        if fichier is not None:
+            fichier.close()
+        if client_cree:
+            await client.close()
+
+    duree = time.perf_counter() - debut
+    statistiques['duree'] = duree
+    statistiques['elements_par_seconde'] = statistiques['nb_elements'] / duree if duree > 0 else None
+
+    return {'reponses': reponses, 'erreurs': erreurs, 'statistiques': statistiques}
+
+def generer_reponses_en_lot(elements, **options):
+    """
+    Version bloquante de generer_en_lot (même paramètres), pour les traitements de nuit.
+
+    Returns:
+        dict: Réponses et erreurs par identifiant, et statistiques de l'exécution
+    """
+    return asyncio.run(generer_en_lot(elements, **options))
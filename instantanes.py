@@ -0,0 +1,163 @@
+import threading
+import weakref
+
+import pandas as pd
+
+from fonctions import charger_donnees
+
+class Instantane:
+    """
+    Version figée des transactions, partagée sans copie entre tous les lecteurs.
+
+    Un instantané est une suite de segments ajoutés les uns après les autres et jamais
+    modifiés ; le DataFrame complet est assemblé une fois, à la première lecture. Les
+    analyses ne modifient pas les transactions qu'elles reçoivent (et, avec le copy-on-write
+    de pandas, une modification d'un DataFrame dérivé ne remonte jamais aux données partagées).
+    """
+
+    def __init__(self, version, segments, nb_doublons=0):
+        """
+        Args:
+            version (int): Numéro de version, croissant à chaque publication
+            segments (tuple): DataFrames des lots successifs, chacun trié par date
+            nb_doublons (int): Transactions du dernier lot écartées comme déjà reçues
+        """
+        self.version = version
+        self.segments = segments
+        self.nb_doublons = nb_doublons
+        self._donnees = None
+        self._verrou = threading.Lock()
+
+    @property
+    def donnees(self):
+        """
+        DataFrame de toutes les transactions de la version, trié par date.
+        """
+        if self._donnees is None:
+            with self._verrou:
+                if self._donnees is None:
+                    self._donnees = self._assembler()
+        return self._donnees
+
+    def _assembler(self):
+        if not self.segments:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'net_amount': pd.Series(dtype=float)})
+        if len(self.segments) == 1:
+            return self.segments[0]
+
+        df = pd.concat(self.segments, ignore_index=True)
+
+        # Les lots arrivent en général dans l'ordre chronologique : ne retrier que si un lot
+        # contient des dates antérieures au précédent (ou si des dates invalides les séparent)
+        valides = df['date'].notna().to_numpy()
+        nb_valides = int(valides.sum())
+        if not (valides[:nb_valides].all() and df['date'].iloc[:nb_valides].is_monotonic_increasing):
+            df = df.sort_values('date', kind='stable', na_position='last', ignore_index=True)
+
+        return df
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+class DepotTransactions:
+    """
+    Dépôt versionné de transactions : les lecteurs obtiennent un instantané immuable, les
+    écritures publient une nouvelle version d'un seul coup.
+
+    Une publication ajoute un segment à la version courante sans toucher aux précédentes ;
+    les questions en cours continuent sur leur instantané et une version n'est libérée
+    qu'une fois que plus aucun lecteur ne la référence.
+    """
+
+    def __init__(self, df=None, table_marchands=None, index_doublons=None):
+        """
+        Args:
+            df (DataFrame): Transactions initiales (telles que renvoyées par charger_donnees)
+            table_marchands (TableMarchands): Table d'internement pour la colonne merchant_id
+                des transactions ajoutées (optionnelle)
+            index_doublons (IndexDoublons): Index des transactions déjà reçues ; les lots
+                publiés en sont dédoublonnés (optionnel)
+        """
+        self.table_marchands = table_marchands
+        self.index_doublons = index_doublons
+        self._verrou_ecriture = threading.Lock()
+        self._versions = weakref.WeakValueDictionary()
+        self._courant = Instantane(0, ())
+        if df is not None and len(df):
+            self.publier(df)
+
+    @classmethod
+    def depuis_fichier(cls, chemin_fichier, table_marchands=None, index_doublons=None):
+        """
+        Crée un dépôt à partir d'un fichier de transactions (CSV, Parquet ou Arrow).
+
+        Returns:
+            DepotTransactions: Dépôt contenant les transactions du fichier
+        """
+        depot = cls(charger_donnees(chemin_fichier, table_marchands=table_marchands, index_doublons=index_doublons),
+                    table_marchands)
+        # Transactions du fichier déjà enregistrées par charger_donnees : l'index ne sert
+        # qu'aux lots publiés ensuite
+        depot.index_doublons = index_doublons
+        return depot
+
+    def instantane(self):
+        """
+        Renvoie la version courante des transactions (lecture atomique d'une référence).
+
+        Returns:
+            Instantane: Version à conserver pendant toute la durée d'une analyse
+        """
+        return self._courant
+
+    def _preparer_segment(self, df):
+        """
+        Met un lot au format de charger_donnees : dates converties, marchands encodés, tri par date.
+        """
+        if not pd.api.types.is_datetime64_any_dtype(df['date']):
+            dates = pd.to_datetime(df['date'], format="%B %d, %Y", errors='coerce')
+            # Dates ISO (AAAA-MM-JJ) pour les lots reçus hors fichier CSV
+            dates = dates.fillna(pd.to_datetime(df['date'], format='ISO8601', errors='coerce'))
+            df = df.assign(date=dates)
+        if self.table_marchands is not None and 'merchant_id' not in df.columns:
+            df = df.assign(merchant_id=self.table_marchands.encoder(df['description_fake']))
+
+        return df.sort_values('date', kind='stable', na_position='last', ignore_index=True)
+
+    def publier(self, df):
+        """
+        Ajoute un lot de transactions et publie la nouvelle version.
+
+        Args:
+            df (DataFrame): Nouvelles transactions (dates au format datetime, CSV ou ISO)
+
+        Returns:
+            Instantane: Version publiée
+        """
+        segment = self._preparer_segment(df)
+
+        with self._verrou_ecriture:
+            nb_doublons = 0
+            if self.index_doublons is not None:
+                segment, rapport = self.index_doublons.filtrer(segment)
+                nb_doublons = rapport['nb_doublons']
+
+            courant = self._courant
+            # Si la version courante a déjà été assemblée, elle sert de base au nouveau
+            # segment : le nombre de segments reste borné
+            base = (courant._donnees,) if courant._donnees is not None and courant.segments else courant.segments
+            nouvelle = Instantane(courant.version + 1, base + (segment,), nb_doublons)
+            self._versions[nouvelle.version] = nouvelle
+            self._courant = nouvelle
+
+        return nouvelle
+
+    def versions_actives(self):
+        """
+        Returns:
+            list: Numéros des versions encore référencées (version courante et lectures en cours)
+        """
+        return sorted(self._versions.keys())
+
+    def __len__(self):
+        return len(self._courant)
@@ -0,0 +1,150 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Mots-clés utilisés pour simuler la classification des questions
+MOTS_CLES_CATEGORIES = [
+    ("calendrier_depenses", ["jour de la semaine", "week-end", "weekend", "calendrier", "après la paie", "apres la paie", "quel jour"]),
+    ("prelevements_automatiques", ["prélèvement", "prelevement", "abonnement"]),
+    ("depenses_inhabituelles", ["inhabituel", "anormal", "suspect"]),
+    ("potentiel_economies", ["économ", "econom", "épargn"]),
+    ("capacite_emprunt", ["emprunt", "crédit", "credit", "immobilier"]),
+    ("previsions_tresorerie", ["prévision", "prevision", "prochains mois", "mois prochain", "solde", "à venir"]),
+    ("categories_depenses", ["catégorie", "categorie", "dépense", "depense"])
+]
+
+def simuler_classification(prompt):
+    """
+    Reproduit de façon déterministe la classification faite par le modèle.
+
+    Args:
+        prompt (str): Prompt de classification construit par classifier_question
+
+    Returns:
+        str: Nom de la catégorie d'analyse
+    """
+    debut = prompt.find('Question: "')
+    fin = prompt.find('"', debut + len('Question: "'))
+    question = prompt[debut:fin].lower() if debut >= 0 else prompt.lower()
+
+    for categorie, mots_cles in MOTS_CLES_CATEGORIES:
+        if any(mot in question for mot in mots_cles):
+            return categorie
+
+    return "inconnu"
+
+def construire_completion(modele, contenu, prompt):
+    """
+    Construit une réponse au format de l'API chat.completions.
+
+    Args:
+        modele (str): Modèle demandé par le client
+        contenu (str): Texte de la réponse simulée
+        prompt (str): Prompt reçu (pour le décompte approximatif des jetons)
+
+    Returns:
+        dict: Corps JSON de la réponse
+    """
+    jetons_prompt = len(prompt.split())
+    jetons_reponse = len(contenu.split())
+
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": modele,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": contenu},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": jetons_prompt,
+            "completion_tokens": jetons_reponse,
+            "total_tokens": jetons_prompt + jetons_reponse
+        }
+    }
+
+class GestionnaireStub(BaseHTTPRequestHandler):
+    """
+    Gestionnaire HTTP imitant l'endpoint /v1/chat/completions d'OpenAI.
+    """
+    latence = 0.0
+    taux_erreurs = 0.0
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        longueur = int(self.headers.get('Content-Length', 0))
+        requete = json.loads(self.rfile.read(longueur) or b'{}')
+        prompt = "\n".join(m.get("content", "") for m in requete.get("messages", []))
+
+        if self.latence:
+            time.sleep(self.latence)
+
+        # Limitation de débit simulée, pour tester les nouvelles tentatives des clients
+        if self.taux_erreurs and random.random() < self.taux_erreurs:
+            corps = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}).encode('utf-8')
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+            return
+
+        if "Classifie la question" in prompt:
+            contenu = simuler_classification(prompt)
+        else:
+            contenu = f"Réponse simulée de l'assistant ({len(prompt)} caractères de contexte reçus)."
+
+        corps = json.dumps(construire_completion(requete.get("model", "stub"), contenu, prompt)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        # Pas de journalisation des requêtes sur la sortie standard
+        pass
+
+def demarrer_stub(hote='127.0.0.1', port=0, latence=0.0, taux_erreurs=0.0):
+    """
+    Démarre le serveur simulé dans un thread d'arrière-plan.
+
+    Args:
+        hote (str): Adresse d'écoute
+        port (int): Port d'écoute (0 pour un port libre choisi par le système)
+        latence (float): Délai artificiel ajouté à chaque réponse, en secondes
+        taux_erreurs (float): Proportion des requêtes refusées avec une erreur 429
+
+    Returns:
+        tuple: (serveur, url de base à utiliser comme OPENAI_BASE_URL)
+    """
+    gestionnaire = type('GestionnaireStubConfigure', (GestionnaireStub,),
+                        {'latence': latence, 'taux_erreurs': taux_erreurs})
+    serveur = ThreadingHTTPServer((hote, port), gestionnaire)
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+
+    return serveur, f"http://{hote}:{serveur.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur local imitant l'API OpenAI pour les tests")
+    parser.add_argument('--hote', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latence', type=float, default=0.0)
+    parser.add_argument('--taux-erreurs', type=float, default=0.0,
+                        help="Proportion des requêtes refusées avec une erreur 429")
+    arguments = parser.parse_args()
+
+    gestionnaire = type('GestionnaireStubConfigure', (GestionnaireStub,),
+                        {'latence': arguments.latence, 'taux_erreurs': arguments.taux_erreurs})
+    serveur = ThreadingHTTPServer((arguments.hote, arguments.port), gestionnaire)
+    print(f"Serveur LLM simulé sur http://{arguments.hote}:{arguments.port}/v1")
+    serveur.serve_forever()
@@ -1,11 +1,17 @@
 from fonctions import *
-from assistant import assistant_financier, classifier_question
+from previsions import afficher_previsions
+from calendrier import afficher_calendrier_depenses
+from assistant import visualiser_analyse
+from session import SessionConversation
 
 def main():
     # Charger les données
     transactions = charger_donnees('transactions.csv')
     
     if transactions is not None:
+        # La session conserve les analyses et l'historique pour les questions de suivi
+        session = SessionConversation(transactions)
+        
         print("\n--- ASSISTANT FINANCIER INTELLIGENT ---\n")
         print("Bonjour ! Je suis votre assistant financier personnel.")
         print("Vous pouvez me poser des questions sur vos finances, par exemple :")
@@ -14,6 +20,9 @@ def main():
         print("3. Ai-je des dépenses inhabituelles récemment ?")
         print("4. Comment puis-je économiser 200€ par mois ?")
         print("5. J'envisage de prendre un crédit immobilier. Quelle serait ma capacité d'emprunt ?")
+        print("6. Quel sera mon solde dans les prochains mois ?")
+        print("7. Quels jours de la semaine est-ce que je dépense le plus ?")
+        print("Vous pouvez ensuite préciser votre question, par exemple : « et sur 20 ans ? » ou « et pour les restaurants ? »")
         
         while True:
             print("\n" + "-"*50)
@@ -23,40 +32,17 @@ def main():
                 print("Merci d'avoir utilisé l'assistant financier. À bientôt !")
                 break
             
-            # Classifier la question
-            categorie = classifier_question(question)
+            # Classifier la question (ou la rattacher à la précédente) et effectuer l'analyse
+            categorie, resultats, precedents = session.traiter_question(question)
             
-            # Effectuer l'analyse appropriée
-            if categorie == "prelevements_automatiques":
-                resultats = analyser_part_prelevements(transactions)
-                visualiser_part_prelevements(resultats)
-                
-            elif categorie == "categories_depenses":
-                resultats = analyser_categories_depenses(transactions)
-                comparaison = comparer_avec_recommandations(resultats)
-                resultats_complets = {"categories": resultats, "comparaison": comparaison}
-                visualiser_categories_depenses(resultats, comparaison)
-                
-            elif categorie == "depenses_inhabituelles":
-                resultats = identifier_depenses_inhabituelles(transactions)
-                visualiser_depenses_inhabituelles(resultats)
-                
-            elif categorie == "potentiel_economies":
-                montant_cible = 200
-                resultats = analyser_potentiel_economies(transactions, montant_cible)
-                visualiser_potentiel_economies(resultats, montant_cible)
-                
-            elif categorie == "capacite_emprunt":
-                resultats = analyser_capacite_emprunt(transactions)
-                visualiser_capacite_emprunt(resultats)
-                
-            else:
-                print("\nJe ne comprends pas votre question. Pourriez-vous la reformuler ? Pour rappel, je peux vous guider sur les prélèvements automatiques, les catégories de dépenses, les dépenses inhabituelles, les économies potentielles et la capacité d'emprunt.")
+            if resultats is None:
+                print("\nJe ne comprends pas votre question. Pourriez-vous la reformuler ? Pour rappel, je peux vous guider sur les prélèvements automatiques, les catégories de dépenses, les dépenses inhabituelles, les économies potentielles, la capacité d'emprunt, les prévisions de trésorerie et le calendrier de vos dépenses.")
                 continue
             
+            visualiser_analyse(categorie, resultats)
+            
             # Générer une réponse en langage naturel avec l'assistant
-            from assistant import generer_reponse
-            reponse = generer_reponse(categorie, resultats if categorie != "categories_depenses" else resultats_complets)
+            reponse = session.commenter(question, categorie, resultats, precedents)
             
             print("\nRÉPONSE DE L'ASSISTANT :")
             print(reponse)
@@ -68,16 +54,22 @@ def main():
                     afficher_part_prelevements(resultats)
                     
                 elif categorie == "categories_depenses":
-                    afficher_categories_depenses(resultats, comparaison)
+                    afficher_categories_depenses(resultats["categories"], resultats["comparaison"])
                     
                 elif categorie == "depenses_inhabituelles":
                     afficher_depenses_inhabituelles(resultats)
                     
                 elif categorie == "potentiel_economies":
-                    afficher_potentiel_economies(resultats, montant_cible)
+                    afficher_potentiel_economies(resultats, resultats["montant_cible"])
                     
                 elif categorie == "capacite_emprunt":
                     afficher_capacite_emprunt(resultats)
+                    
+                elif categorie == "previsions_tresorerie":
+                    afficher_previsions(resultats)
+                    
+                elif categorie == "calendrier_depenses":
+                    afficher_calendrier_depenses(resultats)
     else:
         print("Impossible de procéder à l'analyse: données non disponibles.")
 
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Préfixes de moyen de paiement en tête de libellé
+MOTIF_PREFIXES = r'^(?:(?:prlv sepa|prlv|prelevement|cb|carte|vir sepa|vir inst|vir|virement|paiement)\s+)+'
+
+# Date de l'opération (jj/mm ou jj/mm/aa) : sur les paiements par carte, le lieu suit la date
+MOTIF_DATE_ET_LIEU = r'(?:^|\s)\d{1,2}/\d{1,2}(?:/\d{2,4})?\b.*$'
+
+# Nettoyage du reste du libellé : références, chiffres, ponctuation et espaces multiples
+MOTIFS_NETTOYAGE = [
+    (r'\b(?:ref|réf|rum|ech|id|fac|facture|n°|no)\s*[:.]?\s*\S+', ' '),
+    (r'\d+', ' '),
+    (r'[^a-zà-ÿ&\s]', ' '),
+    (r'\s+', ' ')
+]
+
+# Villes fréquentes retirées en fin de libellé lorsqu'aucune date ne les précède
+VILLES = [
+    'paris', 'lyon', 'marseille', 'toulouse', 'nice', 'nantes', 'strasbourg', 'montpellier',
+    'bordeaux', 'lille', 'rennes', 'reims', 'toulon', 'grenoble', 'dijon', 'angers', 'nimes'
+]
+MOTIF_VILLE_FINALE = r'\s(?:' + '|'.join(VILLES) + r')(?:\s\w{1,2})?$'
+
+def normaliser_libelles(descriptions):
+    """
+    Réduit les libellés bancaires à un nom de marchand comparable d'une transaction à l'autre
+    (ex: "cb carrefour 12/03 paris 4" -> "carrefour").
+
+    Les expressions régulières ne sont appliquées qu'une fois par libellé distinct.
+
+    Args:
+        descriptions (Series): Libellés des transactions (description_fake)
+
+    Returns:
+        Series: Libellés normalisés, alignés sur descriptions
+    """
+    codes, uniques = pd.factorize(descriptions.astype(str))
+    libelles = pd.Series(normaliser_libelles_uniques(uniques), dtype=object)
+
+    return pd.Series(libelles.to_numpy()[codes], index=descriptions.index)
+
+def normaliser_libelles_uniques(libelles):
+    """
+    Applique les règles de normalisation à une liste de libellés (sans doublons).
+
+    Args:
+        libelles (array-like): Libellés bruts
+
+    Returns:
+        list: Libellés normalisés, dans le même ordre
+    """
+    libelles = pd.Series(libelles, dtype=object).astype(str).str.lower()
+
+    libelles = libelles.str.replace(MOTIF_PREFIXES, '', regex=True)
+    libelles = libelles.str.replace(MOTIF_DATE_ET_LIEU, '', regex=True)
+    for motif, remplacement in MOTIFS_NETTOYAGE:
+        libelles = libelles.str.replace(motif, remplacement, regex=True)
+    libelles = libelles.str.strip().str.replace(MOTIF_VILLE_FINALE, '', regex=True).str.strip()
+
+    return libelles.tolist()
+
+def normaliser_libelle(libelle):
+    """
+    Normalise un seul libellé, avec les mêmes règles que normaliser_libelles_uniques mais
+    sans passer par pandas (traitement des transactions une à une).
+
+    Args:
+        libelle (str): Libellé brut
+
+    Returns:
+        str: Libellé normalisé
+    """
+    libelle = re.sub(MOTIF_PREFIXES, '', str(libelle).lower())
+    libelle = re.sub(MOTIF_DATE_ET_LIEU, '', libelle)
+    for motif, remplacement in MOTIFS_NETTOYAGE:
+        libelle = re.sub(motif, remplacement, libelle)
+
+    return re.sub(MOTIF_VILLE_FINALE, '', libelle.strip()).strip()
+
+class TableMarchands:
+    """
+    Table d'internement des marchands : chaque libellé normalisé reçoit un identifiant entier.
+
+    La correspondance libellé brut -> identifiant est conservée en cache, de sorte qu'un
+    libellé déjà rencontré (dans ce chargement ou un précédent) n'est jamais renormalisé.
+    """
+
+    def __init__(self):
+        self.noms = []
+        self.identifiants = {}
+        self.cache_libelles = {}
+
+    def interner(self, nom):
+        """
+        Renvoie l'identifiant d'un marchand normalisé, en le créant si nécessaire.
+
+        Args:
+            nom (str): Nom de marchand normalisé
+
+        Returns:
+            int: Identifiant du marchand
+        """
+        identifiant = self.identifiants.get(nom)
+        if identifiant is None:
+            identifiant = len(self.noms)
+            self.identifiants[nom] = identifiant
+            self.noms.append(nom)
+        return identifiant
+
+    def encoder(self, descriptions):
+        """
+        Convertit des libellés bruts en identifiants de marchands.
+
+        Args:
+            descriptions (Series): Libellés des transactions (description_fake)
+
+        Returns:
+            ndarray: Identifiants (int32) alignés sur descriptions
+        """
+        codes, uniques = pd.factorize(descriptions.astype(str))
+
+        # Normaliser uniquement les libellés absents du cache
+        nouveaux = [libelle for libelle in uniques if libelle not in self.cache_libelles]
+        if nouveaux:
+            for libelle, nom in zip(nouveaux, normaliser_libelles_uniques(nouveaux)):
+                self.cache_libelles[libelle] = self.interner(nom)
+
+        correspondance = np.fromiter((self.cache_libelles[libelle] for libelle in uniques),
+                                     dtype=np.int32, count=len(uniques))
+
+        return correspondance[codes]
+
+    def encoder_libelle(self, libelle):
+        """
+        Convertit un seul libellé brut en identifiant de marchand.
+
+        Args:
+            libelle (str): Libellé de la transaction
+
+        Returns:
+            int: Identifiant du marchand
+        """
+        identifiant = self.cache_libelles.get(libelle)
+        if identifiant is None:
+            identifiant = self.cache_libelles[libelle] = self.interner(normaliser_libelle(libelle))
+        return identifiant
+
+    def decoder(self, identifiants):
+        """
+        Convertit des identifiants de marchands en noms normalisés.
+
+        Args:
+            identifiants (array-like): Identifiants de marchands
+
+        Returns:
+            ndarray: Noms des marchands
+        """
+        return np.asarray(self.noms, dtype=object)[np.asarray(identifiants)]
+
+    def nom(self, identifiant):
+        """
+        Returns:
+            str: Nom normalisé du marchand
+        """
+        return self.noms[identifiant]
+
+    def sauvegarder(self, chemin_fichier):
+        """
+        Enregistre la table et le cache des libellés dans un fichier JSON.
+
+        Args:
+            chemin_fichier (str): Fichier de destination
+        """
+        with open(chemin_fichier, 'w', encoding='utf-8') as fichier:
+            json.dump({'noms': self.noms, 'libelles': self.cache_libelles}, fichier, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, chemin_fichier):
+        """
+        Recharge une table enregistrée avec sauvegarder (table vide si le fichier n'existe pas).
+
+        Args:
+            chemin_fichier (str): Fichier JSON de la table
+
+        Returns:
+            TableMarchands: Table chargée
+        """
+        table = cls()
+        if os.path.exists(chemin_fichier):
+            with open(chemin_fichier, encoding='utf-8') as fichier:
+                contenu = json.load(fichier)
+            table.noms = contenu['noms']
+            table.identifiants = {nom: identifiant for identifiant, nom in enumerate(table.noms)}
+            table.cache_libelles = contenu['libelles']
+        return table
+
+    def __len__(self):
+        return len(self.noms)
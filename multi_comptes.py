@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+from fonctions import charger_donnees
+
+class UtilisateurInconnu(LookupError):
+    """
+    Utilisateur absent du magasin de transactions.
+    """
+
+class MagasinTransactions:
+    """
+    Regroupe les transactions de plusieurs utilisateurs et comptes dans un seul DataFrame.
+
+    Les lignes sont triées par (user_id, date) : les transactions d'un utilisateur forment
+    une tranche contiguë dont les bornes sont indexées, ce qui permet de retrouver les
+    données d'un utilisateur en O(1) sans filtrer la table complète.
+    """
+
+    def __init__(self, df, colonne_utilisateur='user_id', colonne_compte='account_id'):
+        """
+        Args:
+            df (DataFrame): Transactions de tous les utilisateurs
+            colonne_utilisateur (str): Colonne identifiant l'utilisateur
+            colonne_compte (str): Colonne identifiant le compte (optionnelle dans df)
+        """
+        self.colonne_utilisateur = colonne_utilisateur
+        self.colonne_compte = colonne_compte
+        self._indexer(df)
+
+    def _indexer(self, df):
+        """
+        Trie les transactions et calcule les bornes de chaque utilisateur et compte.
+        """
+        # Chaque tranche utilisateur est triée par date, mais pas l'ensemble des transactions
+        donnees = df.sort_values([self.colonne_utilisateur, 'date'], kind='stable').reset_index(drop=True)
+        utilisateurs = donnees[self.colonne_utilisateur].to_numpy()
+
+        # Début de chaque tranche : première ligne et chaque changement d'utilisateur
+        if len(utilisateurs) > 0:
+            debuts = np.flatnonzero(np.r_[True, utilisateurs[1:] != utilisateurs[:-1]])
+        else:
+            debuts = np.array([], dtype=np.int64)
+        fins = np.r_[debuts[1:], len(utilisateurs)]
+
+        self.donnees = donnees
+        self._tranches = {
+            utilisateur: (int(debut), int(fin))
+            for utilisateur, debut, fin in zip(utilisateurs[debuts].tolist(), debuts, fins)
+        }
+
+        # Positions des lignes de chaque compte, relatives à la tranche de l'utilisateur
+        self._positions_comptes = {}
+        if self.colonne_compte in donnees.columns:
+            comptes = donnees[self.colonne_compte].to_numpy()
+            codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([utilisateurs, comptes]))
+            ordre = np.argsort(codes, kind='stable')
+            separations = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+            for (utilisateur, compte), positions in zip(uniques, np.split(ordre, separations)):
+                debut = self._tranches[utilisateur][0]
+                self._positions_comptes[(utilisateur, compte)] = positions - debut
+
+    @classmethod
+    def depuis_csv(cls, chemin_fichier, **options):
+        """
+        Charge un fichier CSV contenant une colonne d'identifiant utilisateur.
+
+        Args:
+            chemin_fichier (str): Chemin vers le fichier CSV des transactions
+            **options: Options transmises au constructeur
+
+        Returns:
+            MagasinTransactions: Magasin indexé, ou None si le chargement a échoué
+        """
+        df = charger_donnees(chemin_fichier)
+        return cls(df, **options) if df is not None else None
+
+    @classmethod
+    def depuis_fichiers(cls, fichiers, colonne_utilisateur='user_id', colonne_compte='account_id'):
+        """
+        Construit un magasin à partir d'un fichier CSV par utilisateur ou par compte.
+
+        Args:
+            fichiers (dict): {user_id: chemin} ou {(user_id, account_id): chemin}
+
+        Returns:
+            MagasinTransactions: Magasin indexé
+        """
+        morceaux = []
+        for cle, chemin in fichiers.items():
+            df = charger_donnees(chemin)
+            if df is None:
+                continue
+            utilisateur, compte = cle if isinstance(cle, tuple) else (cle, None)
+            df[colonne_utilisateur] = utilisateur
+            if compte is not None:
+                df[colonne_compte] = compte
+            morceaux.append(df)
+
+        return cls(pd.concat(morceaux, ignore_index=True), colonne_utilisateur, colonne_compte)
+
+    def ajouter(self, df):
+        """
+        Ajoute de nouvelles transactions et reconstruit l'index.
+
+        Args:
+            df (DataFrame): Transactions à ajouter (avec la colonne utilisateur)
+        """
+        self._indexer(pd.concat([self.donnees, df], ignore_index=True))
+
+    def utilisateurs(self):
+        """
+        Returns:
+            list: Identifiants des utilisateurs présents
+        """
+        return list(self._tranches.keys())
+
+    def comptes(self, user_id):
+        """
+        Returns:
+            list: Identifiants des comptes de l'utilisateur
+        """
+        return [compte for (utilisateur, compte) in self._positions_comptes if utilisateur == user_id]
+
+    def transactions_utilisateur(self, user_id, comptes=None):
+        """
+        Renvoie les transactions d'un utilisateur, tous comptes confondus ou pour certains comptes.
+
+        Args:
+            user_id: Identifiant de l'utilisateur
+            comptes (list): Comptes à conserver (None pour tous les comptes)
+
+        Returns:
+            DataFrame: Transactions de l'utilisateur triées par date
+
+        Raises:
+            UtilisateurInconnu: Si l'utilisateur n'a aucune transaction dans le magasin
+        """
+        if user_id not in self._tranches:
+            raise UtilisateurInconnu(f"Utilisateur inconnu: {user_id}")
+
+        debut, fin = self._tranches[user_id]
+        tranche = self.donnees.iloc[debut:fin]
+
+        if comptes is None:
+            return tranche
+
+        positions = [self._positions_comptes[(user_id, compte)]
+                     for compte in comptes if (user_id, compte) in self._positions_comptes]
+        positions = np.sort(np.concatenate(positions)) if positions else np.array([], dtype=np.int64)
+
+        return tranche.iloc[positions]
+
+    def executer(self, user_id, fonction_analyse, comptes=None, **parametres):
+        """
+        Exécute une fonction analyser_* sur les transactions d'un utilisateur.
+
+        Args:
+            user_id: Identifiant de l'utilisateur
+            fonction_analyse (callable): Fonction d'analyse prenant un DataFrame
+            comptes (list): Comptes à inclure (None pour agréger tous les comptes)
+            **parametres: Paramètres transmis à la fonction d'analyse
+
+        Returns:
+            dict: Résultats de l'analyse
+        """
+        return fonction_analyse(self.transactions_utilisateur(user_id, comptes), **parametres)
+
+    def executer_par_compte(self, user_id, fonction_analyse, **parametres):
+        """
+        Exécute une fonction d'analyse séparément sur chaque compte d'un utilisateur.
+
+        Returns:
+            dict: Résultats de l'analyse par identifiant de compte
+        """
+        return {
+            compte: self.executer(user_id, fonction_analyse, comptes=[compte], **parametres)
+            for compte in self.comptes(user_id)
+        }
+
+    def __len__(self):
+        return len(self.donnees)
+
+    def __contains__(self, user_id):
+        return user_id in self._tranches
@@ -0,0 +1,375 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from fonctions import selectionner_periode
+from recurrences import DECALAGES_CALENDAIRES, detecter_flux_recurrents
+from resultats import ResultatPrevisions
+
+# Horizon de prévision autorisé, en mois
+HORIZON_MAX = 12
+
+# Nombre minimal d'observations d'un même mois calendaire pour estimer un coefficient saisonnier
+OBSERVATIONS_SAISONNIERES_MIN = 2
+
+# Catégorie attribuée aux dépenses sans catégorie principale
+CATEGORIE_PAR_DEFAUT = 'Non catégorisé'
+
+def _indices_mois(dates):
+    """
+    Convertit des dates en numéros de mois absolus (année * 12 + mois - 1).
+    """
+    return dates.to_numpy().astype('datetime64[M]').astype(np.int64)
+
+def _mois_texte(indices):
+    """
+    Convertit des numéros de mois absolus en libellés 'AAAA-MM'.
+    """
+    return [str(mois) for mois in np.asarray(indices).astype('datetime64[M]')]
+
+def coefficients_saisonniers(valeurs, actifs, mois_calendaires):
+    """
+    Calcule un coefficient saisonnier multiplicatif par (utilisateur, mois calendaire, série).
+
+    Le coefficient d'un mois est la moyenne de ce mois calendaire rapportée à la moyenne
+    de toute la période ; il vaut 1 tant que le mois n'a pas été observé assez de fois.
+
+    Args:
+        valeurs (ndarray): Montants mensuels (utilisateurs × mois × séries)
+        actifs (ndarray): Mois couverts par l'historique de chaque utilisateur (utilisateurs × mois)
+        mois_calendaires (ndarray): Mois calendaire (0-11) de chaque colonne de mois
+
+    Returns:
+        ndarray: Coefficients (utilisateurs × 12 × séries)
+    """
+    valeurs_actives = valeurs * actifs[:, :, None]
+    nb_utilisateurs, _, nb_series = valeurs.shape
+
+    sommes = np.zeros((nb_utilisateurs, 12, nb_series))
+    comptes = np.zeros((nb_utilisateurs, 12))
+    for mois in range(12):
+        colonnes = mois_calendaires == mois
+        sommes[:, mois] = valeurs_actives[:, colonnes].sum(axis=1)
+        comptes[:, mois] = actifs[:, colonnes].sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moyenne_globale = valeurs_actives.sum(axis=1) / actifs.sum(axis=1)[:, None]
+        coefficients = (sommes / comptes[:, :, None]) / moyenne_globale[:, None, :]
+
+    suffisant = (comptes >= OBSERVATIONS_SAISONNIERES_MIN)[:, :, None]
+    coefficients = np.where(suffisant & np.isfinite(coefficients), coefficients, 1.0)
+
+    return coefficients
+
+def lisser_exponentiellement(valeurs, actifs, alpha=0.3):
+    """
+    Lissage exponentiel simple, calculé pour toutes les séries à la fois.
+
+    Le niveau de chaque utilisateur est initialisé à son premier mois d'historique ;
+    les mois qui précèdent ne sont pas pris en compte.
+
+    Args:
+        valeurs (ndarray): Montants mensuels (utilisateurs × mois × séries)
+        actifs (ndarray): Mois couverts par l'historique de chaque utilisateur (utilisateurs × mois)
+        alpha (float): Poids du mois le plus récent (entre 0 et 1)
+
+    Returns:
+        ndarray: Niveau lissé à la fin de l'historique (utilisateurs × séries)
+    """
+    nb_utilisateurs, nb_mois, nb_series = valeurs.shape
+    niveau = np.zeros((nb_utilisateurs, nb_series))
+    initialise = np.zeros(nb_utilisateurs, dtype=bool)
+
+    for mois in range(nb_mois):
+        actif = actifs[:, mois][:, None]
+        premier = (actifs[:, mois] & ~initialise)[:, None]
+        lisse = alpha * valeurs[:, mois] + (1 - alpha) * niveau
+        niveau = np.where(premier, valeurs[:, mois], np.where(actif, lisse, niveau))
+        initialise |= actifs[:, mois]
+
+    return niveau
+
+def projeter_flux(flux, mois_prevus, codes_utilisateurs, codes_series):
+    """
+    Répartit les échéances futures des flux récurrents actifs sur les mois prévus.
+
+    Args:
+        flux (DataFrame): Flux renvoyés par detecter_flux_recurrents
+        mois_prevus (ndarray): Numéros de mois absolus de l'horizon de prévision
+        codes_utilisateurs (ndarray): Indice de l'utilisateur de chaque flux
+        codes_series (ndarray): Indice de la série (catégorie) de chaque flux
+
+    Returns:
+        tuple: (indices utilisateur, indices de mois, indices de série, montants) des échéances
+    """
+    vides = (np.array([], dtype=np.int64),) * 3 + (np.array([], dtype=float),)
+    actifs = flux['actif'].to_numpy(dtype=bool) if len(flux) else np.array([], dtype=bool)
+    if not actifs.any():
+        return vides
+
+    dernier_mois = mois_prevus[-1]
+    resultats = []
+    for periodicite, decalage in DECALAGES_CALENDAIRES.items():
+        selection = actifs & (flux['periodicite'] == periodicite).to_numpy()
+        if not selection.any():
+            continue
+
+        echeances = pd.Series(flux['prochaine_date'].to_numpy()[selection])
+        montants = flux['montant'].to_numpy(dtype=float)[selection]
+        utilisateurs = codes_utilisateurs[selection]
+        series = codes_series[selection]
+
+        # Avancer d'une période à la fois tant qu'une échéance reste dans l'horizon
+        while True:
+            mois = _indices_mois(echeances)
+            dans_horizon = mois <= dernier_mois
+            if not dans_horizon.any():
+                break
+            resultats.append((utilisateurs[dans_horizon], mois[dans_horizon] - mois_prevus[0],
+                              series[dans_horizon], montants[dans_horizon]))
+            echeances = echeances + decalage
+
+    if not resultats:
+        return vides
+
+    utilisateurs, mois, series, montants = (np.concatenate(colonne) for colonne in zip(*resultats))
+    dans_horizon = mois >= 0
+
+    return utilisateurs[dans_horizon], mois[dans_horizon], series[dans_horizon], montants[dans_horizon]
+
+def prevoir_tresorerie_utilisateurs(df, horizon=6, alpha=0.3, solde_initial=None, colonne_utilisateur='user_id'):
+    """
+    Projette revenus, dépenses par catégorie principale et solde de fin de mois pour
+    chaque utilisateur, en un seul calcul sur la matrice utilisateur × mois × catégorie.
+
+    Les flux récurrents (abonnements, loyer, salaire...) sont projetés à leurs prochaines
+    échéances ; le reste des montants est prévu par lissage exponentiel des montants
+    désaisonnalisés, puis multiplié par le coefficient saisonnier du mois prévu.
+
+    Args:
+        df (DataFrame): Données de transactions
+        horizon (int): Nombre de mois à prévoir (1 à 12)
+        alpha (float): Poids du mois le plus récent dans le lissage (entre 0 et 1)
+        solde_initial (float ou dict): Solde actuel (par utilisateur si dict) ; sans solde
+            connu, le solde prévu est la variation cumulée depuis la fin de l'historique
+        colonne_utilisateur (str): Colonne identifiant l'utilisateur (None si une seule personne)
+
+    Returns:
+        dict: Résultats de la prévision (ResultatPrevisions) par utilisateur
+    """
+    if not 1 <= horizon <= HORIZON_MAX:
+        raise ValueError(f"L'horizon de prévision doit être compris entre 1 et {HORIZON_MAX} mois")
+
+    df = df[df['date'].notna()]
+    if df.empty:
+        return {}
+
+    if colonne_utilisateur is not None:
+        codes_lignes, utilisateurs = pd.factorize(df[colonne_utilisateur])
+        utilisateurs = utilisateurs.tolist()
+    else:
+        codes_lignes, utilisateurs = np.zeros(len(df), dtype=np.int64), [None]
+
+    # Les transactions appartenant à un flux récurrent sont projetées à part
+    flux_depenses, depenses_recurrentes = detecter_flux_recurrents(df, 'depenses', colonne_utilisateur=colonne_utilisateur)
+    flux_revenus, revenus_recurrents = detecter_flux_recurrents(df, 'revenus', colonne_utilisateur=colonne_utilisateur)
+    recurrentes = (depenses_recurrentes | revenus_recurrents).to_numpy()
+
+    # Séries prévues : une par catégorie principale de dépenses, plus les revenus en dernière position
+    montants = df['net_amount'].to_numpy(dtype=float)
+    parents = df['parent_name'].fillna(CATEGORIE_PAR_DEFAUT).to_numpy()
+    parents_flux = flux_depenses['parent_name'].fillna(CATEGORIE_PAR_DEFAUT).to_numpy()
+    codes_categories, categories = pd.factorize(np.concatenate([parents[montants < 0], parents_flux]))
+    categories = categories.tolist()
+    nb_series = len(categories) + 1
+    serie_revenus = nb_series - 1
+
+    index_categories = pd.Index(categories)
+    series_lignes = np.where(montants < 0, index_categories.get_indexer(parents), serie_revenus)
+
+    # Matrice utilisateur × mois × série des montants non récurrents
+    mois_lignes = _indices_mois(df['date'])
+    premier_mois, dernier_mois = mois_lignes.min(), mois_lignes.max()
+    nb_mois = dernier_mois - premier_mois + 1
+    nb_utilisateurs = len(utilisateurs)
+
+    non_recurrentes = ~recurrentes & (montants != 0)
+    positions = (codes_lignes * nb_mois + (mois_lignes - premier_mois)) * nb_series + series_lignes
+    valeurs = np.bincount(positions[non_recurrentes], weights=np.abs(montants[non_recurrentes]),
+                          minlength=nb_utilisateurs * nb_mois * nb_series).reshape(nb_utilisateurs, nb_mois, nb_series)
+
+    # Historique de chaque utilisateur : de son premier mois au dernier mois des données
+    debuts = np.full(nb_utilisateurs, dernier_mois)
+    np.minimum.at(debuts, codes_lignes, mois_lignes)
+    actifs = (premier_mois + np.arange(nb_mois))[None, :] >= debuts[:, None]
+
+    # Lissage des montants désaisonnalisés puis application du coefficient du mois prévu
+    mois_calendaires = (premier_mois + np.arange(nb_mois)) % 12
+    coefficients = coefficients_saisonniers(valeurs, actifs, mois_calendaires)
+    coefficients_historique = coefficients[:, mois_calendaires]
+    desaisonnalisees = np.divide(valeurs, coefficients_historique, out=valeurs.copy(),
+                                 where=coefficients_historique > 0)
+    niveau = lisser_exponentiellement(desaisonnalisees, actifs, alpha)
+
+    mois_prevus = dernier_mois + 1 + np.arange(horizon)
+    previsions = niveau[:, None, :] * coefficients[:, mois_prevus % 12]
+
+    # Ajout des échéances des flux récurrents
+    index_utilisateurs = pd.Index(utilisateurs)
+    nb_flux = np.zeros(nb_utilisateurs, dtype=np.int64)
+    for flux, series_flux in (
+        (flux_depenses, index_categories.get_indexer(parents_flux)),
+        (flux_revenus, np.full(len(flux_revenus), serie_revenus))
+    ):
+        if colonne_utilisateur is not None:
+            codes_flux = index_utilisateurs.get_indexer(flux[colonne_utilisateur])
+        else:
+            codes_flux = np.zeros(len(flux), dtype=np.int64)
+        u, m, s, montants_flux = projeter_flux(flux, mois_prevus, codes_flux, series_flux)
+        np.add.at(previsions, (u, m, s), montants_flux)
+        if len(flux):
+            nb_flux += np.bincount(codes_flux[flux['actif'].to_numpy(dtype=bool)], minlength=nb_utilisateurs)
+
+    # Solde de fin de mois
+    depenses = previsions[:, :, :serie_revenus].sum(axis=2)
+    revenus = previsions[:, :, serie_revenus]
+    if isinstance(solde_initial, dict):
+        soldes_depart = np.array([float(solde_initial.get(u, 0.0)) for u in utilisateurs])
+    else:
+        soldes_depart = np.full(nb_utilisateurs, float(solde_initial or 0.0))
+    soldes = soldes_depart[:, None] + np.cumsum(revenus - depenses, axis=1)
+
+    mois_texte = _mois_texte(mois_prevus)
+    dernier_mois_texte = _mois_texte([dernier_mois])[0]
+    resultats = {}
+    for u, utilisateur in enumerate(utilisateurs):
+        depenses_categories = {
+            categorie: previsions[u, :, c].round(2).tolist()
+            for c, categorie in enumerate(categories)
+            if previsions[u, :, c].any()
+        }
+        resultats[utilisateur] = ResultatPrevisions(
+            mois_prevus=mois_texte,
+            dernier_mois_observe=dernier_mois_texte,
+            revenus=revenus[u].round(2).tolist(),
+            depenses=depenses[u].round(2).tolist(),
+            depenses_par_categorie=dict(sorted(depenses_categories.items(), key=lambda x: -sum(x[1]))),
+            solde_initial=round(float(soldes_depart[u]), 2),
+            solde_fin_de_mois=soldes[u].round(2).tolist(),
+            nb_flux_recurrents=int(nb_flux[u]),
+            horizon=horizon
+        )
+
+    return resultats
+
+def analyser_previsions(df, horizon=6, alpha=0.3, solde_initial=None, date_debut=None, date_fin=None, fenetre=None):
+    """
+    Prévoit les revenus, les dépenses par catégorie et le solde de fin de mois
+    des prochains mois à partir de l'historique des transactions.
+
+    Args:
+        df (DataFrame): Données de transactions
+        horizon (int): Nombre de mois à prévoir (1 à 12)
+        alpha (float): Poids du mois le plus récent dans le lissage (entre 0 et 1)
+        solde_initial (float): Solde actuel du compte (0 par défaut : variation cumulée du solde)
+        date_debut (str ou Timestamp): Début de l'historique utilisé (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de l'historique utilisé (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+
+    Returns:
+        ResultatPrevisions: Résultats de la prévision de trésorerie
+    """
+    # Restreindre l'historique à la période demandée
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
+
+    resultats = prevoir_tresorerie_utilisateurs(df, horizon, alpha, solde_initial, colonne_utilisateur=None)
+
+    if not resultats:
+        return ResultatPrevisions(
+            mois_prevus=[],
+            dernier_mois_observe=None,
+            revenus=[],
+            depenses=[],
+            depenses_par_categorie={},
+            solde_initial=float(solde_initial or 0.0),
+            solde_fin_de_mois=[],
+            nb_flux_recurrents=0,
+            horizon=horizon
+        )
+
+    return resultats[None]
+
+def afficher_previsions(resultats):
+    """
+    Affiche les résultats de la prévision de trésorerie.
+
+    Args:
+        resultats (dict): Résultats de la prévision de trésorerie
+    """
+    print("\n=== PRÉVISIONS DE TRÉSORERIE ===\n")
+
+    if not resultats['mois_prevus']:
+        print("Pas assez de données pour établir une prévision.")
+        return
+
+    print(f"Dernier mois observé: {resultats['dernier_mois_observe']} "
+          f"({resultats['nb_flux_recurrents']} flux récurrents pris en compte)")
+    print(f"Solde de départ: {resultats['solde_initial']:.2f}€\n")
+
+    print(f"{'Mois':<10}{'Revenus':>12}{'Dépenses':>12}{'Solde':>12}")
+    for mois, revenus, depenses, solde in zip(resultats['mois_prevus'], resultats['revenus'],
+                                              resultats['depenses'], resultats['solde_fin_de_mois']):
+        print(f"{mois:<10}{revenus:>11.2f}€{depenses:>11.2f}€{solde:>11.2f}€")
+
+    print("\nDÉPENSES PRÉVUES PAR CATÉGORIE (moyenne mensuelle):")
+    for categorie, valeurs in resultats['depenses_par_categorie'].items():
+        print(f"  - {categorie}: {sum(valeurs) / len(valeurs):.2f}€")
+
+    solde_minimum = min(resultats['solde_fin_de_mois'])
+    if solde_minimum < 0:
+        mois_negatif = resultats['mois_prevus'][resultats['solde_fin_de_mois'].index(solde_minimum)]
+        print(f"\nAttention: le solde prévu devient négatif ({solde_minimum:.2f}€ en {mois_negatif}).")
+
+def visualiser_previsions(resultats, fichier='previsions_tresorerie.png', afficher=True):
+    """
+    Crée une visualisation graphique de la prévision de trésorerie.
+
+    Args:
+        resultats (dict): Résultats de la prévision de trésorerie
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
+    """
+    if not resultats['mois_prevus']:
+        print("Pas de prévision à visualiser.")
+        return
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
+    mois = resultats['mois_prevus']
+    x = np.arange(len(mois))
+
+    # Graphique 1: Dépenses prévues par catégorie (barres empilées) et revenus prévus
+    bas = np.zeros(len(mois))
+    for categorie, valeurs in resultats['depenses_par_categorie'].items():
+        ax1.bar(x, valeurs, bottom=bas, label=categorie)
+        bas += np.asarray(valeurs)
+    ax1.plot(x, resultats['revenus'], color='green', marker='o', linewidth=2, label='Revenus')
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(mois, rotation=45)
+    ax1.set_title('Revenus et dépenses prévus')
+    ax1.set_ylabel('Montant (€)')
+    ax1.legend(fontsize='small')
+
+    # Graphique 2: Solde de fin de mois prévu
+    ax2.plot(x, resultats['solde_fin_de_mois'], marker='o', color='#66b3ff', linewidth=2)
+    ax2.axhline(y=0, color='r', linestyle='--')
+    ax2.set_xticks(x)
+    ax2.set_xticklabels(mois, rotation=45)
+    ax2.set_title('Solde de fin de mois prévu')
+    ax2.set_ylabel('Solde (€)')
+
+    plt.tight_layout()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
@@ -0,0 +1,333 @@
+import base64
+import html
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import matplotlib
+matplotlib.use('Agg')  # Rendu des graphiques sans écran
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+
+import assistant
+from cache_graphiques import CacheGraphiques
+from fonctions import generer_graphique_octets, selectionner_periode
+from multi_comptes import MagasinTransactions
+from referentiel import ReferentielDepenses
+
+# Titre de chaque section du rapport, dans l'ordre d'affichage
+TITRES_SECTIONS = {
+    "categories_depenses": "Répartition des dépenses",
+    "prelevements_automatiques": "Prélèvements automatiques",
+    "depenses_inhabituelles": "Dépenses inhabituelles",
+    "potentiel_economies": "Potentiel d'économies",
+    "capacite_emprunt": "Capacité d'emprunt",
+    "previsions_tresorerie": "Prévisions de trésorerie",
+    "calendrier_depenses": "Calendrier des dépenses"
+}
+
+# Nombre de tâches en attente par processus : borne la mémoire occupée par les résultats
+TACHES_EN_ATTENTE_PAR_PROCESSUS = 2
+
+MODELE_HTML = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>{titre}</title>
+<style>
+body {{ font-family: sans-serif; max-width: 960px; margin: 2em auto; color: #222; }}
+h1 {{ border-bottom: 2px solid #2c7fb8; padding-bottom: .3em; }}
+h2 {{ color: #2c7fb8; margin-top: 2em; }}
+table {{ border-collapse: collapse; margin: 1em 0; }}
+td {{ padding: .25em 1em .25em 0; border-bottom: 1px solid #eee; }}
+td.valeur {{ text-align: right; font-weight: bold; }}
+img {{ max-width: 100%; }}
+</style>
+</head>
+<body>
+<h1>{titre}</h1>
+<p>{periode}</p>
+{sections}
+</body>
+</html>
+"""
+
+def formater_euros(montant):
+    return f"{montant:,.2f} €".replace(',', ' ')
+
+def resumer_analyse(categorie, resultats):
+    """
+    Extrait les indicateurs principaux d'une analyse pour le rapport.
+
+    Args:
+        categorie (str): Type d'analyse
+        resultats (dict): Résultats renvoyés par executer_analyse
+
+    Returns:
+        list: Couples (libellé, valeur formatée)
+    """
+    if categorie == "categories_depenses":
+        lignes = [("Total des dépenses", formater_euros(resultats["categories"]["total_depenses"]))]
+        for nom, comparaison in resultats["comparaison"].items():
+            lignes.append((nom, f"{comparaison['pourcentage_reel']:.1f}% (recommandé : {comparaison['pourcentage_recommande']:.0f}%)"))
+        return lignes
+
+    if categorie == "prelevements_automatiques":
+        lignes = [(type_transaction.replace('_', ' ').capitalize(), f"{pourcentage:.1f}%")
+                  for type_transaction, pourcentage in resultats["pourcentages"].items()]
+        lignes.append(("Abonnements et échéances récurrentes", str(len(resultats.get("abonnements", [])))))
+        return lignes
+
+    if categorie == "depenses_inhabituelles":
+        depenses = resultats["depenses_inhabituelles"]
+        lignes = [("Dépenses inhabituelles récentes", str(len(depenses)))]
+        for depense in depenses[:5]:
+            date = depense['date'].strftime('%d/%m/%Y') if pd.notna(depense['date']) else ''
+            lignes.append((f"{date} {depense['description']}", formater_euros(depense['montant'])))
+        return lignes
+
+    if categorie == "potentiel_economies":
+        return [
+            ("Objectif d'économies mensuelles", formater_euros(resultats["montant_cible"])),
+            ("Économies possibles", formater_euros(resultats["economies_totales"])),
+            ("Objectif atteint", "oui" if resultats["objectif_atteint"] else "non")
+        ]
+
+    if categorie == "capacite_emprunt":
+        return [
+            ("Revenu mensuel", formater_euros(resultats["revenu_mensuel"])),
+            ("Dépenses mensuelles", formater_euros(resultats["depenses_mensuelles"])),
+            ("Taux d'endettement actuel", f"{resultats['taux_endettement_actuel'] * 100:.1f}%"),
+            (f"Capacité d'emprunt ({resultats['duree_pret']} ans à {resultats['taux_interet'] * 100:.2f}%)",
+             formater_euros(resultats["capacite_emprunt"]))
+        ]
+
+    if categorie == "previsions_tresorerie":
+        return [(f"Solde prévu fin {mois}", formater_euros(solde))
+                for mois, solde in zip(resultats["mois_prevus"], resultats["solde_fin_de_mois"])]
+
+    if categorie == "calendrier_depenses":
+        lignes = [("Part des dépenses le week-end", f"{resultats['part_week_end'] * 100:.1f}%")]
+        if resultats["ratio_pic_paie"] is not None:
+            lignes.append((f"Dépenses des {resultats['fenetre_paie']} jours suivant la paie",
+                           f"x{resultats['ratio_pic_paie']:.2f} par rapport au reste du mois"))
+        return lignes
+
+    return []
+
+def analyser_utilisateur(transactions, referentiel=None, avec_graphiques=True, cache_graphiques=None):
+    """
+    Exécute une fois chaque analyse du rapport et génère ses graphiques sans affichage.
+
+    Args:
+        transactions (DataFrame): Transactions de l'utilisateur
+        referentiel (ReferentielDepenses): Référentiel de population (optionnel)
+        avec_graphiques (bool): Générer les graphiques PNG
+        cache_graphiques (CacheGraphiques): Cache des graphiques déjà rendus (optionnel)
+
+    Returns:
+        dict: {catégorie: (résultats, graphique PNG ou None)} ; une analyse en échec est omise
+    """
+    sections = {}
+    for categorie in TITRES_SECTIONS:
+        parametres = {"referentiel": referentiel} if categorie == "categories_depenses" else {}
+        try:
+            resultats = assistant.executer_analyse(categorie, transactions, **parametres)
+        except (KeyError, ValueError, ZeroDivisionError):
+            # Données insuffisantes pour cette analyse : la section est omise
+            continue
+
+        graphique = None
+        if avec_graphiques and cache_graphiques is not None:
+            graphique = cache_graphiques.generer(assistant.visualiser_analyse, categorie, resultats)
+        elif avec_graphiques:
+            graphique = generer_graphique_octets(assistant.visualiser_analyse, categorie, resultats)
+        sections[categorie] = (resultats, graphique)
+
+    return sections
+
+def rendre_html(titre, periode, sections):
+    """
+    Assemble le rapport HTML (graphiques inclus en base64, fichier autonome).
+
+    Args:
+        titre (str): Titre du rapport
+        periode (str): Description de la période couverte
+        sections (dict): Sortie de analyser_utilisateur
+
+    Returns:
+        str: Document HTML
+    """
+    blocs = []
+    for categorie, (resultats, graphique) in sections.items():
+        lignes = ''.join(
+            f'<tr><td>{html.escape(libelle)}</td><td class="valeur">{html.escape(valeur)}</td></tr>'
+            for libelle, valeur in resumer_analyse(categorie, resultats)
+        )
+        bloc = f'<h2>{html.escape(TITRES_SECTIONS[categorie])}</h2>\n<table>{lignes}</table>'
+        if graphique:
+            bloc += f'\n<img alt="" src="data:image/png;base64,{base64.b64encode(graphique).decode("ascii")}">'
+        blocs.append(bloc)
+
+    return MODELE_HTML.format(titre=html.escape(titre), periode=html.escape(periode), sections='\n'.join(blocs))
+
+def rendre_pdf(chemin_fichier, titre, periode, sections):
+    """
+    Écrit le rapport PDF : une page de synthèse puis une page par graphique.
+
+    Args:
+        chemin_fichier (str): Fichier PDF de destination
+        titre (str): Titre du rapport
+        periode (str): Description de la période couverte
+        sections (dict): Sortie de analyser_utilisateur
+    """
+    with PdfPages(chemin_fichier) as pdf:
+        figure = plt.figure(figsize=(8.27, 11.69))
+        figure.text(0.08, 0.95, titre, fontsize=16, weight='bold')
+        figure.text(0.08, 0.925, periode, fontsize=10)
+
+        hauteur = 0.88
+        for categorie, (resultats, _) in sections.items():
+            figure.text(0.08, hauteur, TITRES_SECTIONS[categorie], fontsize=12, weight='bold', color='#2c7fb8')
+            hauteur -= 0.022
+            for libelle, valeur in resumer_analyse(categorie, resultats)[:8]:
+                figure.text(0.10, hauteur, libelle[:70], fontsize=8)
+                figure.text(0.92, hauteur, valeur, fontsize=8, ha='right')
+                hauteur -= 0.017
+            hauteur -= 0.01
+        pdf.savefig(figure)
+        plt.close(figure)
+
+        for categorie, (_, graphique) in sections.items():
+            if not graphique:
+                continue
+            image = plt.imread(io.BytesIO(graphique), format='png')
+            figure = plt.figure(figsize=(11.69, 8.27))
+            axe = figure.add_axes([0, 0, 1, 1])
+            axe.imshow(image)
+            axe.axis('off')
+            pdf.savefig(figure)
+            plt.close(figure)
+
+def generer_rapport(transactions, chemin_base, titre, formats=('html',), referentiel=None, cache_graphiques=None):
+    """
+    Produit le rapport d'un utilisateur dans les formats demandés.
+
+    Args:
+        transactions (DataFrame): Transactions de l'utilisateur
+        chemin_base (str): Chemin des fichiers, sans extension
+        titre (str): Titre du rapport
+        formats (tuple): 'html' et/ou 'pdf'
+        referentiel (ReferentielDepenses): Référentiel de population (optionnel)
+        cache_graphiques (CacheGraphiques): Cache des graphiques déjà rendus (optionnel)
+
+    Returns:
+        list: Chemins des fichiers produits
+    """
+    sections = analyser_utilisateur(transactions, referentiel, cache_graphiques=cache_graphiques)
+
+    dates = transactions['date'].dropna()
+    periode = (f"Transactions du {dates.min():%d/%m/%Y} au {dates.max():%d/%m/%Y}"
+               if len(dates) else "Aucune transaction datée")
+
+    fichiers = []
+    if 'html' in formats:
+        with open(chemin_base + '.html', 'w', encoding='utf-8') as fichier:
+            fichier.write(rendre_html(titre, periode, sections))
+        fichiers.append(chemin_base + '.html')
+    if 'pdf' in formats:
+        rendre_pdf(chemin_base + '.pdf', titre, periode, sections)
+        fichiers.append(chemin_base + '.pdf')
+
+    return fichiers
+
+# État de chaque processus de calcul, initialisé une fois par processus
+_MAGASIN = None
+_REFERENTIEL = None
+_CACHE_GRAPHIQUES = None
+
+def _initialiser_processus(source, referentiel, repertoire_cache_graphiques=None):
+    global _MAGASIN, _REFERENTIEL, _CACHE_GRAPHIQUES
+    _MAGASIN = MagasinTransactions.depuis_csv(source) if isinstance(source, str) else source
+    _REFERENTIEL = referentiel
+    if repertoire_cache_graphiques is not None:
+        # Répertoire partagé entre les processus (écritures atomiques)
+        _CACHE_GRAPHIQUES = CacheGraphiques(repertoire_cache_graphiques)
+
+def _rapport_utilisateur(utilisateur, dossier, formats, mois):
+    # Exécuté dans un processus de calcul : seuls les chemins produits reviennent au parent
+    transactions = _MAGASIN.transactions_utilisateur(utilisateur)
+    titre = f"Rapport financier - {utilisateur}"
+    if mois is not None:
+        transactions = selectionner_periode(transactions, date_fin=pd.Period(mois, 'M').end_time)
+        titre += f" - {mois}"
+
+    chemin_base = os.path.join(dossier, f"rapport_{utilisateur}" + (f"_{mois}" if mois else ""))
+    return generer_rapport(transactions, chemin_base, titre, formats, _REFERENTIEL, _CACHE_GRAPHIQUES)
+
+def generer_rapports(source, utilisateurs=None, dossier='rapports', formats=('html',), mois=None,
+                     nb_processus=None, referentiel=None, taches_par_processus=None,
+                     repertoire_cache_graphiques=None):
+    """
+    Génère les rapports de plusieurs utilisateurs en parallèle.
+
+    Chaque processus charge les transactions une seule fois puis traite les utilisateurs un
+    par un ; le nombre de tâches soumises à la fois est borné et seuls les chemins des
+    fichiers reviennent au processus principal, de sorte que la mémoire ne dépend pas du
+    nombre d'utilisateurs.
+
+    Args:
+        source (str ou MagasinTransactions): Fichier CSV multi-utilisateurs ou magasin déjà chargé
+        utilisateurs (list): Utilisateurs à traiter (None pour tous)
+        dossier (str): Dossier de destination des rapports
+        formats (tuple): 'html' et/ou 'pdf'
+        mois (str): Mois du rapport ('AAAA-MM') : seules les transactions jusqu'à sa fin sont analysées
+        nb_processus (int): Nombre de processus (None : un par cœur)
+        referentiel (ReferentielDepenses): Référentiel de population (par défaut, construit sur la source)
+        taches_par_processus (int): Nombre de rapports après lequel un processus est remplacé
+            (limite la mémoire accumulée par matplotlib ; None pour ne jamais le remplacer)
+        repertoire_cache_graphiques (str): Répertoire du cache des graphiques, partagé entre
+            les processus et d'une exécution à l'autre (None pour refaire chaque rendu)
+
+    Returns:
+        dict: {'rapports': {utilisateur: chemins}, 'erreurs': {utilisateur: message}}
+    """
+    if isinstance(source, str) and (utilisateurs is None or referentiel is None):
+        source = MagasinTransactions.depuis_csv(source)
+    if utilisateurs is None:
+        utilisateurs = source.utilisateurs()
+    if referentiel is None:
+        referentiel = ReferentielDepenses()
+        referentiel.ajouter_transactions(source.donnees, source.colonne_utilisateur)
+
+    os.makedirs(dossier, exist_ok=True)
+
+    nb_processus = nb_processus or os.cpu_count()
+    options = {'max_tasks_per_child': taches_par_processus} if taches_par_processus else {}
+    rapports, erreurs = {}, {}
+
+    with ProcessPoolExecutor(max_workers=nb_processus, initializer=_initialiser_processus,
+                             initargs=(source, referentiel, repertoire_cache_graphiques), **options) as executeur:
+        limite = nb_processus * TACHES_EN_ATTENTE_PAR_PROCESSUS
+        en_cours = {}
+        restants = iter(utilisateurs)
+
+        while True:
+            for utilisateur in restants:
+                en_cours[executeur.submit(_rapport_utilisateur, utilisateur, dossier, formats, mois)] = utilisateur
+                if len(en_cours) >= limite:
+                    break
+            if not en_cours:
+                break
+
+            terminees, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for tache in terminees:
+                utilisateur = en_cours.pop(tache)
+                try:
+                    rapports[utilisateur] = tache.result()
+                except Exception as e:
+                    erreurs[utilisateur] = str(e)
+
+    return {'rapports': rapports, 'erreurs': erreurs}
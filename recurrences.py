@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from marchands import normaliser_libelles
+
+# Périodicités reconnues : (intervalle nominal, intervalle médian minimal, intervalle médian maximal) en jours
+PERIODICITES = {
+    'hebdomadaire': (7, 5, 9),
+    'mensuelle': (30, 26, 35),
+    'trimestrielle': (91, 84, 98),
+    'annuelle': (365, 350, 380)
+}
+
+# Échéance suivante d'un flux, en calendrier (un paiement du 1er du mois revient le 1er)
+DECALAGES_CALENDAIRES = {
+    'hebdomadaire': pd.DateOffset(weeks=1),
+    'mensuelle': pd.DateOffset(months=1),
+    'trimestrielle': pd.DateOffset(months=3),
+    'annuelle': pd.DateOffset(years=1)
+}
+
+def detecter_flux_recurrents(df, sens='depenses', min_occurrences=3, tolerance_intervalle=0.25,
+                             tolerance_montant=0.2, regularite_min=0.75, colonne_utilisateur=None):
+    """
+    Détecte les paiements (ou revenus) récurrents par l'analyse des intervalles entre
+    transactions d'un même marchand et de la stabilité de leurs montants.
+
+    Les transactions sont triées par (marchand, date) puis toutes les statistiques sont
+    calculées par opérations vectorisées sur les tableaux triés.
+
+    Args:
+        df (DataFrame): Données de transactions
+        sens (str): 'depenses' (montants négatifs) ou 'revenus' (montants positifs)
+        min_occurrences (int): Nombre minimal de transactions pour former un flux (2 pour l'annuel)
+        tolerance_intervalle (float): Écart relatif toléré entre un intervalle et l'intervalle médian
+        tolerance_montant (float): Écart relatif toléré entre un montant et le montant médian
+        regularite_min (float): Part minimale d'intervalles et de montants dans les tolérances
+        colonne_utilisateur (str): Colonne utilisateur à inclure dans la clé (données multi-utilisateurs)
+
+    Returns:
+        tuple: (DataFrame des flux récurrents, Series booléenne alignée sur df marquant
+                les transactions appartenant à un flux récurrent)
+    """
+    montants = df['net_amount'].to_numpy()
+    selection = (montants < 0) if sens == 'depenses' else (montants > 0)
+    selection &= df['date'].notna().to_numpy()
+    sous_ensemble = df[selection]
+
+    est_recurrente = pd.Series(False, index=df.index)
+    colonnes_flux = ['marchand', 'periodicite', 'intervalle_jours', 'nb_occurrences', 'montant',
+                     'regularite', 'stabilite_montant', 'premiere_date', 'derniere_date',
+                     'prochaine_date', 'actif', 'category_name', 'parent_name']
+    if colonne_utilisateur is not None:
+        colonnes_flux = [colonne_utilisateur] + colonnes_flux
+
+    if sous_ensemble.empty:
+        return pd.DataFrame(columns=colonnes_flux), est_recurrente
+
+    # Clé de regroupement : identifiant de marchand s'il a été calculé au chargement,
+    # sinon libellé normalisé (et utilisateur le cas échéant)
+    if 'merchant_id' in sous_ensemble.columns:
+        marchands = sous_ensemble['merchant_id'].to_numpy()
+    else:
+        marchands = normaliser_libelles(sous_ensemble['description_fake']).to_numpy()
+    if colonne_utilisateur is not None:
+        cles = pd.MultiIndex.from_arrays([sous_ensemble[colonne_utilisateur].to_numpy(), marchands])
+    else:
+        cles = marchands
+    codes, _ = pd.factorize(cles)
+
+    jours = sous_ensemble['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    valeurs = np.abs(sous_ensemble['net_amount'].to_numpy(dtype=float))
+
+    # Tri par (marchand, date) puis intervalles entre transactions consécutives d'un même marchand
+    ordre = np.lexsort((jours, codes))
+    codes_tries = codes[ordre]
+    jours_tries = jours[ordre]
+    valeurs_triees = valeurs[ordre]
+
+    meme_marchand = np.r_[False, codes_tries[1:] == codes_tries[:-1]]
+    intervalles = np.where(meme_marchand, np.diff(jours_tries, prepend=jours_tries[0]), np.nan)
+
+    lignes = pd.DataFrame({
+        'code': codes_tries,
+        'intervalle': intervalles,
+        'valeur': valeurs_triees,
+        'jour': jours_tries
+    })
+    stats = lignes.groupby('code').agg(
+        nb_occurrences=('valeur', 'size'),
+        intervalle_median=('intervalle', 'median'),
+        montant=('valeur', 'median'),
+        premier_jour=('jour', 'min'),
+        dernier_jour=('jour', 'max')
+    )
+
+    # Part des intervalles et des montants proches de leur médiane, par marchand
+    intervalle_median = stats['intervalle_median'].to_numpy()[codes_tries]
+    montant_median = stats['montant'].to_numpy()[codes_tries]
+    lignes['intervalle_regulier'] = np.abs(intervalles - intervalle_median) <= tolerance_intervalle * intervalle_median
+    lignes['montant_stable'] = np.abs(valeurs_triees - montant_median) <= tolerance_montant * montant_median
+    stats['regularite'] = lignes[meme_marchand].groupby('code')['intervalle_regulier'].mean()
+    stats['stabilite_montant'] = lignes.groupby('code')['montant_stable'].mean()
+
+    # Classification de la périodicité selon l'intervalle médian
+    conditions = [stats['intervalle_median'].between(minimum, maximum)
+                  for _, minimum, maximum in PERIODICITES.values()]
+    stats['periodicite'] = np.select(conditions, list(PERIODICITES.keys()), default='')
+    occurrences_requises = np.where(stats['periodicite'] == 'annuelle', 2, min_occurrences)
+
+    flux = stats[
+        (stats['periodicite'] != '')
+        & (stats['nb_occurrences'] >= occurrences_requises)
+        & (stats['regularite'].fillna(0) >= regularite_min)
+        & (stats['stabilite_montant'] >= regularite_min)
+    ].copy()
+
+    # Dates, prochaine échéance et activité (dernière occurrence récente au regard de la période)
+    dernier_jour_donnees = jours.max()
+    intervalle = flux['intervalle_median'].round().astype(np.int64)
+    flux['intervalle_jours'] = intervalle
+    flux['premiere_date'] = pd.to_datetime(flux['premier_jour'], unit='D')
+    flux['derniere_date'] = pd.to_datetime(flux['dernier_jour'], unit='D')
+    flux['prochaine_date'] = flux['derniere_date']
+    for periodicite, decalage in DECALAGES_CALENDAIRES.items():
+        est_periodicite = flux['periodicite'] == periodicite
+        flux.loc[est_periodicite, 'prochaine_date'] = flux.loc[est_periodicite, 'derniere_date'] + decalage
+    flux['actif'] = flux['dernier_jour'] + 1.5 * intervalle >= dernier_jour_donnees
+
+    # Nom et catégories de la dernière transaction de chaque flux
+    derniere_position = np.flatnonzero(np.r_[codes_tries[1:] != codes_tries[:-1], True])
+    positions_origine = pd.Series(ordre[derniere_position], index=codes_tries[derniere_position])[flux.index]
+    dernieres = sous_ensemble.iloc[positions_origine.to_numpy()]
+    flux['marchand'] = normaliser_libelles(dernieres['description_fake']).to_numpy()
+    flux['category_name'] = dernieres['category_name'].to_numpy()
+    flux['parent_name'] = dernieres['parent_name'].to_numpy()
+
+    if colonne_utilisateur is not None:
+        flux[colonne_utilisateur] = dernieres[colonne_utilisateur].to_numpy()
+
+    # Marquer les transactions d'origine appartenant à un flux récurrent
+    positions_selection = np.flatnonzero(selection)
+    est_recurrente.iloc[positions_selection[np.isin(codes, flux.index.to_numpy())]] = True
+
+    flux = flux.sort_values('montant', ascending=False).reset_index(drop=True)
+
+    return flux[colonnes_flux], est_recurrente
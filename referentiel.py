@@ -0,0 +1,313 @@
+import json
+import math
+import os
+import random
+
+import numpy as np
+
+class CroquisQuantiles:
+    """
+    Résumé compact d'une distribution (croquis KLL) permettant d'estimer rangs et quantiles.
+
+    Les valeurs sont conservées dans une hiérarchie de compacteurs : quand un niveau est plein,
+    il est trié et une valeur sur deux monte au niveau suivant, où elle compte double. La taille
+    reste de l'ordre de k quel que soit le nombre de valeurs, et deux croquis construits
+    séparément (par exemple sur deux processus) se fusionnent sans perte de précision.
+    """
+
+    def __init__(self, k=200, graine=None):
+        """
+        Args:
+            k (int): Taille du compacteur le plus haut (précision ~ 1/k sur les rangs)
+            graine (int): Graine du tirage des compactions (None pour un tirage non reproductible)
+        """
+        self.k = k
+        self.n = 0
+        self.compacteurs = [[]]
+        self._aleatoire = random.Random(graine)
+        self._cache = None
+
+    def _capacite(self, niveau):
+        """
+        Capacité d'un niveau : décroissance géométrique (2/3) en s'éloignant du sommet.
+        """
+        profondeur = len(self.compacteurs) - niveau - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** profondeur)))
+
+    def _compresser(self):
+        """
+        Compacte les niveaux pleins jusqu'à ce que le croquis retrouve sa taille maximale.
+        """
+        taille_max = sum(self._capacite(niveau) for niveau in range(len(self.compacteurs)))
+        taille = sum(len(compacteur) for compacteur in self.compacteurs)
+
+        niveau = 0
+        while taille >= taille_max and niveau < len(self.compacteurs):
+            compacteur = self.compacteurs[niveau]
+            if len(compacteur) >= self._capacite(niveau):
+                if niveau + 1 == len(self.compacteurs):
+                    self.compacteurs.append([])
+                    taille_max = sum(self._capacite(h) for h in range(len(self.compacteurs)))
+
+                compacteur.sort()
+                # Un élément isolé reste au niveau courant ; les autres sont compactés par paires
+                reste = [compacteur.pop()] if len(compacteur) % 2 else []
+                decalage = self._aleatoire.randint(0, 1)
+                self.compacteurs[niveau + 1].extend(compacteur[decalage::2])
+                self.compacteurs[niveau] = reste
+
+                taille = sum(len(c) for c in self.compacteurs)
+            niveau += 1
+
+        self._cache = None
+
+    def ajouter(self, valeur):
+        """
+        Ajoute une valeur au croquis.
+        """
+        self.ajouter_tableau([valeur])
+
+    def ajouter_tableau(self, valeurs):
+        """
+        Ajoute un ensemble de valeurs au croquis.
+
+        Args:
+            valeurs (array-like): Valeurs à ajouter (les NaN sont ignorés)
+        """
+        valeurs = np.asarray(valeurs, dtype=float)
+        valeurs = valeurs[~np.isnan(valeurs)]
+
+        # Ajout par blocs de la taille du premier niveau pour garder une mémoire bornée
+        for debut in range(0, len(valeurs), self.k):
+            self.compacteurs[0].extend(valeurs[debut:debut + self.k].tolist())
+            self._compresser()
+        self.n += len(valeurs)
+
+    def fusionner(self, autre):
+        """
+        Ajoute au croquis le contenu d'un autre croquis (de même k).
+
+        Args:
+            autre (CroquisQuantiles): Croquis construit sur une autre partie des données
+
+        Returns:
+            CroquisQuantiles: Le croquis courant, fusionné
+        """
+        while len(self.compacteurs) < len(autre.compacteurs):
+            self.compacteurs.append([])
+        for niveau, compacteur in enumerate(autre.compacteurs):
+            self.compacteurs[niveau].extend(compacteur)
+        self.n += autre.n
+        self._compresser()
+
+        return self
+
+    def _valeurs_ponderees(self):
+        """
+        Renvoie les valeurs triées et leurs poids cumulés (calculés une fois par état du croquis).
+        """
+        if self._cache is None:
+            valeurs = np.concatenate([np.asarray(c, dtype=float) for c in self.compacteurs])
+            poids = np.concatenate([np.full(len(c), 2.0 ** niveau) for niveau, c in enumerate(self.compacteurs)])
+            ordre = np.argsort(valeurs, kind='stable')
+            self._cache = (valeurs[ordre], np.cumsum(poids[ordre]))
+        return self._cache
+
+    def rang(self, valeur):
+        """
+        Estime la part des valeurs inférieures ou égales à valeur (recherche dichotomique).
+
+        Returns:
+            float: Rang normalisé entre 0 et 1
+        """
+        if self.n == 0:
+            return 0.0
+        valeurs, poids_cumules = self._valeurs_ponderees()
+        position = np.searchsorted(valeurs, valeur, side='right')
+        return float(poids_cumules[position - 1] / poids_cumules[-1]) if position else 0.0
+
+    def quantile(self, q):
+        """
+        Estime le quantile q de la distribution.
+
+        Args:
+            q (float): Ordre du quantile, entre 0 et 1
+
+        Returns:
+            float: Valeur estimée (NaN si le croquis est vide)
+        """
+        if self.n == 0:
+            return float('nan')
+        valeurs, poids_cumules = self._valeurs_ponderees()
+        position = np.searchsorted(poids_cumules, q * poids_cumules[-1], side='left')
+        return float(valeurs[min(position, len(valeurs) - 1)])
+
+    def vers_dict(self):
+        """
+        Returns:
+            dict: Représentation sérialisable en JSON
+        """
+        return {'k': self.k, 'n': self.n, 'compacteurs': self.compacteurs}
+
+    @classmethod
+    def depuis_dict(cls, contenu):
+        """
+        Reconstruit un croquis à partir de vers_dict.
+        """
+        croquis = cls(contenu['k'])
+        croquis.n = contenu['n']
+        croquis.compacteurs = [list(compacteur) for compacteur in contenu['compacteurs']]
+        return croquis
+
+    def __len__(self):
+        return self.n
+
+class ReferentielDepenses:
+    """
+    Référentiel de population : un croquis de quantiles par catégorie principale, construit sur
+    la part du budget que chaque utilisateur y consacre.
+
+    Un utilisateur sans dépense dans une catégorie compte pour 0% sans être stocké : seul le
+    nombre total d'utilisateurs est conservé. Le référentiel ne garde ni les transactions ni
+    les utilisateurs, et ceux construits en parallèle se fusionnent.
+    """
+
+    def __init__(self, k=200):
+        """
+        Args:
+            k (int): Taille des croquis (précision ~ 1/k sur les percentiles)
+        """
+        self.k = k
+        self.nb_utilisateurs = 0
+        self.croquis = {}
+
+    def _croquis(self, categorie):
+        if categorie not in self.croquis:
+            self.croquis[categorie] = CroquisQuantiles(self.k)
+        return self.croquis[categorie]
+
+    def ajouter_utilisateur(self, pourcentages):
+        """
+        Ajoute la répartition des dépenses d'un utilisateur.
+
+        Args:
+            pourcentages (dict): Part du budget par catégorie (clé 'pourcentages' de
+                analyser_categories_depenses)
+        """
+        for categorie, pourcentage in pourcentages.items():
+            if pourcentage > 0:
+                self._croquis(categorie).ajouter(pourcentage)
+        self.nb_utilisateurs += 1
+
+    def ajouter_transactions(self, df, colonne_utilisateur='user_id'):
+        """
+        Ajoute tous les utilisateurs d'un lot de transactions.
+
+        Chaque utilisateur doit être entièrement contenu dans un seul lot : des lots
+        d'utilisateurs distincts peuvent être traités séparément puis fusionnés.
+
+        Args:
+            df (DataFrame): Transactions de plusieurs utilisateurs
+            colonne_utilisateur (str): Colonne identifiant l'utilisateur
+        """
+        depenses = df[df['net_amount'] < 0]
+        montants = depenses.groupby([colonne_utilisateur, 'parent_name'])['net_amount'].sum().abs()
+        parts = (montants / montants.groupby(level=0).transform('sum') * 100).round(2)
+
+        for categorie, valeurs in parts.groupby(level=1):
+            self._croquis(categorie).ajouter_tableau(valeurs.to_numpy()[valeurs.to_numpy() > 0])
+        self.nb_utilisateurs += df[colonne_utilisateur].nunique()
+
+    def fusionner(self, autre):
+        """
+        Ajoute au référentiel les utilisateurs d'un autre référentiel.
+
+        Returns:
+            ReferentielDepenses: Le référentiel courant, fusionné
+        """
+        for categorie, croquis in autre.croquis.items():
+            self._croquis(categorie).fusionner(croquis)
+        self.nb_utilisateurs += autre.nb_utilisateurs
+
+        return self
+
+    def percentile(self, categorie, pourcentage):
+        """
+        Situe une part de budget dans la population.
+
+        Args:
+            categorie (str): Catégorie principale
+            pourcentage (float): Part du budget consacrée à la catégorie
+
+        Returns:
+            float: Part des utilisateurs (0-100) qui y consacrent autant ou moins, ou None
+                   si le référentiel est vide
+        """
+        if self.nb_utilisateurs == 0:
+            return None
+
+        croquis = self.croquis.get(categorie)
+        nb_avec_depense = len(croquis) if croquis is not None else 0
+        nb_sans_depense = self.nb_utilisateurs - nb_avec_depense
+
+        inferieurs = nb_sans_depense
+        if nb_avec_depense:
+            inferieurs += croquis.rang(pourcentage) * nb_avec_depense
+
+        return round(100 * inferieurs / self.nb_utilisateurs, 1)
+
+    def mediane(self, categorie):
+        """
+        Returns:
+            float: Part du budget médiane de la population pour la catégorie
+        """
+        croquis = self.croquis.get(categorie)
+        if croquis is None or self.nb_utilisateurs == 0:
+            return 0.0
+
+        # Les utilisateurs sans dépense occupent le bas de la distribution (0%)
+        part_sans_depense = 1 - len(croquis) / self.nb_utilisateurs
+        if part_sans_depense >= 0.5:
+            return 0.0
+        return croquis.quantile((0.5 - part_sans_depense) / (1 - part_sans_depense))
+
+    def sauvegarder(self, chemin_fichier):
+        """
+        Enregistre le référentiel dans un fichier JSON.
+
+        Args:
+            chemin_fichier (str): Fichier de destination
+        """
+        contenu = {
+            'k': self.k,
+            'nb_utilisateurs': self.nb_utilisateurs,
+            'croquis': {categorie: croquis.vers_dict() for categorie, croquis in self.croquis.items()}
+        }
+        with open(chemin_fichier, 'w', encoding='utf-8') as fichier:
+            json.dump(contenu, fichier, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, chemin_fichier):
+        """
+        Recharge un référentiel enregistré avec sauvegarder (vide si le fichier n'existe pas).
+
+        Args:
+            chemin_fichier (str): Fichier JSON du référentiel
+
+        Returns:
+            ReferentielDepenses: Référentiel chargé
+        """
+        referentiel = cls()
+        if os.path.exists(chemin_fichier):
+            with open(chemin_fichier, encoding='utf-8') as fichier:
+                contenu = json.load(fichier)
+            referentiel.k = contenu['k']
+            referentiel.nb_utilisateurs = contenu['nb_utilisateurs']
+            referentiel.croquis = {
+                categorie: CroquisQuantiles.depuis_dict(croquis)
+                for categorie, croquis in contenu['croquis'].items()
+            }
+        return referentiel
+
+    def __len__(self):
+        return self.nb_utilisateurs
@@ -0,0 +1,278 @@
+import json
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Clés dont les valeurs sont des dates, reconverties en Timestamp au décodage
+CLES_DATES = {
+    'date', 'prochaine_date', 'periode_debut', 'periode_fin', 'periode_recente_debut',
+    'periode_recente_fin', 'date_debut_analyse', 'date_fin_analyse'
+}
+
+def verifier_msgpack():
+    """
+    Lève une ImportError explicite si msgpack n'est pas installé.
+    """
+    if msgpack is None:
+        raise ImportError("L'encodage MessagePack nécessite le paquet msgpack (pip install msgpack)")
+
+def valeur_serialisable(valeur):
+    """
+    Convertit récursivement une valeur de résultat en types natifs JSON : scalaires numpy en
+    nombres Python, dates en texte ISO, NaN et NaT en None, clés non textuelles en texte
+    (JSON strict, pour les réponses HTTP et les messages au modèle de langage).
+
+    Args:
+        valeur: Valeur à convertir (résultat, dictionnaire, liste, scalaire...)
+
+    Returns:
+        Valeur composée uniquement de dict, list, str, int, float, bool et None
+    """
+    if isinstance(valeur, ResultatAnalyse):
+        return valeur.vers_dict()
+    if isinstance(valeur, Mapping):
+        return {cle if isinstance(cle, (str, int, float, bool)) or cle is None else str(cle): valeur_serialisable(v)
+                for cle, v in valeur.items()}
+    if isinstance(valeur, (list, tuple, np.ndarray, pd.Series)):
+        return [valeur_serialisable(v) for v in (valeur.tolist() if hasattr(valeur, 'tolist') else valeur)]
+    if isinstance(valeur, (bool, np.bool_)):
+        return bool(valeur)
+    if isinstance(valeur, (int, np.integer)):
+        return int(valeur)
+    if isinstance(valeur, (float, np.floating)):
+        return None if math.isnan(valeur) or math.isinf(valeur) else float(valeur)
+    if valeur is pd.NaT:
+        return None
+    if isinstance(valeur, (datetime, date, np.datetime64)):
+        return pd.Timestamp(valeur).isoformat()
+    if valeur is None or isinstance(valeur, str):
+        return valeur
+    return str(valeur)
+
+def _valeur_native(valeur):
+    # Conversion d'une valeur inconnue de l'encodeur JSON ou MessagePack ; les conteneurs
+    # natifs et les flottants (numpy compris) sont parcourus par l'encodeur lui-même
+    if isinstance(valeur, ResultatAnalyse):
+        return {champ: getattr(valeur, champ) for champ in valeur.__dataclass_fields__}
+    if isinstance(valeur, Mapping):
+        return dict(valeur)
+    if isinstance(valeur, (np.bool_, bool)):
+        return bool(valeur)
+    if isinstance(valeur, np.integer):
+        return int(valeur)
+    if isinstance(valeur, np.floating):
+        return float(valeur)
+    if valeur is pd.NaT:
+        return None
+    if isinstance(valeur, (datetime, date, np.datetime64)):
+        return pd.Timestamp(valeur).isoformat()
+    if isinstance(valeur, (np.ndarray, pd.Series, tuple)):
+        return list(valeur.tolist() if hasattr(valeur, 'tolist') else valeur)
+    return str(valeur)
+
+def _restaurer_dates(valeur, cle=None):
+    # Reconversion des dates sérialisées en texte ISO, repérées par leur clé
+    if isinstance(valeur, dict):
+        return {c: _restaurer_dates(v, c) for c, v in valeur.items()}
+    if isinstance(valeur, list):
+        return [_restaurer_dates(v) for v in valeur]
+    if cle in CLES_DATES:
+        return pd.Timestamp(valeur) if isinstance(valeur, str) else pd.NaT if valeur is None else valeur
+    return valeur
+
+def dataclass_a_slots(cls):
+    """
+    Équivalent de @dataclass(slots=True), disponible à partir de Python 3.10 seulement :
+    la classe de données est recréée avec un __slots__ listant ses champs.
+
+    Args:
+        cls (type): Classe à convertir (champs sans valeur par défaut)
+
+    Returns:
+        type: Classe de données à __slots__
+    """
+    cls = dataclass(cls)
+    attributs = dict(cls.__dict__)
+    attributs['__slots__'] = tuple(champ.name for champ in fields(cls))
+    attributs.pop('__dict__', None)
+    attributs.pop('__weakref__', None)
+    nouvelle = type(cls)(cls.__name__, cls.__bases__, attributs)
+    nouvelle.__qualname__ = cls.__qualname__
+    return nouvelle
+
+class ResultatAnalyse(Mapping):
+    """
+    Base des résultats d'analyse : classes de données à __slots__ (pas de dictionnaire par
+    instance) qui restent lisibles comme des dictionnaires (resultats['cle'], .get, .items),
+    ce qui permet aux fonctions afficher_* et visualiser_* de les utiliser sans changement.
+
+    L'encodage JSON ou MessagePack est compact et déterministe : les champs suivent l'ordre
+    de déclaration et seuls les types numpy et pandas passent par une conversion, les
+    conteneurs étant parcourus directement par l'encodeur.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, cle):
+        if cle not in self.__dataclass_fields__:
+            raise KeyError(cle)
+        return getattr(self, cle)
+
+    def __iter__(self):
+        return iter(self.__dataclass_fields__)
+
+    def __len__(self):
+        return len(self.__dataclass_fields__)
+
+    def vers_dict(self):
+        """
+        Returns:
+            dict: Résultats convertis en types natifs JSON
+        """
+        return {champ.name: valeur_serialisable(getattr(self, champ.name)) for champ in fields(self)}
+
+    def vers_json(self):
+        """
+        Returns:
+            str: Encodage JSON compact (les NaN sont conservés, comme le fait le module json)
+        """
+        return json.dumps(self, default=_valeur_native, ensure_ascii=False, separators=(',', ':'))
+
+    def vers_msgpack(self):
+        """
+        Returns:
+            bytes: Encodage MessagePack (nécessite msgpack)
+        """
+        verifier_msgpack()
+        return msgpack.packb(_valeur_native(self), default=_valeur_native, use_bin_type=True)
+
+    @classmethod
+    def depuis_dict(cls, contenu):
+        """
+        Reconstruit un résultat à partir de vers_dict ou d'un encodage décodé (les dates
+        redeviennent des Timestamp).
+        """
+        return cls(**{cle: _restaurer_dates(valeur, cle) for cle, valeur in contenu.items()})
+
+    @classmethod
+    def depuis_json(cls, texte):
+        return cls.depuis_dict(json.loads(texte))
+
+    @classmethod
+    def depuis_msgpack(cls, octets):
+        verifier_msgpack()
+        return cls.depuis_dict(msgpack.unpackb(octets, raw=False, strict_map_key=False))
+
+@dataclass_a_slots
+class ResultatPrelevements(ResultatAnalyse):
+    montants: dict
+    pourcentages: dict
+    nombre_transactions: dict
+    total_depenses: float
+    abonnements: list
+
+@dataclass_a_slots
+class ResultatCategoriesDepenses(ResultatAnalyse):
+    montants: dict
+    pourcentages: dict
+    total_depenses: float
+
+@dataclass_a_slots
+class ResultatDepensesInhabituelles(ResultatAnalyse):
+    depenses_inhabituelles: list
+    stats_par_categorie: dict
+    periode_recente_debut: pd.Timestamp
+    periode_recente_fin: pd.Timestamp
+
+@dataclass_a_slots
+class ResultatTendancesMensuelles(ResultatAnalyse):
+    tendances: dict
+    depenses_totales: dict
+    mois_analyses: list
+    periode_debut: pd.Timestamp
+    periode_fin: pd.Timestamp
+
+@dataclass_a_slots
+class ResultatPotentielEconomies(ResultatAnalyse):
+    montant_cible: float
+    economies_totales: float
+    objectif_atteint: bool
+    montant_manquant: float
+    potentiel_reduction: dict
+    plan_economies: dict
+    courbe_economies: list
+    suggestions: dict
+    suggestions_essentielles: list
+
+@dataclass_a_slots
+class ResultatCapaciteEmprunt(ResultatAnalyse):
+    revenu_mensuel: float
+    depenses_mensuelles: float
+    reste_a_vivre: float
+    taux_endettement_actuel: float
+    capacite_remboursement: float
+    capacite_emprunt: float
+    capacite_emprunt_amelioree: float
+    apport_recommande: float
+    cout_total: float
+    taux_interet: float
+    duree_pret: int
+    nb_mois_analyse: int
+    date_debut_analyse: pd.Timestamp
+    date_fin_analyse: pd.Timestamp
+    revenus: dict
+    recommandations: list
+
+@dataclass_a_slots
+class ResultatPrevisions(ResultatAnalyse):
+    mois_prevus: list
+    dernier_mois_observe: str
+    revenus: list
+    depenses: list
+    depenses_par_categorie: dict
+    solde_initial: float
+    solde_fin_de_mois: list
+    nb_flux_recurrents: int
+    horizon: int
+
+@dataclass_a_slots
+class ResultatSimulationEmprunt(ResultatAnalyse):
+    taux_interet: float
+    duree_pret: int
+    taux_endettement_max: float
+    nb_chemins: int
+    horizon_mois: int
+    nb_mois_historique: int
+    revenu_mensuel: float
+    depenses_mensuelles: float
+    capacite_reference: float
+    montant_emprunt: float
+    scenarios: dict
+
+@dataclass_a_slots
+class ResultatCalendrier(ResultatAnalyse):
+    categories: list
+    depenses_jour_semaine: dict
+    depenses_jour_mois: dict
+    moyenne_jour_semaine: list
+    moyenne_jour_mois: list
+    part_week_end: float
+    nb_paies: int
+    jour_paie_habituel: int
+    profil_apres_paie: list
+    fenetre_paie: int
+    depense_quotidienne_apres_paie: float
+    depense_quotidienne_hors_paie: float
+    ratio_pic_paie: float
+    pic_apres_paie: bool
+    periode_debut: pd.Timestamp
+    periode_fin: pd.Timestamp
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from recurrences import detecter_flux_recurrents
+
+# Types de crédits distingués par le moteur de revenus
+TYPES_REVENUS = ['salaire', 'recurrent', 'ponctuel', 'transfert', 'remboursement']
+
+# Types retenus dans le revenu stable (celui qu'un prêteur prend en compte)
+TYPES_STABLES = ['salaire', 'recurrent']
+
+# Virements entre comptes de la même personne, épargne et dépôts d'espèces
+MOTIF_TRANSFERTS = r'\b(?:vir(?:ement)? interne|vir(?:ement)? compte|livret|epargne|épargne|depot especes|dépôt espèces)\b'
+MOTIF_CATEGORIES_TRANSFERTS = r'virements? internes?|epargne|épargne|transfert'
+
+# Remboursements et annulations d'achats
+MOTIF_REMBOURSEMENTS = r'\b(?:rembt|rembours\w*|avoir|annulation|refund|retour)\b'
+
+# Libellés et catégories de salaire ou de revenus d'activité
+MOTIF_SALAIRES = r'\b(?:salaire|paie|payroll|traitement|pension|retraite|chomage|chômage|pole emploi|france travail)\b'
+
+def classer_revenus(df, colonne_utilisateur=None):
+    """
+    Attribue un type à chaque crédit : salaire, autre revenu récurrent, revenu ponctuel
+    (prime, vente...), transfert interne ou remboursement.
+
+    Les transferts et remboursements sont reconnus à leur libellé ou leur catégorie ; parmi
+    les autres crédits, ceux qui appartiennent à un flux récurrent (detecter_flux_recurrents)
+    sont des revenus stables, les autres des revenus ponctuels.
+
+    Args:
+        df (DataFrame): Données de transactions
+        colonne_utilisateur (str): Colonne utilisateur (données multi-utilisateurs)
+
+    Returns:
+        Series: Type de chaque crédit, aligné sur df (None pour les débits)
+    """
+    types = pd.Series(None, index=df.index, dtype=object)
+    credits = (df['net_amount'] > 0).to_numpy()
+    if not credits.any():
+        return types
+
+    _, recurrents = detecter_flux_recurrents(df, sens='revenus', colonne_utilisateur=colonne_utilisateur)
+
+    lignes = df[credits]
+    libelles = lignes['description_fake'].astype(str).str.lower()
+    categories = lignes['category_name'].astype(str).str.lower() + ' ' + lignes['parent_name'].astype(str).str.lower()
+
+    est_transfert = (libelles.str.contains(MOTIF_TRANSFERTS, regex=True)
+                     | categories.str.contains(MOTIF_CATEGORIES_TRANSFERTS, regex=True)).to_numpy()
+    est_remboursement = (libelles.str.contains(MOTIF_REMBOURSEMENTS, regex=True)
+                         | categories.str.contains('rembours', regex=False)).to_numpy()
+    est_salaire = (libelles.str.contains(MOTIF_SALAIRES, regex=True)
+                   | categories.str.contains(MOTIF_SALAIRES, regex=True)).to_numpy()
+    est_recurrent = recurrents.to_numpy()[credits]
+
+    types.iloc[np.flatnonzero(credits)] = np.select(
+        [est_transfert, est_remboursement, est_recurrent & est_salaire, est_recurrent],
+        ['transfert', 'remboursement', 'salaire', 'recurrent'],
+        default='ponctuel'
+    )
+
+    return types
+
+def analyser_revenus(df, colonne_utilisateur=None, nb_mois_glissants=12):
+    """
+    Calcule les indicateurs de revenu de chaque utilisateur en une passe vectorisée.
+
+    Le revenu stable d'un mois est la somme des salaires et autres revenus récurrents ; il est
+    suivi du premier mois où un revenu stable apparaît jusqu'au dernier mois de données
+    (un dernier mois incomplet sans revenu stable est ignoré : la paie n'est pas encore tombée).
+
+    Args:
+        df (DataFrame): Données de transactions
+        colonne_utilisateur (str): Colonne utilisateur (None si une seule personne)
+        nb_mois_glissants (int): Nombre de mois de la moyenne glissante
+
+    Returns:
+        DataFrame: Une ligne par utilisateur ('revenu_mensuel_stable' : moyenne glissante,
+                   'revenu_median', 'volatilite', 'revenus_ponctuels_mensuels', ...)
+    """
+    df = df[df['date'].notna()]
+    types = classer_revenus(df, colonne_utilisateur)
+
+    if colonne_utilisateur is not None:
+        codes, utilisateurs = pd.factorize(df[colonne_utilisateur])
+    else:
+        codes, utilisateurs = np.zeros(len(df), dtype=np.int64), pd.Index([None])
+    nb_utilisateurs = len(utilisateurs)
+
+    dates = df['date'].to_numpy()
+    mois = dates.astype('datetime64[M]').astype(np.int64)
+    if len(mois) == 0:
+        return pd.DataFrame(0.0, index=utilisateurs, columns=[
+            'revenu_mensuel_stable', 'revenu_median', 'volatilite', 'revenus_ponctuels_mensuels',
+            'transferts_mensuels', 'remboursements_mensuels', 'part_revenus_stables', 'nb_mois_revenus'
+        ])
+
+    premier_mois = mois.min()
+    nb_mois = mois.max() - premier_mois + 1
+    positions = codes * nb_mois + (mois - premier_mois)
+    montants = df['net_amount'].to_numpy(dtype=float)
+
+    def matrice(masque):
+        # Montants par (utilisateur, mois) des crédits sélectionnés
+        return np.bincount(positions[masque], weights=montants[masque],
+                           minlength=nb_utilisateurs * nb_mois).reshape(nb_utilisateurs, nb_mois)
+
+    valeurs_types = types.to_numpy()
+    stables = matrice(np.isin(valeurs_types, TYPES_STABLES))
+    totaux_types = {type_revenu: matrice(valeurs_types == type_revenu).sum(axis=1) for type_revenu in TYPES_REVENUS}
+
+    # Fenêtre suivie par utilisateur : du premier revenu stable au dernier mois de données
+    colonnes_mois = np.arange(nb_mois)
+    jours = dates.astype('datetime64[D]').astype(np.int64)
+    dernier_jour = np.full(nb_utilisateurs, np.iinfo(np.int64).min)
+    np.maximum.at(dernier_jour, codes, jours)
+    dernier_mois = dernier_jour.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) - premier_mois
+
+    # Dernier mois incomplet et sans revenu stable : la paie n'est pas encore tombée
+    fin_dernier_mois = (dernier_mois + premier_mois + 1).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) - 1
+    incomplet = dernier_jour < fin_dernier_mois
+    sans_paie = stables[np.arange(nb_utilisateurs), dernier_mois] <= 0
+    fin = dernier_mois - (incomplet & sans_paie)
+
+    a_revenu_stable = stables > 0
+    debut = np.where(a_revenu_stable.any(axis=1), a_revenu_stable.argmax(axis=1), fin + 1)
+
+    suivis = (colonnes_mois[None, :] >= debut[:, None]) & (colonnes_mois[None, :] <= fin[:, None])
+    glissants = suivis & (colonnes_mois[None, :] > (fin - nb_mois_glissants)[:, None])
+    nb_mois_suivis = suivis.sum(axis=1)
+    nb_mois_glissants_suivis = glissants.sum(axis=1)
+
+    # Moyenne glissante, volatilité (coefficient de variation) et médiane du revenu stable
+    with np.errstate(invalid='ignore', divide='ignore'):
+        revenu_glissant = np.where(nb_mois_glissants_suivis > 0,
+                                   (stables * glissants).sum(axis=1) / nb_mois_glissants_suivis, 0.0)
+        variance = ((stables - revenu_glissant[:, None]) ** 2 * glissants).sum(axis=1) / nb_mois_glissants_suivis
+        volatilite = np.where(revenu_glissant > 0, np.sqrt(variance) / revenu_glissant, 0.0)
+
+    revenu_median = np.zeros(nb_utilisateurs)
+    avec_suivi = nb_mois_suivis > 0
+    if avec_suivi.any():
+        revenu_median[avec_suivi] = np.nanmedian(np.where(suivis, stables, np.nan)[avec_suivi], axis=1)
+
+    # Les autres crédits sont ramenés à un montant mensuel sur toute la période de l'utilisateur
+    premier_mois_utilisateur = np.full(nb_utilisateurs, nb_mois)
+    np.minimum.at(premier_mois_utilisateur, codes, mois - premier_mois)
+    duree = np.maximum(dernier_mois - premier_mois_utilisateur + 1, 1)
+
+    total_stable = totaux_types['salaire'] + totaux_types['recurrent']
+    total_revenus = total_stable + totaux_types['ponctuel']
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        part_stable = np.where(total_revenus > 0, total_stable / total_revenus, 0.0)
+
+    return pd.DataFrame({
+        'revenu_mensuel_stable': revenu_glissant,
+        'revenu_median': revenu_median,
+        'volatilite': volatilite,
+        'revenus_ponctuels_mensuels': totaux_types['ponctuel'] / duree,
+        'transferts_mensuels': totaux_types['transfert'] / duree,
+        'remboursements_mensuels': totaux_types['remboursement'] / duree,
+        'part_revenus_stables': part_stable,
+        'nb_mois_revenus': nb_mois_suivis
+    }, index=utilisateurs)
+
+def calculer_revenus(df, nb_mois_glissants=12):
+    """
+    Indicateurs de revenu d'une seule personne, avec le détail de ses sources récurrentes.
+
+    Args:
+        df (DataFrame): Données de transactions
+        nb_mois_glissants (int): Nombre de mois de la moyenne glissante
+
+    Returns:
+        dict: Revenu stable, médiane, volatilité, revenus exclus et sources récurrentes
+    """
+    indicateurs = analyser_revenus(df, nb_mois_glissants=nb_mois_glissants).iloc[0]
+    flux, _ = detecter_flux_recurrents(df, sens='revenus')
+    flux = flux[flux['actif'].astype(bool)] if len(flux) else flux
+
+    resultats = {cle: round(float(valeur), 4 if cle in ('volatilite', 'part_revenus_stables') else 2)
+                 for cle, valeur in indicateurs.fillna(0).items()}
+    resultats['nb_mois_revenus'] = int(indicateurs['nb_mois_revenus'] or 0)
+    resultats['sources_recurrentes'] = [
+        {
+            'source': ligne['marchand'],
+            'periodicite': ligne['periodicite'],
+            'montant': round(float(ligne['montant']), 2),
+            'categorie': ligne['category_name']
+        }
+        for _, ligne in flux.iterrows()
+    ]
+
+    return resultats
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import base64
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+
+import matplotlib
+matplotlib.use('Agg')  # Rendu des graphiques sans écran
+import pandas as pd
+
+import assistant
+from cache_graphiques import CacheGraphiques
+from fonctions import charger_donnees, generer_graphique_octets
+from doublons import IndexDoublons
+from instantanes import DepotTransactions
+from multi_comptes import MagasinTransactions, UtilisateurInconnu
+from referentiel import ReferentielDepenses
+from resultats import valeur_serialisable
+
+# pyplot n'est pas thread-safe : un seul rendu de graphique à la fois
+VERROU_GRAPHIQUES = threading.Lock()
+
+class ParametreManquant(ValueError):
+    """
+    Paramètre de requête obligatoire absent (réponse 400).
+    """
+
+def convertir_parametre(valeur):
+    """
+    Convertit un paramètre de requête en nombre ou booléen lorsque c'est possible.
+
+    Args:
+        valeur (str): Valeur brute lue dans l'URL
+
+    Returns:
+        Valeur convertie (int, float, bool) ou la chaîne d'origine
+    """
+    try:
+        return json.loads(valeur)
+    except ValueError:
+        return valeur
+
+def encoder_graphique(octets):
+    """
+    Encode les octets d'un graphique PNG pour les inclure dans une réponse JSON.
+
+    Args:
+        octets (bytes): Contenu PNG, ou None
+
+    Returns:
+        str: Contenu encodé en base64, ou None
+    """
+    return base64.b64encode(octets).decode('ascii') if octets else None
+
+class ServeurAssistant:
+    """
+    Service HTTP asynchrone exposant l'assistant et chaque analyse financière.
+
+    Les transactions sont chargées une seule fois et partagées entre les requêtes ;
+    les analyses s'exécutent dans un pool de threads pour ne pas bloquer la boucle.
+    Avec un MagasinTransactions, chaque requête précise l'utilisateur concerné et les
+    catégories de dépenses sont situées par rapport à l'ensemble des utilisateurs. Avec un
+    DepotTransactions, de nouvelles transactions peuvent être ajoutées pendant le service :
+    chaque requête travaille sur l'instantané courant au moment où elle démarre.
+    """
+
+    def __init__(self, transactions, max_requetes_simultanees=8, delai_attente=10.0, nb_threads=4,
+                 referentiel=None, cache_graphiques=None):
+        """
+        Args:
+            transactions (DataFrame, MagasinTransactions ou DepotTransactions): Données partagées
+                entre les requêtes
+            max_requetes_simultanees (int): Nombre maximum de requêtes traitées en parallèle
+            delai_attente (float): Attente maximale d'une place libre avant de répondre 503, en secondes
+            nb_threads (int): Taille du pool de threads exécutant les analyses
+            referentiel (ReferentielDepenses): Référentiel de population (par défaut, construit
+                à partir d'un MagasinTransactions)
+            cache_graphiques (CacheGraphiques): Cache des graphiques déjà rendus (None pour
+                refaire chaque rendu)
+        """
+        if referentiel is None and isinstance(transactions, MagasinTransactions):
+            referentiel = ReferentielDepenses()
+            referentiel.ajouter_transactions(transactions.donnees, transactions.colonne_utilisateur)
+
+        self.transactions = transactions
+        self.referentiel = referentiel
+        self.cache_graphiques = cache_graphiques
+        self.semaphore = asyncio.Semaphore(max_requetes_simultanees)
+        self.delai_attente = delai_attente
+        self.executeur = ThreadPoolExecutor(max_workers=nb_threads)
+
+    def _transactions(self, utilisateur):
+        """
+        Renvoie les transactions sur lesquelles porte une requête.
+        """
+        if isinstance(self.transactions, MagasinTransactions):
+            if utilisateur is None:
+                raise ParametreManquant("Paramètre 'utilisateur' requis")
+            return self.transactions.transactions_utilisateur(utilisateur)
+
+        if isinstance(self.transactions, DepotTransactions):
+            return self.transactions.instantane().donnees
+
+        return self.transactions
+
+    def _analyser(self, categorie, parametres, avec_graphique, utilisateur=None):
+        """
+        Exécute une analyse (et son graphique) de façon bloquante, dans un thread du pool.
+        """
+        if categorie == "categories_depenses" and self.referentiel is not None:
+            parametres = dict(parametres, referentiel=self.referentiel)
+        if (categorie == "depenses_inhabituelles" and isinstance(self.transactions, DepotTransactions)
+                and self.transactions.table_marchands is not None):
+            # Noms des marchands décodés depuis la colonne merchant_id du dépôt
+            parametres = dict(parametres, table_marchands=self.transactions.table_marchands)
+
+        resultats = assistant.executer_analyse(categorie, self._transactions(utilisateur), **parametres)
+        graphique = None
+
+        if resultats is not None and avec_graphique:
+            if self.cache_graphiques is not None:
+                # Le cache ne prend le verrou que pour les graphiques à rendre
+                graphique = self.cache_graphiques.generer(assistant.visualiser_analyse, categorie, resultats)
+            else:
+                with VERROU_GRAPHIQUES:
+                    graphique = generer_graphique_octets(assistant.visualiser_analyse, categorie, resultats)
+
+        return resultats, graphique
+
+    def _repondre_question(self, question, avec_graphique, utilisateur=None):
+        """
+        Classifie la question, effectue l'analyse et génère la réponse du modèle.
+        """
+        categorie = assistant.classifier_question(question)
+        resultats, graphique = self._analyser(categorie, {}, avec_graphique, utilisateur)
+
+        if resultats is None:
+            return categorie, None, None, None
+
+        return categorie, assistant.generer_reponse(categorie, resultats), resultats, graphique
+
+    async def _executer(self, fonction, *args):
+        boucle = asyncio.get_running_loop()
+        return await boucle.run_in_executor(self.executeur, fonction, *args)
+
+    async def router(self, methode, chemin, parametres, corps):
+        """
+        Associe une requête HTTP au traitement correspondant.
+
+        Returns:
+            tuple: (code HTTP, contenu JSON)
+        """
+        if methode == 'GET' and chemin == '/sante':
+            contenu = {'statut': 'ok', 'nb_transactions': len(self.transactions)}
+            if isinstance(self.transactions, MagasinTransactions):
+                contenu['nb_utilisateurs'] = len(self.transactions.utilisateurs())
+            if isinstance(self.transactions, DepotTransactions):
+                contenu['version'] = self.transactions.instantane().version
+            return HTTPStatus.OK, contenu
+
+        if methode == 'GET' and chemin == '/analyses':
+            return HTTPStatus.OK, {'analyses': assistant.CATEGORIES_ANALYSE}
+
+        if methode == 'GET' and chemin.startswith('/analyses/'):
+            categorie = chemin[len('/analyses/'):]
+            if categorie not in assistant.CATEGORIES_ANALYSE:
+                return HTTPStatus.NOT_FOUND, {'erreur': f"Analyse inconnue: {categorie}"}
+
+            avec_graphique = bool(parametres.pop('graphique', False))
+            utilisateur = parametres.pop('utilisateur', None)
+            erreurs = assistant.verifier_parametres(categorie, parametres)
+            if erreurs:
+                return HTTPStatus.BAD_REQUEST, {'erreur': f"Paramètres invalides: {', '.join(erreurs)}"}
+            try:
+                resultats, graphique = await self._executer(
+                    self._analyser, categorie, parametres, avec_graphique, utilisateur
+                )
+            except ParametreManquant as e:
+                return HTTPStatus.BAD_REQUEST, {'erreur': str(e)}
+            except UtilisateurInconnu as e:
+                return HTTPStatus.NOT_FOUND, {'erreur': str(e)}
+
+            return HTTPStatus.OK, {
+                'categorie': categorie,
+                'resultats': resultats,
+                'graphique_png': encoder_graphique(graphique)
+            }
+
+        if methode == 'POST' and chemin == '/question':
+            try:
+                donnees = json.loads(corps or b'{}')
+                question = donnees['question']
+            except (ValueError, KeyError):
+                return HTTPStatus.BAD_REQUEST, {'erreur': "Corps JSON attendu: {\"question\": \"...\"}"}
+
+            try:
+                categorie, reponse, resultats, graphique = await self._executer(
+                    self._repondre_question, question, bool(donnees.get('graphique', False)),
+                    donnees.get('utilisateur')
+                )
+            except ParametreManquant as e:
+                return HTTPStatus.BAD_REQUEST, {'erreur': str(e)}
+            except UtilisateurInconnu as e:
+                return HTTPStatus.NOT_FOUND, {'erreur': str(e)}
+            if reponse is None:
+                return HTTPStatus.UNPROCESSABLE_ENTITY, {
+                    'categorie': categorie,
+                    'erreur': "Question non reconnue parmi les analyses disponibles"
+                }
+
+            return HTTPStatus.OK, {
+                'categorie': categorie,
+                'reponse': reponse,
+                'resultats': resultats,
+                'graphique_png': encoder_graphique(graphique)
+            }
+
+        if methode == 'POST' and chemin == '/transactions':
+            if not isinstance(self.transactions, DepotTransactions):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'erreur': "Ajout de transactions non disponible sur ce serveur"}
+            try:
+                lot = pd.DataFrame(json.loads(corps or b'{}')['transactions'])
+            except (ValueError, KeyError, TypeError):
+                lot = None
+            if lot is None or not {'date', 'net_amount'} <= set(lot.columns):
+                return HTTPStatus.BAD_REQUEST, {'erreur': "Corps JSON attendu: {\"transactions\": [{\"date\": ..., ...}]}"}
+
+            instantane = await self._executer(self.transactions.publier, lot)
+            return HTTPStatus.OK, {
+                'version': instantane.version,
+                'nb_transactions': len(instantane),
+                'nb_doublons': instantane.nb_doublons
+            }
+
+        return HTTPStatus.NOT_FOUND, {'erreur': f"Route inconnue: {methode} {chemin}"}
+
+    async def traiter_connexion(self, lecteur, ecrivain):
+        """
+        Lit une requête HTTP/1.1, la traite et ferme la connexion.
+        """
+        try:
+            ligne = (await lecteur.readline()).decode('latin-1').strip()
+            if not ligne:
+                return
+            methode, cible, _ = ligne.split(' ', 2)
+
+            entetes = {}
+            while True:
+                ligne_entete = await lecteur.readline()
+                if ligne_entete in (b'\r\n', b'\n', b''):
+                    break
+                nom, _, valeur = ligne_entete.decode('latin-1').partition(':')
+                entetes[nom.strip().lower()] = valeur.strip()
+
+            corps = await lecteur.readexactly(int(entetes.get('content-length', 0)))
+            url = urlsplit(cible)
+            parametres = {cle: convertir_parametre(valeur) for cle, valeur in parse_qsl(url.query)}
+
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.delai_attente)
+            except asyncio.TimeoutError:
+                code, contenu = HTTPStatus.SERVICE_UNAVAILABLE, {'erreur': "Serveur saturé, réessayez plus tard"}
+            else:
+                try:
+                    code, contenu = await self.router(methode, url.path.rstrip('/') or '/', parametres, corps)
+                except Exception as e:
+                    code, contenu = HTTPStatus.INTERNAL_SERVER_ERROR, {'erreur': str(e)}
+                finally:
+                    self.semaphore.release()
+
+            donnees = json.dumps(valeur_serialisable(contenu), ensure_ascii=False).encode('utf-8')
+            ecrivain.write(
+                f"HTTP/1.1 {code.value} {code.phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(donnees)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + donnees
+            )
+            await ecrivain.drain()
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            ecrivain.close()
+
+    async def demarrer(self, hote='127.0.0.1', port=8000):
+        """
+        Démarre l'écoute HTTP.
+
+        Returns:
+            asyncio.Server: Serveur démarré
+        """
+        return await asyncio.start_server(self.traiter_connexion, hote, port)
+
+async def servir(chemin_donnees, hote, port, max_requetes_simultanees, multi_utilisateurs=False,
+                 repertoire_cache_graphiques=None):
+    if multi_utilisateurs:
+        transactions = MagasinTransactions.depuis_csv(chemin_donnees)
+    else:
+        transactions = charger_donnees(chemin_donnees)
+        # Dépôt versionné : les transactions reçues sur POST /transactions sont dédoublonnées
+        # puis publiées sans interrompre les analyses en cours
+        if transactions is not None:
+            transactions = DepotTransactions(transactions, index_doublons=IndexDoublons())
+    if transactions is None:
+        print("Impossible de démarrer le serveur: données non disponibles.")
+        return
+
+    cache_graphiques = None
+    if repertoire_cache_graphiques is not None:
+        cache_graphiques = CacheGraphiques(repertoire_cache_graphiques, verrou=VERROU_GRAPHIQUES)
+
+    service = ServeurAssistant(transactions, max_requetes_simultanees=max_requetes_simultanees,
+                               cache_graphiques=cache_graphiques)
+    serveur = await service.demarrer(hote, port)
+    print(f"Assistant financier disponible sur http://{hote}:{port}")
+
+    async with serveur:
+        await serveur.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP de l'assistant financier")
+    parser.add_argument('--donnees', default='transactions.csv')
+    parser.add_argument('--hote', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-requetes', type=int, default=8)
+    parser.add_argument('--multi-utilisateurs', action='store_true',
+                        help="Le fichier contient une colonne user_id (paramètre 'utilisateur' requis)")
+    parser.add_argument('--cache-graphiques', help="Répertoire du cache des graphiques déjà rendus")
+    arguments = parser.parse_args()
+
+    asyncio.run(servir(arguments.donnees, arguments.hote, arguments.port, arguments.max_requetes,
+                       arguments.multi_utilisateurs, arguments.cache_graphiques))
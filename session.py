@@ -0,0 +1,207 @@
+import json
+import re
+from collections import OrderedDict, deque
+
+import assistant
+
+# Analyses pour lesquelles une question de suivi peut restreindre les transactions à une catégorie
+ANALYSES_FILTRABLES = ["prelevements_automatiques", "categories_depenses", "depenses_inhabituelles"]
+
+# Débuts de phrase signalant une question de suivi portant sur l'analyse précédente
+MOTIF_SUIVI = r"^\s*(?:et|mais|alors|pour|sur|avec|sans|seulement|uniquement|and|what about|how about|only)\b"
+
+# Paramètres reconnus dans une question de suivi : (motif, analyse concernée, paramètre, conversion)
+MOTIFS_PARAMETRES = [
+    (r"(\d+)\s*(?:ans|années|annees|years)\b", "capacite_emprunt", "duree_pret", int),
+    (r"(\d+(?:[.,]\d+)?)\s*%", "capacite_emprunt", "taux_interet", lambda valeur: float(valeur) / 100),
+    (r"(\d+(?:[.,]\d+)?)\s*(?:€|euros?\b|eur\b)", "potentiel_economies", "montant_cible", float),
+    (r"(\d+)\s*(?:mois|months)\b", "previsions_tresorerie", "horizon", int)
+]
+
+# Nombre maximum de mots, hors paramètres reconnus, d'une question de suivi sans formule
+# d'enchaînement (« 300€ ? », « 20 ans alors ? »)
+NB_MOTS_MAX_SUIVI = 2
+
+class SessionConversation:
+    """
+    État d'une conversation avec l'assistant : données préparées, résultats récents et
+    historique des échanges.
+
+    Une question de suivi (« et sur 20 ans ? », « pour les restaurants uniquement ? ») réutilise
+    l'analyse précédente avec des paramètres modifiés ; les résultats déjà calculés sont servis
+    depuis le cache et seules les différences sont envoyées au modèle de langage.
+    """
+
+    def __init__(self, transactions, taille_historique=3, taille_cache=16):
+        """
+        Args:
+            transactions (DataFrame): Données de transactions (telles que renvoyées par charger_donnees)
+            taille_historique (int): Nombre d'échanges rappelés au modèle de langage
+            taille_cache (int): Nombre de résultats d'analyse conservés
+        """
+        self.transactions = transactions
+        self.historique = deque(maxlen=taille_historique)
+        self.taille_cache = taille_cache
+        self.cache = OrderedDict()
+        self.sous_ensembles = {}
+        self.categorie = None
+        self.parametres = {}
+        self.filtre = None
+        self.resultats = None
+        self._noms_categories = self._lister_categories()
+
+    def _lister_categories(self):
+        """
+        Associe chaque nom de catégorie (en minuscules) à sa colonne dans les transactions.
+        """
+        noms = {}
+        for colonne in ('parent_name', 'category_name'):
+            if colonne in self.transactions.columns:
+                for nom in self.transactions[colonne].dropna().unique():
+                    noms.setdefault(nom.lower(), (colonne, nom))
+        return noms
+
+    def _trouver_categorie(self, question):
+        """
+        Renvoie le filtre (colonne, catégorie) désigné par la question, ou None.
+        """
+        texte = question.lower()
+        noms = sorted(self._noms_categories, key=len, reverse=True)
+
+        # Nom complet d'abord (« restaurants »), puis une partie d'un nom composé (« restau »)
+        for nom in noms:
+            if nom in texte:
+                return self._noms_categories[nom]
+        for nom in noms:
+            parties = [partie.strip(' .') for partie in re.split(r'[&/,]', nom)]
+            if any(len(partie) >= 4 and partie in texte for partie in parties):
+                return self._noms_categories[nom]
+        return None
+
+    def interpreter_suivi(self, question):
+        """
+        Détermine si la question prolonge l'analyse précédente et avec quels changements.
+
+        Args:
+            question (str): Question posée par l'utilisateur
+
+        Returns:
+            tuple: (paramètres modifiés, filtre de catégorie) si c'est une question de suivi, sinon None
+        """
+        if self.categorie is None:
+            return None
+
+        texte = question.lower()
+
+        # Seule une question formulée comme un suivi (« et pour 300€ ? ») ou réduite à ses
+        # paramètres (« 20 ans ? ») prolonge l'analyse : une nouvelle question qui contient un
+        # montant ou une durée (« emprunter 200000 euros sur 20 ans ») est classifiée
+        reste = texte
+        for motif, _, _, _ in MOTIFS_PARAMETRES:
+            reste = re.sub(motif, ' ', reste)
+        courte = len(re.findall(r"\w+", reste)) <= NB_MOTS_MAX_SUIVI
+        if not (re.search(MOTIF_SUIVI, texte) or courte):
+            return None
+
+        parametres = {}
+        for motif, analyse, parametre, conversion in MOTIFS_PARAMETRES:
+            correspondance = re.search(motif, texte)
+            if correspondance and analyse == self.categorie:
+                parametres[parametre] = conversion(correspondance.group(1).replace(',', '.'))
+
+        filtre = self._trouver_categorie(question) if self.categorie in ANALYSES_FILTRABLES else None
+
+        if parametres or filtre is not None:
+            return parametres, filtre
+
+        return None
+
+    def _donnees(self, filtre):
+        """
+        Renvoie les transactions de l'analyse, restreintes à une catégorie si demandé
+        (sous-ensembles conservés pour les questions suivantes).
+        """
+        if filtre is None:
+            return self.transactions
+        if filtre not in self.sous_ensembles:
+            colonne, nom = filtre
+            self.sous_ensembles[filtre] = self.transactions[self.transactions[colonne] == nom]
+        return self.sous_ensembles[filtre]
+
+    def analyser(self, categorie, filtre=None, **parametres):
+        """
+        Effectue une analyse, ou renvoie son résultat s'il a déjà été calculé dans la session.
+
+        Args:
+            categorie (str): Type d'analyse à effectuer
+            filtre (tuple): Restriction (colonne, catégorie) des transactions analysées
+            **parametres: Paramètres transmis à la fonction d'analyse
+
+        Returns:
+            dict: Résultats de l'analyse, ou None si la catégorie est inconnue
+        """
+        cle = (categorie, filtre, json.dumps(parametres, sort_keys=True, default=str))
+        if cle in self.cache:
+            self.cache.move_to_end(cle)
+            return self.cache[cle]
+
+        resultats = assistant.executer_analyse(categorie, self._donnees(filtre), **parametres)
+        if resultats is not None:
+            self.cache[cle] = resultats
+            if len(self.cache) > self.taille_cache:
+                self.cache.popitem(last=False)
+
+        return resultats
+
+    def traiter_question(self, question):
+        """
+        Classifie la question (ou la rattache à l'analyse précédente) et effectue l'analyse.
+
+        Args:
+            question (str): Question posée par l'utilisateur
+
+        Returns:
+            tuple: (catégorie, résultats, résultats précédents de la même analyse ou None)
+        """
+        suivi = self.interpreter_suivi(question)
+
+        if suivi is not None:
+            modifications, filtre = suivi
+            categorie = self.categorie
+            parametres = dict(self.parametres, **modifications)
+            filtre = filtre if filtre is not None else self.filtre
+            precedents = self.resultats
+        else:
+            categorie = assistant.classifier_question(question)
+            parametres, filtre, precedents = {}, None, None
+
+        resultats = self.analyser(categorie, filtre, **parametres)
+        if resultats is not None:
+            self.categorie, self.parametres, self.filtre, self.resultats = categorie, parametres, filtre, resultats
+
+        return categorie, resultats, precedents
+
+    def commenter(self, question, categorie, resultats, precedents=None):
+        """
+        Génère la réponse du modèle de langage et l'ajoute à l'historique de la conversation.
+
+        Args:
+            question (str): Question posée par l'utilisateur
+            categorie (str): Type d'analyse effectuée
+            resultats (dict): Résultats de l'analyse
+            precedents (dict): Résultats déjà commentés de la même analyse (question de suivi)
+
+        Returns:
+            str: Réponse en langage naturel
+        """
+        reponse = assistant.generer_reponse(categorie, resultats, list(self.historique), precedents)
+        self.historique.append((question, reponse))
+
+        return reponse
+
+    def reinitialiser(self):
+        """
+        Oublie l'historique et l'analyse en cours (les résultats calculés restent en cache).
+        """
+        self.historique.clear()
+        self.categorie, self.parametres, self.filtre, self.resultats = None, {}, None, None
@@ -0,0 +1,328 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+from fonctions import selectionner_periode
+from resultats import ResultatSimulationEmprunt
+from revenus import TYPES_STABLES, classer_revenus
+
+# Scénarios appliqués aux chemins simulés :
+# - variation_taux : écart absolu de taux (nouveau prêt au taux dégradé, et mensualité du
+#   prêt de référence recalculée comme pour un taux variable)
+# - choc_revenu : variation relative du revenu à partir d'un mois tiré au hasard
+# - probabilite_choc : probabilité qu'un chemin subisse le choc de revenu sur l'horizon
+# - variation_depenses : variation relative des dépenses (inflation). Comme dans
+#   analyser_capacite_emprunt, le montant empruntable ne dépend que du revenu (taux
+#   d'endettement) : l'inflation ne change que la probabilité d'un reste à vivre négatif
+SCENARIOS_DEFAUT = {
+    'central': {},
+    'hausse_taux': {'variation_taux': 0.01},
+    'baisse_revenus': {'choc_revenu': -0.2, 'probabilite_choc': 0.25},
+    'inflation': {'variation_depenses': 0.1},
+    'combine': {'variation_taux': 0.02, 'choc_revenu': -0.2, 'probabilite_choc': 0.25, 'variation_depenses': 0.1}
+}
+
+# Marge sous le montant empruntable de référence du prêt testé par défaut : un prêt au
+# plafond exact dépasserait le taux d'endettement dès que le revenu baisse d'un centime
+MARGE_EMPRUNT = 0.1
+
+# Précision (nombre de décimales) de la comparaison au taux d'endettement maximum
+DECIMALES_TAUX_ENDETTEMENT = 6
+
+# Centiles rapportés pour la distribution des montants empruntables
+CENTILES = [5, 25, 50, 75, 95]
+
+# Nombre de classes de l'histogramme des montants empruntables
+NB_CLASSES_HISTOGRAMME = 30
+
+def facteur_annuite(taux_interet, duree_pret):
+    """
+    Mensualité d'un prêt de 1€ (fonctionne aussi sur des tableaux de taux).
+
+    Args:
+        taux_interet (float ou ndarray): Taux d'intérêt annuel
+        duree_pret (int): Durée du prêt en années
+
+    Returns:
+        float ou ndarray: Mensualité par euro emprunté
+    """
+    taux_mensuel = np.asarray(taux_interet, dtype=float) / 12
+    nb_mensualites = duree_pret * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        facteur = taux_mensuel / (1 - (1 + taux_mensuel) ** (-nb_mensualites))
+    return np.where(taux_mensuel > 0, facteur, 1 / nb_mensualites)
+
+def series_mensuelles(df, revenus_stables=True):
+    """
+    Calcule les revenus et dépenses de chaque mois de l'historique.
+
+    Les mois suivis vont du premier mois de revenu au dernier mois de données ; un dernier
+    mois sans revenu est ignoré (la paie n'est pas encore tombée).
+
+    Args:
+        df (DataFrame): Données de transactions (dates au format datetime)
+        revenus_stables (bool): Ne retenir que les salaires et autres revenus récurrents
+            (tous les crédits si aucun revenu stable n'est détecté)
+
+    Returns:
+        tuple: (revenus mensuels, dépenses mensuelles en valeur absolue), tableaux alignés
+    """
+    df = df[df['date'].notna()]
+    if df.empty:
+        return np.zeros(0), np.zeros(0)
+
+    mois = df['date'].to_numpy().astype('datetime64[M]').astype(np.int64)
+    montants = df['net_amount'].to_numpy(dtype=float)
+    premier, nb_mois = mois.min(), mois.max() - mois.min() + 1
+
+    credits = montants > 0
+    if revenus_stables:
+        stables = classer_revenus(df).isin(TYPES_STABLES).to_numpy()
+        if stables.any():
+            credits = stables
+
+    revenus = np.bincount(mois[credits] - premier, weights=montants[credits], minlength=nb_mois)
+    depenses = np.bincount(mois[montants < 0] - premier, weights=-montants[montants < 0], minlength=nb_mois)
+
+    mois_revenus = np.flatnonzero(revenus > 0)
+    if not len(mois_revenus):
+        return np.zeros(0), np.zeros(0)
+    debut = mois_revenus[0]
+    fin = nb_mois if revenus[-1] > 0 else nb_mois - 1
+
+    return revenus[debut:fin], depenses[debut:fin]
+
+def tirer_chemins(revenus, depenses, nb_chemins, horizon_mois, taille_bloc, generateur):
+    """
+    Tire des chemins mensuels de revenus et dépenses par bootstrap par blocs de l'historique.
+
+    Des blocs de mois consécutifs (l'historique est parcouru circulairement) sont tirés au
+    hasard et mis bout à bout : les revenus et dépenses d'un même mois restent ensemble et la
+    dépendance d'un mois sur l'autre est conservée à l'intérieur d'un bloc.
+
+    Args:
+        revenus, depenses (ndarray): Séries mensuelles de l'historique
+        nb_chemins (int): Nombre de chemins simulés
+        horizon_mois (int): Nombre de mois de chaque chemin
+        taille_bloc (int): Nombre de mois consécutifs par bloc
+        generateur (numpy.random.Generator): Générateur aléatoire
+
+    Returns:
+        tuple: (revenus, dépenses), tableaux chemins × mois
+    """
+    nb_mois = len(revenus)
+    taille_bloc = max(1, min(taille_bloc, nb_mois))
+    nb_blocs = -(-horizon_mois // taille_bloc)
+
+    debuts = generateur.integers(0, nb_mois, size=(nb_chemins, nb_blocs))
+    indices = ((debuts[:, :, None] + np.arange(taille_bloc)) % nb_mois).reshape(nb_chemins, -1)[:, :horizon_mois]
+
+    return revenus[indices], depenses[indices]
+
+def evaluer_scenario(revenus, depenses, scenario, montant_emprunt, taux_interet, duree_pret,
+                     taux_endettement_max, generateur):
+    """
+    Applique un scénario aux chemins simulés et résume la distribution obtenue.
+
+    Args:
+        revenus, depenses (ndarray): Chemins simulés (chemins × mois)
+        scenario (dict): Chocs du scénario (voir SCENARIOS_DEFAUT)
+        montant_emprunt (float): Montant du prêt testé
+        taux_interet (float): Taux d'intérêt annuel de référence
+        duree_pret (int): Durée du prêt en années
+        taux_endettement_max (float): Taux d'endettement maximum
+        generateur (numpy.random.Generator): Générateur aléatoire
+
+    Returns:
+        tuple: (résumé du scénario, montant empruntable de chaque chemin)
+    """
+    nb_chemins, horizon_mois = revenus.shape
+
+    # Choc de revenu à partir d'un mois tiré au hasard, sur une partie des chemins
+    choc_revenu = scenario.get('choc_revenu', 0.0)
+    if choc_revenu:
+        touches = generateur.random(nb_chemins) < scenario.get('probabilite_choc', 1.0)
+        debuts = generateur.integers(0, horizon_mois, size=nb_chemins)
+        apres_choc = touches[:, None] & (np.arange(horizon_mois) >= debuts[:, None])
+        revenus = revenus * (1 + choc_revenu * apres_choc)
+    depenses = depenses * (1 + scenario.get('variation_depenses', 0.0))
+
+    taux = taux_interet + scenario.get('variation_taux', 0.0)
+    facteur = facteur_annuite(taux, duree_pret)
+
+    revenu_moyen = revenus.mean(axis=1)
+    capacites = np.maximum(revenu_moyen, 0) * taux_endettement_max / facteur
+
+    # Prêt testé : sa mensualité rapportée aux revenus de chaque chemin (arrondie, pour que
+    # les erreurs d'arrondi ne comptent pas comme des dépassements)
+    mensualite = montant_emprunt * facteur
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taux_endettement = np.round(mensualite / revenu_moyen, DECIMALES_TAUX_ENDETTEMENT)
+        taux_endettement_mois = np.round(mensualite / revenus, DECIMALES_TAUX_ENDETTEMENT)
+    reste_a_vivre = revenu_moyen - depenses.mean(axis=1) - mensualite
+
+    resume = {
+        'taux_interet': float(taux),
+        'capacite_moyenne': float(capacites.mean()),
+        'centiles_capacite': dict(zip(CENTILES, np.percentile(capacites, CENTILES).tolist())),
+        'mensualite_pret': float(mensualite),
+        'probabilite_depassement': float(np.mean(~(taux_endettement <= taux_endettement_max))),
+        'part_mois_depassement': float(np.mean(~(taux_endettement_mois <= taux_endettement_max))),
+        'probabilite_reste_a_vivre_negatif': float(np.mean(reste_a_vivre < 0))
+    }
+
+    return resume, capacites
+
+def simuler_capacite_emprunt(df, taux_interet=0.03, duree_pret=25, taux_endettement_max=0.33, nb_chemins=20000,
+                             horizon_mois=12, taille_bloc=3, scenarios=None, revenus_stables=True, graine=None,
+                             date_debut=None, date_fin=None, fenetre=None, montant_emprunt=None):
+    """
+    Teste la capacité d'emprunt sous contrainte par simulation de Monte-Carlo.
+
+    Les revenus et dépenses des prochains mois sont tirés dans l'historique de l'utilisateur
+    (bootstrap par blocs), puis chaque scénario de taux, de revenus ou de dépenses est
+    appliqué. Tous les chemins sont calculés ensemble sous forme de tableaux numpy.
+
+    Args:
+        df (DataFrame): Données de transactions
+        taux_interet (float): Taux d'intérêt annuel du prêt (par défaut: 3%)
+        duree_pret (int): Durée du prêt en années (par défaut: 25 ans)
+        taux_endettement_max (float): Taux d'endettement maximum (par défaut: 33%)
+        nb_chemins (int): Nombre de chemins simulés par scénario
+        horizon_mois (int): Nombre de mois simulés (période sur laquelle un prêteur juge le revenu)
+        taille_bloc (int): Nombre de mois consécutifs tirés ensemble dans l'historique
+        scenarios (dict): Scénarios par nom (par défaut: SCENARIOS_DEFAUT)
+        revenus_stables (bool): Ne retenir que le revenu stable, comme analyser_capacite_emprunt
+        graine (int): Graine du générateur aléatoire (résultats reproductibles)
+        date_debut (str ou Timestamp): Début de la période analysée (None pour tout l'historique)
+        date_fin (str ou Timestamp): Fin de la période analysée (None pour tout l'historique)
+        fenetre: Fenêtre glissante ('mois_en_cours', '12_derniers_mois' ou nombre de jours)
+        montant_emprunt (float): Montant du prêt dont le risque de dépassement est testé (par
+            défaut, le montant empruntable sur l'historique moyen diminué de MARGE_EMPRUNT)
+
+    Returns:
+        ResultatSimulationEmprunt: Distribution des montants empruntables et probabilités de
+                                   dépassement du taux d'endettement, par scénario
+    """
+    df = selectionner_periode(df, date_debut, date_fin, fenetre)
+    revenus, depenses = series_mensuelles(df, revenus_stables)
+    scenarios = SCENARIOS_DEFAUT if scenarios is None else scenarios
+
+    revenu_mensuel = float(revenus.mean()) if len(revenus) else 0.0
+    depenses_mensuelles = float(depenses.mean()) if len(depenses) else 0.0
+    montant_reference = max(revenu_mensuel, 0.0) * taux_endettement_max / float(facteur_annuite(taux_interet, duree_pret))
+    if montant_emprunt is None:
+        montant_emprunt = montant_reference * (1 - MARGE_EMPRUNT)
+
+    resultats_scenarios = {}
+    if len(revenus):
+        generateur = np.random.default_rng(graine)
+        chemins_revenus, chemins_depenses = tirer_chemins(revenus, depenses, nb_chemins, horizon_mois,
+                                                          taille_bloc, generateur)
+
+        capacites = {}
+        for nom, scenario in scenarios.items():
+            resultats_scenarios[nom], capacites[nom] = evaluer_scenario(
+                chemins_revenus, chemins_depenses, scenario, montant_emprunt, taux_interet, duree_pret,
+                taux_endettement_max, generateur
+            )
+
+        # Histogrammes sur des classes communes, pour comparer les scénarios
+        toutes = np.concatenate(list(capacites.values()))
+        bornes = np.linspace(toutes.min(), toutes.max(), NB_CLASSES_HISTOGRAMME + 1)
+        for nom, valeurs in capacites.items():
+            resultats_scenarios[nom]['histogramme'] = {
+                'bornes': bornes.tolist(),
+                'effectifs': np.histogram(valeurs, bornes)[0].tolist()
+            }
+
+    return ResultatSimulationEmprunt(
+        taux_interet=taux_interet,
+        duree_pret=duree_pret,
+        taux_endettement_max=taux_endettement_max,
+        nb_chemins=nb_chemins,
+        horizon_mois=horizon_mois,
+        nb_mois_historique=len(revenus),
+        revenu_mensuel=revenu_mensuel,
+        depenses_mensuelles=depenses_mensuelles,
+        capacite_reference=montant_reference,
+        montant_emprunt=float(montant_emprunt),
+        scenarios=resultats_scenarios
+    )
+
+def afficher_simulation_emprunt(resultats):
+    """
+    Affiche les résultats de la simulation de capacité d'emprunt.
+
+    Args:
+        resultats (dict): Résultats de la simulation de capacité d'emprunt
+    """
+    print("\n=== SIMULATION DE LA CAPACITÉ D'EMPRUNT ===\n")
+
+    if not resultats['scenarios']:
+        print("Pas assez d'historique de revenus pour simuler la capacité d'emprunt.")
+        return
+
+    print(f"{resultats['nb_chemins']} chemins de {resultats['horizon_mois']} mois tirés dans "
+          f"{resultats['nb_mois_historique']} mois d'historique")
+    print(f"Revenu mensuel moyen: {resultats['revenu_mensuel']:.2f}€ | dépenses: {resultats['depenses_mensuelles']:.2f}€")
+    print(f"Montant empruntable sur l'historique moyen: {resultats['capacite_reference']:.2f}€ "
+          f"({resultats['taux_interet']*100:.2f}% sur {resultats['duree_pret']} ans)")
+    print(f"Prêt testé: {resultats['montant_emprunt']:.2f}€\n")
+
+    for nom, scenario in resultats['scenarios'].items():
+        centiles = scenario['centiles_capacite']
+        print(f"{nom.upper()} (taux {scenario['taux_interet']*100:.2f}%):")
+        print(f"  - Montant empruntable médian: {centiles[50]:.2f}€ "
+              f"(5% des cas sous {centiles[5]:.2f}€, 5% au-dessus de {centiles[95]:.2f}€)")
+        print(f"  - Mensualité du prêt testé: {scenario['mensualite_pret']:.2f}€")
+        print(f"  - Probabilité de dépasser {resultats['taux_endettement_max']*100:.0f}% d'endettement: "
+              f"{scenario['probabilite_depassement']*100:.1f}% "
+              f"(mois au-dessus: {scenario['part_mois_depassement']*100:.1f}%)")
+        print(f"  - Probabilité d'un reste à vivre négatif: {scenario['probabilite_reste_a_vivre_negatif']*100:.1f}%\n")
+
+def visualiser_simulation_emprunt(resultats, fichier='simulation_emprunt.png', afficher=True):
+    """
+    Crée une visualisation graphique de la simulation de capacité d'emprunt.
+
+    Args:
+        resultats (dict): Résultats de la simulation de capacité d'emprunt
+        fichier (str ou fichier binaire): Destination du graphique (chemin ou tampon)
+        afficher (bool): Afficher la fenêtre matplotlib (False pour un rendu sans écran)
+    """
+    if not resultats['scenarios']:
+        print("Pas de simulation à visualiser.")
+        return
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
+    noms = list(resultats['scenarios'])
+
+    # Graphique 1: Distribution des montants empruntables par scénario
+    for nom in noms:
+        histogramme = resultats['scenarios'][nom]['histogramme']
+        bornes = np.asarray(histogramme['bornes'])
+        ax1.stairs(histogramme['effectifs'], bornes / 1000, label=nom)
+    ax1.axvline(x=resultats['capacite_reference'] / 1000, color='black', linestyle='--', label='Référence')
+    ax1.axvline(x=resultats['montant_emprunt'] / 1000, color='red', linestyle=':', label='Prêt testé')
+    ax1.set_title('Distribution des montants empruntables')
+    ax1.set_xlabel('Montant empruntable (k€)')
+    ax1.set_ylabel('Nombre de chemins')
+    ax1.legend(fontsize='small')
+
+    # Graphique 2: Probabilité de dépasser le taux d'endettement maximum
+    probabilites = [resultats['scenarios'][nom]['probabilite_depassement'] * 100 for nom in noms]
+    barres = ax2.bar(range(len(noms)), probabilites, color='#ff9999')
+    for barre in barres:
+        hauteur = barre.get_height()
+        ax2.annotate(f'{hauteur:.1f}%', xy=(barre.get_x() + barre.get_width() / 2, hauteur),
+                     xytext=(0, 3), textcoords="offset points", ha='center', va='bottom')
+    ax2.set_xticks(range(len(noms)))
+    ax2.set_xticklabels(noms, rotation=20)
+    ax2.set_title(f"Probabilité de dépasser {resultats['taux_endettement_max']*100:.0f}% d'endettement")
+    ax2.set_ylabel('Probabilité (%)')
+
+    plt.tight_layout()
+    plt.savefig(fichier)
+    if afficher:
+        plt.show()
+    else:
+        plt.close()
@@ -0,0 +1,301 @@
+import sqlite3
+
+import pandas as pd
+
+from fonctions import (
+    CATEGORIES_NON_ESSENTIELLES,
+    calculer_capacite_emprunt,
+    calculer_categories_depenses,
+    calculer_potentiel_economies,
+    calculer_tendances_mensuelles,
+    vers_euros
+)
+from resultats import ResultatTendancesMensuelles
+from revenus import calculer_revenus
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Les dates sont stockées en texte ISO (AAAA-MM-JJ) : le tri, les bornes et le mois
+# (substr(date, 1, 7)) s'expriment de la même façon en SQLite et en DuckDB.
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS transactions (
+        user_id VARCHAR,
+        account_id VARCHAR,
+        date VARCHAR,
+        description_fake VARCHAR,
+        net_amount DOUBLE,
+        category_name VARCHAR,
+        parent_name VARCHAR
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_utilisateur_date ON transactions (user_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_utilisateur_categorie ON transactions (user_id, category_name)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_utilisateur_parent ON transactions (user_id, parent_name)"
+]
+
+# Montant en centimes entiers, sommé par la base à la place de net_amount : comme
+# montants_centimes côté pandas, les totaux sont exacts quel que soit le nombre de lignes
+CENTIMES = "CAST(ROUND(net_amount * 100) AS BIGINT)"
+
+COLONNES = ['user_id', 'account_id', 'date', 'description_fake', 'net_amount', 'category_name', 'parent_name']
+
+def ouvrir_base(chemin=':memory:', moteur='sqlite'):
+    """
+    Ouvre (ou crée) une base de transactions et s'assure que le schéma existe.
+
+    Args:
+        chemin (str): Fichier de la base (':memory:' pour une base en mémoire)
+        moteur (str): 'sqlite' ou 'duckdb' (si le paquet duckdb est installé)
+
+    Returns:
+        Connexion DB-API à la base
+    """
+    if moteur == 'duckdb':
+        if duckdb is None:
+            raise ImportError("Le moteur 'duckdb' nécessite le paquet duckdb (pip install duckdb)")
+        connexion = duckdb.connect(chemin)
+    elif moteur == 'sqlite':
+        connexion = sqlite3.connect(chemin, check_same_thread=False)
+    else:
+        raise ValueError(f"Moteur inconnu: {moteur}")
+
+    for instruction in SCHEMA:
+        connexion.execute(instruction)
+
+    return connexion
+
+def inserer_transactions(connexion, df, user_id=None, account_id=None):
+    """
+    Insère des transactions (au format de charger_donnees) dans la base.
+
+    Args:
+        connexion: Connexion renvoyée par ouvrir_base
+        df (DataFrame): Transactions à insérer
+        user_id: Identifiant utilisateur à appliquer (sinon colonne user_id de df)
+        account_id: Identifiant de compte à appliquer (sinon colonne account_id de df)
+
+    Returns:
+        int: Nombre de lignes insérées
+    """
+    lignes = pd.DataFrame({
+        'user_id': user_id if user_id is not None else df.get('user_id'),
+        'account_id': account_id if account_id is not None else df.get('account_id'),
+        'date': pd.to_datetime(df['date'], errors='coerce').dt.strftime('%Y-%m-%d'),
+        'description_fake': df['description_fake'],
+        'net_amount': df['net_amount'].astype(float),
+        'category_name': df['category_name'],
+        'parent_name': df['parent_name']
+    }, index=df.index)
+
+    for colonne in ('user_id', 'account_id'):
+        lignes[colonne] = lignes[colonne].where(lignes[colonne].isna(), lignes[colonne].astype(str))
+    lignes = lignes.astype(object).where(lignes.notna(), None)
+
+    if duckdb is not None and isinstance(connexion, duckdb.DuckDBPyConnection):
+        # DuckDB lit directement le DataFrame, bien plus vite qu'un executemany
+        connexion.register('lignes_a_inserer', lignes)
+        connexion.execute(f"INSERT INTO transactions SELECT {', '.join(COLONNES)} FROM lignes_a_inserer")
+        connexion.unregister('lignes_a_inserer')
+    else:
+        connexion.executemany(
+            f"INSERT INTO transactions ({', '.join(COLONNES)}) VALUES ({', '.join('?' * len(COLONNES))})",
+            lignes.itertuples(index=False, name=None)
+        )
+        connexion.commit()
+
+    return len(lignes)
+
+def importer_csv(connexion, chemin_fichier, user_id=None, account_id=None, taille_bloc=100000):
+    """
+    Importe un fichier CSV de transactions par blocs, sans le charger entièrement en mémoire.
+
+    Args:
+        connexion: Connexion renvoyée par ouvrir_base
+        chemin_fichier (str): Chemin vers le fichier CSV des transactions
+        user_id, account_id: Identifiants à appliquer aux lignes importées
+        taille_bloc (int): Nombre de lignes lues et insérées à la fois
+
+    Returns:
+        int: Nombre de lignes importées
+    """
+    total = 0
+    for bloc in pd.read_csv(chemin_fichier, chunksize=taille_bloc):
+        bloc['date'] = pd.to_datetime(bloc['date'], format="%B %d, %Y", errors='coerce')
+        total += inserer_transactions(connexion, bloc, user_id, account_id)
+
+    return total
+
+def _filtre_utilisateur(user_id):
+    """
+    Renvoie la condition SQL (et ses paramètres) restreignant la requête à un utilisateur.
+    """
+    if user_id is None:
+        return "1 = 1", []
+    return "user_id = ?", [str(user_id)]
+
+def analyser_categories_depenses_sql(connexion, user_id=None):
+    """
+    Équivalent SQL de analyser_categories_depenses : l'agrégation est faite par la base.
+
+    Args:
+        connexion: Connexion renvoyée par ouvrir_base
+        user_id: Utilisateur analysé (None pour toute la base)
+
+    Returns:
+        ResultatCategoriesDepenses: Résultats de l'analyse des catégories
+    """
+    condition, parametres = _filtre_utilisateur(user_id)
+    lignes = connexion.execute(
+        f"""SELECT parent_name, SUM({CENTIMES})
+            FROM transactions
+            WHERE {condition} AND net_amount < 0 AND parent_name IS NOT NULL
+            GROUP BY parent_name""",
+        parametres
+    ).fetchall()
+
+    montants_par_categorie = vers_euros(pd.Series(dict(lignes), dtype='int64').abs())
+
+    return calculer_categories_depenses(montants_par_categorie)
+
+def analyser_potentiel_economies_sql(connexion, montant_cible=200, user_id=None, limites=None, objectifs=None):
+    """
+    Équivalent SQL de analyser_potentiel_economies.
+
+    Args:
+        connexion: Connexion renvoyée par ouvrir_base
+        montant_cible (float): Montant d'économies visé par mois
+        user_id: Utilisateur analysé (None pour toute la base)
+        limites (dict): Par catégorie, (part maximale réductible, pénibilité)
+        objectifs (list): Objectifs mensuels évalués dans la courbe d'économies
+
+    Returns:
+        ResultatPotentielEconomies: Résultats de l'analyse des économies potentielles
+    """
+    condition, parametres = _filtre_utilisateur(user_id)
+    nb_mois, = connexion.execute(
+        f"""SELECT COUNT(DISTINCT substr(date, 1, 7))
+            FROM transactions
+            WHERE {condition} AND net_amount < 0 AND date IS NOT NULL""",
+        parametres
+    ).fetchone()
+
+    lignes = connexion.execute(
+        f"""SELECT parent_name, SUM({CENTIMES})
+            FROM transactions
+            WHERE {condition} AND net_amount < 0 AND parent_name IS NOT NULL
+            GROUP BY parent_name""",
+        parametres
+    ).fetchall()
+
+    depenses_par_categorie = vers_euros(pd.Series(dict(lignes), dtype='int64').abs())
+
+    return calculer_potentiel_economies(depenses_par_categorie, max(nb_mois, 1), montant_cible, limites, objectifs)
+
+def analyser_capacite_emprunt_sql(connexion, user_id=None, taux_interet=0.03, duree_pret=25,
+                                  taux_endettement_max=0.33, revenus_stables=True):
+    """
+    Équivalent SQL de analyser_capacite_emprunt : une seule requête agrège revenus,
+    dépenses, dépenses compressibles et bornes de la période. Seuls les crédits sont
+    ensuite lus pour en extraire le revenu stable.
+
+    Args:
+        connexion: Connexion renvoyée par ouvrir_base
+        user_id: Utilisateur analysé (None pour toute la base)
+        taux_interet (float): Taux d'intérêt annuel du prêt
+        duree_pret (int): Durée du prêt en années
+        taux_endettement_max (float): Taux d'endettement maximum
+        revenus_stables (bool): Retenir le revenu stable plutôt que la moyenne de tous les crédits
+
+    Returns:
+        ResultatCapaciteEmprunt: Résultats de l'analyse de capacité d'emprunt
+    """
+    condition, parametres = _filtre_utilisateur(user_id)
+    marques = ', '.join('?' * len(CATEGORIES_NON_ESSENTIELLES))
+    date_min, date_max, revenu_total, depenses_totales, total_compressible = connexion.execute(
+        f"""SELECT MIN(date), MAX(date),
+                   SUM(CASE WHEN net_amount > 0 THEN {CENTIMES} ELSE 0 END),
+                   SUM(CASE WHEN net_amount < 0 THEN -{CENTIMES} ELSE 0 END),
+                   SUM(CASE WHEN net_amount < 0 AND parent_name IN ({marques}) THEN -{CENTIMES} ELSE 0 END)
+            FROM transactions
+            WHERE {condition}""",
+        list(CATEGORIES_NON_ESSENTIELLES) + parametres
+    ).fetchone()
+
+    if date_min is not None:
+        date_min = pd.Timestamp(date_min)
+        date_max = pd.Timestamp(date_max)
+        nb_mois = (date_max.year - date_min.year) * 12 + date_max.month - date_min.month + 1
+    else:
+        # Si pas de dates valides, supposer 12 mois
+        nb_mois = 12
+
+    revenus = None
+    if revenus_stables and date_min is not None:
+        credits = pd.DataFrame(connexion.execute(
+            f"""SELECT date, description_fake, net_amount, category_name, parent_name
+                FROM transactions
+                WHERE {condition} AND net_amount > 0 AND date IS NOT NULL""",
+            parametres
+        ).fetchall(), columns=['date', 'description_fake', 'net_amount', 'category_name', 'parent_name'])
+        credits['date'] = pd.to_datetime(credits['date'])
+
+        # Les bornes de la période (dernier mois incomplet) sont celles de toutes les transactions
+        bornes = pd.DataFrame({'date': [date_min, date_max], 'net_amount': [0.0, 0.0]})
+        revenus = calculer_revenus(pd.concat([credits, bornes], ignore_index=True).sort_values('date', kind='stable'))
+
+    return calculer_capacite_emprunt(
+        vers_euros(revenu_total or 0), vers_euros(depenses_totales or 0), vers_euros(total_compressible or 0),
+        nb_mois, date_min, date_max, taux_interet, duree_pret, taux_endettement_max, revenus
+    )
+
+def analyser_tendances_mensuelles_sql(connexion, nb_mois_recents=6, user_id=None):
+    """
+    Équivalent SQL de analyser_tendances_mensuelles.
+
+    Args:
+        connexion: Connexion renvoyée par ouvrir_base
+        nb_mois_recents (int): Nombre de mois à analyser
+        user_id: Utilisateur analysé (None pour toute la base)
+
+    Returns:
+        ResultatTendancesMensuelles: Résultats de l'analyse des tendances mensuelles
+    """
+    condition, parametres = _filtre_utilisateur(user_id)
+    mois_uniques = [mois for mois, in connexion.execute(
+        f"""SELECT DISTINCT substr(date, 1, 7) AS mois
+            FROM transactions
+            WHERE {condition} AND net_amount < 0 AND date IS NOT NULL
+            ORDER BY mois""",
+        parametres
+    ).fetchall()]
+
+    # Si aucun mois valide n'est trouvé, retourner un dictionnaire vide
+    if not mois_uniques:
+        return ResultatTendancesMensuelles(
+            tendances={},
+            depenses_totales={},
+            mois_analyses=[],
+            periode_debut=pd.NaT,
+            periode_fin=pd.NaT
+        )
+
+    mois_recents = mois_uniques[-nb_mois_recents:]
+
+    lignes = connexion.execute(
+        f"""SELECT parent_name, substr(date, 1, 7) AS mois, SUM({CENTIMES})
+            FROM transactions
+            WHERE {condition} AND net_amount < 0 AND date >= ?
+            GROUP BY parent_name, mois""",
+        parametres + [mois_recents[0]]
+    ).fetchall()
+
+    agregats = pd.DataFrame(lignes, columns=['parent_name', 'mois', 'centimes'])
+    agregats['centimes'] = agregats['centimes'].astype('int64').abs()
+
+    depenses_totales = vers_euros(agregats.groupby('mois')['centimes'].sum()).to_dict()
+    depenses_mois_categorie = vers_euros(
+        agregats.dropna(subset=['parent_name']).set_index(['parent_name', 'mois'])['centimes'])
+
+    return calculer_tendances_mensuelles(depenses_mois_categorie, depenses_totales, mois_recents)
@@ -0,0 +1,189 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Schéma attendu des transactions : colonne -> nature de la valeur
+SCHEMA_TRANSACTIONS = {
+    'date': 'date',
+    'description_fake': 'texte',
+    'net_amount': 'montant',
+    'category_name': 'texte',
+    'parent_name': 'texte'
+}
+
+# Colonnes d'identification facultatives (magasin multi-comptes)
+COLONNES_FACULTATIVES = ['user_id', 'account_id']
+
+# Colonnes sans lesquelles aucune analyse n'est possible : le fichier entier est rejeté
+COLONNES_OBLIGATOIRES = ['date', 'net_amount']
+
+# Catégories principales connues du référentiel de catégorisation. La liste n'est pas
+# exhaustive : une catégorie absente est signalée dans le rapport, sans écarter les lignes
+CATEGORIES_PARENTES = {
+    'Logement', 'Alimentation & Restau.', 'Auto & Transports', 'Loisirs & Sorties',
+    'Achats & Shopping', 'Santé', 'Abonnements', 'Banque', 'Impôts & Taxes',
+    'Esthétique & Soins', 'Divers', 'Restaurants', 'Voyages / Vacances', "Entrées d'argent"
+}
+
+# Montant (en valeur absolue, en euros) au-delà duquel une transaction est jugée aberrante
+MONTANT_MAX = 1_000_000
+
+# Motifs de mise en quarantaine, chacun codé par un bit du code de la ligne
+MOTIFS_QUARANTAINE = [
+    'date_manquante', 'date_invalide', 'montant_manquant', 'montant_invalide', 'montant_extreme',
+    'libelle_manquant', 'categorie_manquante'
+]
+
+def _valeurs_absentes(serie):
+    # Valeurs manquantes ou chaînes vides
+    absentes = serie.isna()
+    if serie.dtype == object or pd.api.types.is_string_dtype(serie):
+        absentes |= serie.astype(str).str.strip().eq('')
+    return absentes.to_numpy(dtype=bool)
+
+def libelles_motifs(codes):
+    """
+    Traduit les codes de quarantaine (un bit par motif) en listes de motifs lisibles.
+
+    Args:
+        codes (ndarray): Codes des lignes (entiers)
+
+    Returns:
+        ndarray: Motifs de chaque ligne, séparés par des virgules
+    """
+    # Peu de combinaisons distinctes : la traduction se fait une fois par code, pas par ligne
+    uniques, positions = np.unique(codes, return_inverse=True)
+    libelles = np.array([
+        ','.join(motif for bit, motif in enumerate(MOTIFS_QUARANTAINE) if code >> bit & 1)
+        for code in uniques.tolist()
+    ], dtype=object)
+    return libelles[positions]
+
+def valider_transactions(df, format_date="%B %d, %Y", montant_max=MONTANT_MAX, categories_parentes=None,
+                         categories_requises=True):
+    """
+    Valide un lot de transactions brutes et met en quarantaine les lignes inexploitables.
+    Les catégories principales inconnues sont seulement signalées dans le rapport.
+
+    Toutes les vérifications sont vectorisées (un masque booléen par motif) : le coût reste
+    celui de quelques passes sur les colonnes, quel que soit le nombre de lignes.
+
+    Args:
+        df (DataFrame): Transactions telles que lues (dates encore sous forme de texte)
+        format_date (str): Format des dates textuelles
+        montant_max (float): Montant absolu au-delà duquel une transaction est aberrante
+        categories_parentes (set): Catégories principales connues, les autres étant signalées
+            dans le rapport (par défaut, CATEGORIES_PARENTES)
+        categories_requises (bool): Mettre en quarantaine les transactions sans catégorie (à
+            désactiver lorsqu'un catégoriseur complète ensuite les catégories manquantes)
+
+    Returns:
+        tuple: (transactions valides, dates et montants convertis ; lignes en quarantaine,
+                telles que reçues avec leurs motifs ; rapport de validation)
+
+    Raises:
+        ValueError: Si une colonne obligatoire manque
+    """
+    debut = time.perf_counter()
+
+    colonnes_manquantes = [colonne for colonne in SCHEMA_TRANSACTIONS if colonne not in df.columns]
+    obligatoires_manquantes = [colonne for colonne in COLONNES_OBLIGATOIRES if colonne in colonnes_manquantes]
+    if obligatoires_manquantes:
+        raise ValueError(f"Colonnes obligatoires manquantes: {', '.join(obligatoires_manquantes)}")
+
+    if categories_parentes is None:
+        categories_parentes = CATEGORIES_PARENTES
+
+    valides = df.copy()
+    masques = {}
+
+    # Dates : absentes, ou présentes mais illisibles
+    date_absente = _valeurs_absentes(df['date'])
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        valides['date'] = pd.to_datetime(df['date'], format=format_date, errors='coerce')
+    masques['date_manquante'] = date_absente
+    masques['date_invalide'] = valides['date'].isna().to_numpy() & ~date_absente
+
+    # Montants : absents, non numériques, infinis ou aberrants
+    montant_absent = _valeurs_absentes(df['net_amount'])
+    if not pd.api.types.is_numeric_dtype(df['net_amount']):
+        valides['net_amount'] = pd.to_numeric(df['net_amount'], errors='coerce')
+    montants = valides['net_amount'].to_numpy(dtype=float)
+    montant_illisible = np.isnan(montants) & ~montant_absent
+    masques['montant_manquant'] = montant_absent
+    masques['montant_invalide'] = montant_illisible | np.isinf(montants)
+    masques['montant_extreme'] = np.isfinite(montants) & (np.abs(montants) > montant_max)
+
+    if 'description_fake' in df.columns:
+        masques['libelle_manquant'] = _valeurs_absentes(df['description_fake'])
+
+    # Catégories absentes
+    if categories_requises:
+        categorie_absente = np.zeros(len(df), dtype=bool)
+        for colonne in ('category_name', 'parent_name'):
+            if colonne in df.columns:
+                categorie_absente |= _valeurs_absentes(df[colonne])
+        masques['categorie_manquante'] = categorie_absente
+
+    # Catégories principales hors du référentiel : signalées, les lignes restent valides
+    parents_inconnus = {}
+    if 'parent_name' in df.columns:
+        parents = df['parent_name']
+        parents_inconnus = parents[parents.notna() & ~parents.isin(categories_parentes)].value_counts().to_dict()
+
+    codes = np.zeros(len(df), dtype=np.int64)
+    for bit, motif in enumerate(MOTIFS_QUARANTAINE):
+        if motif in masques:
+            codes |= masques[motif].astype(np.int64) << bit
+    en_quarantaine = codes != 0
+
+    quarantaine = df[en_quarantaine].copy()
+    quarantaine['motifs'] = libelles_motifs(codes[en_quarantaine])
+
+    rapport = {
+        'nb_lignes': len(df),
+        'nb_valides': int((~en_quarantaine).sum()),
+        'nb_quarantaine': int(en_quarantaine.sum()),
+        'par_motif': {motif: int(masque.sum()) for motif, masque in masques.items() if masque.any()},
+        'categories_parentes_inconnues': {str(parent): int(nombre) for parent, nombre in parents_inconnus.items()},
+        'colonnes_manquantes': colonnes_manquantes,
+        'colonnes_inattendues': [colonne for colonne in df.columns
+                                 if colonne not in SCHEMA_TRANSACTIONS and colonne not in COLONNES_FACULTATIVES],
+        'duree': time.perf_counter() - debut
+    }
+
+    return valides[~en_quarantaine], quarantaine, rapport
+
+def sauvegarder_quarantaine(quarantaine, chemin_fichier):
+    """
+    Enregistre les lignes mises en quarantaine avec leurs motifs.
+
+    Args:
+        quarantaine (DataFrame): Lignes renvoyées par valider_transactions
+        chemin_fichier (str): Fichier de destination (.parquet, sinon CSV)
+    """
+    if str(chemin_fichier).lower().endswith('.parquet'):
+        quarantaine.to_parquet(chemin_fichier, index=False)
+    else:
+        quarantaine.to_csv(chemin_fichier, index=False)
+
+def afficher_rapport_validation(rapport):
+    """
+    Affiche le rapport de validation d'un lot de transactions.
+
+    Args:
+        rapport (dict): Rapport renvoyé par valider_transactions
+    """
+    print(f"Transactions reçues: {rapport['nb_lignes']} | valides: {rapport['nb_valides']} "
+          f"| en quarantaine: {rapport['nb_quarantaine']} ({rapport['duree'] * 1000:.1f} ms)")
+
+    for motif, nombre in sorted(rapport['par_motif'].items(), key=lambda element: -element[1]):
+        print(f"  - {motif}: {nombre}")
+    if rapport['categories_parentes_inconnues']:
+        inconnues = ', '.join(f"{parent} ({nombre})" for parent, nombre in rapport['categories_parentes_inconnues'].items())
+        print(f"  Catégories principales inconnues (lignes conservées): {inconnues}")
+    if rapport['colonnes_manquantes']:
+        print(f"  Colonnes absentes: {', '.join(rapport['colonnes_manquantes'])}")
+    if rapport['colonnes_inattendues']:
+        print(f"  Colonnes non prévues: {', '.join(rapport['colonnes_inattendues'])}")